@@ -1,58 +1,56 @@
 #!/home/francois/PythonVenv/pip_venv/bin/python
 import os, sys
+import asyncio
+import glob
+import time
+import argparse
+import atexit
 import subprocess
-import xml.etree.ElementTree as ET
 
 
-from find_dependency_tree_helper import find_base_directory
-from find_dependency_tree import main as get_compilation_order
+from find_dependency_tree_helper import find_base_directory, get_source_dirs_from_classpath
+from find_dependency_tree import analyse_project
+from java_file_analyser import parse_java_file, declares_main_method
 
-from config import CAPTURE_OUTPUT, send_notification, PRINT_OUTPUT, DEBUG_, DEBUG_PORT, COMPILE_ONLY, SOCKET_LISTEN
+from config import CAPTURE_OUTPUT, send_notification, PRINT_OUTPUT, DEBUG_, DEBUG_PORT, COMPILE_ONLY, SOCKET_LISTEN, WARM_JVM, TRIM_CLASSPATH, PIPELINE
+from config import EXPLAIN, CHANGE_DETECTION, PARSE_CACHE, GRAPH_SNAPSHOT, SYNC_RESOURCES, COALESCE_BUILDS, ENTRY_POINT_INDEX
+from config import PROFILE_SETTINGS, PROFILE_DURATION, KEEP_GOING, RAM_OUTPUT
 from config import parse_classpath
-
-
-def compile_project(project_root_path, compilation_order, output_dir, classpath, module_to_path, debug=False):
-    """
-    Compiles all Java files in the correct dependency order.
-
-    Args:
-        project_root_path (str): Root directory of the project.
-        compilation_order (list[list[str]]): Ordered list of Java modules to compile.
-        output_dir (str): Directory where compiled .class files will be stored.
-        classpath (str): The full classpath string for dependencies.
-    """
-    for java_group in compilation_order:
-        java_files = [module_to_path[module] for module in java_group]  # Get file paths
-        if PRINT_OUTPUT:
-            print(f"Compiling: {java_files}")
-
-        compile_cmd = [
-            "javac",
-            "-d",
-            output_dir,  # Set output directory for .class files
-            "-cp",
-            f"{output_dir}:{classpath}",  # Classpath includes compiled files + dependencies
-        ]
-
-        if debug:
-            compile_cmd.append("-g")  # Enable debugging information
-
-        compile_cmd.extend(java_files)  # Append Java files to compile
-
-        result = subprocess.run(compile_cmd, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            if PRINT_OUTPUT:
-                print("❌ Compilation failed!")
-                print(result.stderr)
-            return False  # Stop execution if compilation fails
-
-    if PRINT_OUTPUT:
-        print("✅ Compilation successful!")
-    return True  # Indicate successful compilation
-
-
-def execute_java_file(java_file_path, output_dir, classpath, path_to_module, debug=False):
+from build_flavor import get_build_flavor, get_javac_flags, get_flavor_output_dir, get_flavor_state_dir, get_state_root
+from incremental import get_sources_fingerprint, get_build_state_reset_reason
+from warm_jvm import run_in_warm_jvm, WarmRunnerUnavailable
+from profiler import get_recording_path, get_jfr_option, print_profile_summary
+from jar_index import get_module_jars
+from explain import BuildExplanation, print_explanation
+from change_detection import get_source_changes
+from parse_cache import ParseCache
+from entry_points import update_entry_points
+from graph_snapshot import analyse_project_with_snapshot
+from resources import sync_resources
+from hotswap import hot_swap, record_session_classes
+from build_lock import BuildLock, get_build_files, record_build, get_coalesced_build
+from output_capture import run_captured, get_log_path
+from maven_model import get_pom_file
+from ram_output import use_ram_output_dir, start_sync_back
+from compiler import compile_project, extract_classpath_from_xml
+from workspace import build_project_references, get_upstream_changes, save_upstream_classes, get_stale_modules, workspace_main
+from pipeline import pipeline_compile
+from dependency_query import query_main
+from test_runner import run_tests_main
+
+
+def execute_java_file(
+    java_file_path,
+    output_dir,
+    classpath,
+    path_to_module,
+    debug=False,
+    warm=False,
+    profile=False,
+    profile_settings=PROFILE_SETTINGS,
+    profile_duration=PROFILE_DURATION,
+    suspend=True,
+):
     """
     Executes the compiled Java file.
 
@@ -60,6 +58,16 @@ def execute_java_file(java_file_path, output_dir, classpath, path_to_module, deb
         java_file_path (str): Path to the main Java file to execute.
         output_dir (str): Directory containing compiled .class files.
         classpath (str): The full classpath string for execution.
+        warm (bool): Run in the resident JVM (warm_jvm.py) instead of starting a new one.
+            Ignored in debug mode, when profiling and when the output is captured.
+        profile (bool): Record the run with Java Flight Recorder, then print its hot methods,
+            allocation hot spots and GC pauses (profiler.py). The .jfr goes to <output_dir>/../profiles.
+        profile_settings (str): JFR settings ("default", "profile" or a .jfc file).
+        profile_duration (str, optional): Stop recording after that long (e.g. "30s").
+        suspend (bool): In debug mode, wait for a debugger before running main.
+
+    Returns:
+        int: Exit status of the program (1 when the program ended the warm JVM, its status is unknown).
     """
     main_class = path_to_module[java_file_path]  # Convert Java file path to module name
     if PRINT_OUTPUT:
@@ -72,10 +80,15 @@ def execute_java_file(java_file_path, output_dir, classpath, path_to_module, deb
     ]
     if debug:
         if SOCKET_LISTEN:
-            run_cmd.append(f"-agentlib:jdwp=transport=dt_socket,server=y,suspend=y,address=*:{DEBUG_PORT}")
+            run_cmd.append(f"-agentlib:jdwp=transport=dt_socket,server=y,suspend={'y' if suspend else 'n'},address=*:{DEBUG_PORT}")
         if PRINT_OUTPUT:
             print(f"🔍 Debug mode enabled: Listening for debugger on port {DEBUG_PORT}...")
 
+    recording_path = None
+    if profile:
+        recording_path = get_recording_path(output_dir, main_class)
+        run_cmd.append(get_jfr_option(recording_path, settings=profile_settings, duration=profile_duration))
+
     run_cmd.append(main_class)  # Append main class name
 
     if not CAPTURE_OUTPUT:
@@ -84,79 +97,157 @@ def execute_java_file(java_file_path, output_dir, classpath, path_to_module, deb
             print("------------------------ Start of Java Program ------------------------------")
         print("", flush=True)
 
-        subprocess.run(run_cmd, stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr)
-        return
+        if warm and not debug and not profile:
+            try:
+                class_path = [entry for entry in f"{output_dir}:{classpath}".split(":") if entry]  # "" would be the cwd
+                status = run_in_warm_jvm(main_class, class_path)
+                return 1 if status is None else status
+            except WarmRunnerUnavailable as e:
+                print(f"⚠️ Warm JVM unavailable, starting a normal one: {e}")
 
-    # if Capture Output
-    result = subprocess.run(run_cmd, capture_output=True, text=True)
+        completed = subprocess.run(run_cmd, stdin=sys.stdin, stdout=sys.stdout, stderr=sys.stderr)
+        if recording_path:
+            print_profile_summary(recording_path)
+        return completed.returncode
+
+    # if Capture Output: streamed to the terminal and to a log as it comes, only the last lines kept in memory
+    if PRINT_OUTPUT:
+        print("🎉 Program output:\n")
+        print("------------------------ Start of Java Program ------------------------------", flush=True)
+    log_path = get_log_path(output_dir, main_class)
+    result = run_captured(run_cmd, log_path)
+
+    if result.returncode != 0 and PRINT_OUTPUT:
+        print(f"❌ Execution failed! (exit code {result.returncode}, output in {log_path})")
+
+    if recording_path:
+        print_profile_summary(recording_path)
+    return result.returncode
 
-    if result.returncode != 0:
-        if PRINT_OUTPUT:
-            print("❌ Execution failed!")
-            print(result.stderr)
-    else:
-        if PRINT_OUTPUT:
-            print("🎉 Program output:\n")
-            print("------------------------ Start of Java Program ------------------------------")
-            print(result.stdout)
 
-    return
+def file_declares_main(java_file_path: str) -> bool:
+    """Parses a Java file and checks if it can be used as an entry point."""
+    try:
+        tree, _ = parse_java_file(java_file_path)
+    except Exception:
+        return False  # Not parsable (e.g. module-info.java), not an entry point
+    return declares_main_method(tree)
 
 
-def extract_classpath_from_xml(classpath_file, project_root: str):
+def expand_entry_files(entries: list[str]) -> list[str]:
     """
-    Parses Eclipse .classpath XML and returns:
-    - The absolute path of the output directory.
-    - A Java-compatible classpath string.
+    Expands the entry arguments given on the command line into Java file paths.
 
     Args:
-        classpath_file (str): Path to the .classpath XML file.
+        entries (list[str]): Java files, glob patterns (`tools/*Main.java`, `src/**/*.java`)
+            or directories. Directories are searched recursively for classes declaring a main.
 
     Returns:
-        tuple: (absolute_output_dir, classpath_string)
+        list[str]: Real paths of the entry files, without duplicates, in the given order.
     """
-    project_root = os.path.dirname(classpath_file)  # Get the project root directory
-    tree = ET.parse(classpath_file)
-    root = tree.getroot()
-
-    classpath_entries = []
-    output_dir = None
-
-    for entry in root.findall("classpathentry"):
-        kind = entry.get("kind")
-        path = entry.get("path")
-        if not isinstance(path, str) and not path:
-            raise AssertionError("path inexistant")
-
-        if kind == "src":
-            classpath_entries.append(os.path.join(project_root, path))  # Absolute source directories
-        elif kind == "output":
-            output_dir = os.path.join(project_root, path)  # Ensure absolute path for output directory
-        elif kind == "lib":
-            classpath_entries.append(path)  # External JARs (already absolute)
-
-    if output_dir is None:
-        raise ValueError("No output directory found in .classpath file")
-
-    return output_dir, ":".join(classpath_entries)  # Return absolute output directory & classpath
+    java_file_paths = []
+    for entry in entries:
+        if os.path.isdir(entry):
+            candidates = sorted(glob.glob(os.path.join(entry, "**", "*.java"), recursive=True))
+            candidates = [path for path in candidates if file_declares_main(path)]
+        elif glob.has_magic(entry):
+            candidates = sorted(path for path in glob.glob(entry, recursive=True) if path.endswith(".java"))
+        else:
+            candidates = [entry]
+
+        if not candidates:
+            print(f"⚠️ No Java entry file found for {entry}")
+        for path in candidates:
+            path = os.path.realpath(path)
+            if path not in java_file_paths:
+                java_file_paths.append(path)
+
+    return java_file_paths
+
+
+def main(
+    java_file_path,
+    project_root_path,
+    debug=False,
+    release=None,
+    warm=WARM_JVM,
+    trim_classpath=TRIM_CLASSPATH,
+    pipeline=PIPELINE,
+    profile=False,
+    profile_settings=PROFILE_SETTINGS,
+    profile_duration=PROFILE_DURATION,
+    explain=EXPLAIN,
+    hotswap=False,
+    keep_going=KEEP_GOING,
+    ram_output=RAM_OUTPUT,
+    compile_only=COMPILE_ONLY,
+):
+    """
+    Compiles a Java file (or several entry files) with its dependencies, then runs it.
 
+    Args:
+        java_file_path (str | list[str]): Main Java file, or several entry files. Their
+            closures are analysed and compiled together once, then each main is run in order.
+        project_root_path (str): Root directory of the project.
+        debug (bool): Compile with -g and start the JVM waiting for a debugger.
+        release (int, optional): Target Java release (`javac --release`).
+        warm (bool): Run the program(s) in the resident warm JVM.
+        trim_classpath (bool): Compile each batch against only the JARs it needs.
+        pipeline (bool): Start compiling batches while the graph is still being analysed (pipeline.py).
+        profile (bool): Run under Java Flight Recorder and print a hot spot summary
+            (`profile_settings`, `profile_duration`, see execute_java_file).
+        explain (bool): Report why each batch was compiled or skipped and where the time went
+            (explain.py), in <output_dir>/.automake/<flavor>/explain.txt and explain.json.
+        hotswap (bool): With `debug`, push the changed classes into the program already running
+            under the debugger (JDWP on DEBUG_PORT) instead of starting it again, and start it
+            without waiting for a debugger (hotswap.py). It's restarted when the change can't be swapped.
+        keep_going (bool): Keep compiling the batches that don't depend on a failed one, and report
+            every failure at the end (see compile_project).
+        ram_output (bool): Build in a copy of the output dir in RAM (RAM_OUTPUT_ROOT, see
+            ram_output.py), classes and incremental state included, and run from it. It's synced
+            back to the output dir in the background after the build (when automake exits if it
+            ends before that).
+        compile_only (bool): Only compile, then report the built mains instead of running them.
 
-def main(java_file_path, project_root_path, debug=False):
+    Returns:
+        int: Exit status for automake: 1 if the build failed, else the program's (the first
+        failing one's, with several entry files), 0 with `compile_only` or a hot swap, 1 when
+        the debug port is taken by another program or an attached debugger.
+    """
     if DEBUG_:
         print("\n\n-----------------Start of Program ---------------\n\n")
 
-    compilation_order, module_to_path, path_to_module = get_compilation_order(java_file_path, project_root_path)
+    java_file_paths = [java_file_path] if isinstance(java_file_path, str) else list(java_file_path)
     classpath_file = f"{project_root_path}/.classpath"
     if DEBUG_:
         print(f"classpath_file = {classpath_file}")
+    pom_path = get_pom_file(classpath_file)  # A Maven project without a .classpath
     output_dir, classpath = extract_classpath_from_xml(classpath_file, project_root_path)
     output_dir = os.path.realpath(output_dir)
+    disk_output_dir = output_dir
+    if ram_output:
+        output_dir = use_ram_output_dir(disk_output_dir)  # Everything below reads and writes RAM
+        atexit.register(start_sync_back, output_dir, disk_output_dir)  # When main ends before the sync below
+
+    # Projects referenced as `/OtherProject` are built first, then their classes are used as they are
+
+    references = build_project_references(project_root_path, debug=debug, release=release, trim_classpath=trim_classpath)
+    if references is None:
+        print("❌ A referenced project failed to build")
+        return 1
+    if references.classpath:
+        classpath = ":".join([classpath] + references.classpath) if classpath else ":".join(references.classpath)
+
+    # Each flavor (debug, release, --release target) has its own classes and incremental state
+    flavor = get_build_flavor(debug=debug, release=release)
+    flavor_output_dir = get_flavor_output_dir(output_dir, flavor)
+    state_dir = get_flavor_state_dir(output_dir, flavor)
 
     if DEBUG_:
-        print(f"output_dir = {output_dir}\n")
+        print(f"output_dir = {flavor_output_dir} (flavor: {flavor})\n")
         print(f"classpath = {classpath}")
 
-    result = parse_classpath(classpath_file, project_root_path)
+    result = parse_classpath(classpath_file, project_root_path) if pom_path is None else {"suggested_moves": []}
     if result["suggested_moves"]:
         print("\n💡 Suggested Moves:")
         for old_path, new_path in result["suggested_moves"]:
@@ -165,26 +256,218 @@ def main(java_file_path, project_root_path, debug=False):
         for old_path, new_path in result["suggested_moves"]:
             print(f"mv {old_path} {new_path}")
 
-    # Compile project
-    if compile_project(project_root_path, compilation_order, output_dir, classpath, module_to_path, debug=debug):
-        if not COMPILE_ONLY:
-            # Execute only if compilation succeeds
-            if PRINT_OUTPUT:
-                print("")
-            execute_java_file(java_file_path, output_dir, classpath, path_to_module, debug=debug)
-
-    return
+    # Builds of the same output dir run one at a time: one arriving meanwhile waits, then reuses the result
+    entry_names = ", ".join(os.path.basename(entry_path) for entry_path in java_file_paths)
+    # The lock of the disk output dir even with --ram: other builds of it, and the sync back, take it too
+    with BuildLock(get_state_root(disk_output_dir), f"{entry_names} ({flavor})") as build_lock:
+        # Classes of the referenced projects rebuilt just now, or by another build since this one last compiled
+        upstream_changed, upstream_record = get_upstream_changes(state_dir, references.outputs) if references.outputs else (set(), {})
+        upstream_recompiled = references.recompiled | upstream_changed
+
+        # In git, sources git knows are unchanged are neither stat'ed nor parsed again
+        git_changes = get_source_changes(project_root_path, get_source_dirs_from_classpath(classpath_file), CHANGE_DETECTION)
+        parse_cache = ParseCache(get_state_root(output_dir), git_changes) if PARSE_CACHE else None
+
+        explanation = None
+        if explain:
+            explanation = BuildExplanation(get_build_state_reset_reason(state_dir, get_javac_flags(debug=debug, release=release), classpath))
+
+        # The build we waited for may have compiled exactly these sources already
+        coalesced_build = get_coalesced_build(state_dir, java_file_paths, classpath) if build_lock.waited and COALESCE_BUILDS else None
+
+        if pipeline and coalesced_build is None:
+            # Batches are compiled while the rest of the graph is still being parsed
+            failure = {}
+            compiled, analysis = asyncio.run(
+                pipeline_compile(
+                    java_file_paths,
+                    project_root_path,
+                    flavor_output_dir,
+                    classpath,
+                    debug=debug,
+                    release=release,
+                    state_dir=state_dir,
+                    trim_jars=trim_classpath,
+                    explanation=explanation,
+                    git_changes=git_changes,
+                    parse_cache=parse_cache,
+                    upstream_recompiled=upstream_recompiled,
+                    failure=failure,
+                    keep_going=keep_going,
+                )
+            )
+            record_build(state_dir, get_build_files(analysis), analysis["sources_fingerprint"], classpath, compiled, failure.get("errors", ""))
+        else:
+            analysis_start = time.perf_counter()
+            if GRAPH_SNAPSHOT:
+                analysis = analyse_project_with_snapshot(java_file_paths, project_root_path, get_state_root(output_dir), parse_cache, git_changes)
+            else:
+                analysis = analyse_project(java_file_paths, project_root_path, parse_cache=parse_cache)
+            if explanation is not None:
+                explanation.add_time("analysis", time.perf_counter() - analysis_start)
+
+            if coalesced_build is not None:
+                print(f"♻️ Reusing the build that just finished (pid {coalesced_build['pid']})")
+                compiled = coalesced_build["compiled"]
+                if not compiled and PRINT_OUTPUT:
+                    print("❌ Compilation failed!")
+                    print(coalesced_build["errors"])
+            else:
+                # Library imports are resolved through an index of the classpath JARs (cached per JAR)
+                module_jars = get_module_jars(classpath, analysis["external_imports"]) if trim_classpath else None
+
+                build_files = get_build_files(analysis)
+                sources_fingerprint = get_sources_fingerprint(build_files)  # Before javac, like the batch fingerprints
+                failure = {}
+
+                # Compile project
+                compiled = compile_project(
+                    project_root_path,
+                    analysis["compilation_order"],
+                    flavor_output_dir,
+                    classpath,
+                    analysis["module_to_path"],
+                    debug=debug,
+                    release=release,
+                    state_dir=state_dir,
+                    dependency_tree=analysis["dependency_tree"],
+                    module_jars=module_jars,
+                    stale_modules=get_stale_modules(analysis["external_imports"], upstream_recompiled),
+                    explanation=explanation,
+                    git_changes=git_changes,
+                    failure=failure,
+                    keep_going=keep_going,
+                )
+                record_build(state_dir, build_files, sources_fingerprint, classpath, compiled, failure.get("errors", ""))
+        if compiled and references.outputs:
+            save_upstream_classes(state_dir, upstream_record)
+        path_to_module = analysis["path_to_module"]
+        if parse_cache is not None:
+            parse_cache.save(path_to_module)
+        if explanation is not None:
+            print_explanation(explanation, state_dir)
+
+        if compiled and SYNC_RESOURCES:
+            # Images, stylesheets... next to the classes, for getResource
+            source_paths = [os.path.realpath(os.path.join(project_root_path, src_dir)) for src_dir in analysis["source_dirs"]]
+            sync_resources(source_paths, flavor_output_dir, state_dir)
+
+    if parse_cache is not None and ENTRY_POINT_INDEX:
+        # For `automake.py query mains/tests`. It reads the whole project, not just this build's files,
+        # so after the lock: other builds don't wait for it
+        update_entry_points(get_state_root(output_dir), path_to_module, parse_cache)
+        parse_cache.save(path_to_module)
+    if not compiled:
+        return 1
+
+    if ram_output:
+        start_sync_back(output_dir, disk_output_dir)  # While the program runs
+        atexit.unregister(start_sync_back)  # One sync is enough
+
+    if hotswap and debug and not compile_only:
+        swap_result = hot_swap(flavor_output_dir, state_dir, DEBUG_PORT)
+        if swap_result == "swapped":
+            return 0
+        if swap_result == "busy":
+            # Another program or a debugger holds the port: a new JVM couldn't listen on it either
+            print(f"❌ Nothing run: port {DEBUG_PORT} is in use, stop the program or debugger using it")
+            return 1
+        record_session_classes(flavor_output_dir, state_dir, DEBUG_PORT)  # What the new session starts with
+
+    if compile_only:
+        if len(java_file_paths) > 1 or PRINT_OUTPUT:
+            for entry_path in java_file_paths:
+                print(f"✅ Built: {path_to_module[entry_path]}")
+        return 0
+
+    # Execute only if compilation succeeds
+    status = 0
+    for entry_path in java_file_paths:
+        if len(java_file_paths) > 1:
+            if not file_declares_main(entry_path):
+                print(f"⏭️ Not running {path_to_module[entry_path]}: it has no main method")
+                continue
+            print(f"\n▶️ {path_to_module[entry_path]}")
+        if PRINT_OUTPUT:
+            print("")
+        program_status = execute_java_file(
+            entry_path,
+            flavor_output_dir,
+            classpath,
+            path_to_module,
+            debug=debug,
+            warm=warm,
+            profile=profile,
+            profile_settings=profile_settings,
+            profile_duration=profile_duration,
+            suspend=not hotswap,
+        )
+        status = status or program_status  # The first failure, when several programs run
+
+    return status
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python find_dependency_tree.py <path-to-java-file>")
+    if len(sys.argv) > 1 and sys.argv[1] == "query":
+        sys.exit(query_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "workspace":
+        sys.exit(workspace_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "test":
+        sys.exit(run_tests_main(sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(description="Compile Java entry files and their dependencies, then run them.")
+    parser.add_argument("java_files", nargs="+", help="Main Java file(s), glob patterns or directories to search for mains")
+    parser.add_argument("--debug", action="store_true", help="Compile with -g and wait for a debugger on DEBUG_PORT")
+    parser.add_argument("--release", type=int, default=None, help="Target Java release (javac --release N)")
+    parser.add_argument("--compile-only", action="store_true", default=COMPILE_ONLY, help="Only compile, then report the built mains")
+    parser.add_argument("--warm", action="store_true", default=WARM_JVM, help="Run in a resident JVM reused across runs")
+    parser.add_argument(
+        "--trim-classpath", action="store_true", default=TRIM_CLASSPATH, help="Compile each batch against only the JARs its imports need"
+    )
+    parser.add_argument("--profile", action="store_true", help="Run under Java Flight Recorder and print the hot spots")
+    parser.add_argument("--profile-settings", default=PROFILE_SETTINGS, help="JFR settings: default, profile or a .jfc file")
+    parser.add_argument("--profile-duration", default=PROFILE_DURATION, help="Stop recording after that long (e.g. 30s)")
+    parser.add_argument(
+        "--pipeline", action="store_true", default=PIPELINE, help="Compile batches while the rest of the graph is still being analysed"
+    )
+    parser.add_argument(
+        "--hotswap", action="store_true", help="With --debug: swap the changed classes into the running program instead of restarting it"
+    )
+    parser.add_argument("--explain", action="store_true", default=EXPLAIN, help="Report why each batch was recompiled and where the time went")
+    parser.add_argument(
+        "--keep-going", action="store_true", default=KEEP_GOING, help="Compile every batch that doesn't depend on a failed one, report all errors at the end"
+    )
+    parser.add_argument("--ram", action="store_true", default=RAM_OUTPUT, help="Build and run from a RAM copy of the output dir, synced back in the background")
+    args = parser.parse_args()
+
+    java_file_paths = expand_entry_files(args.java_files)
+    if not java_file_paths:
         sys.exit(1)
 
-    java_file_path = os.path.realpath(sys.argv[1])
-    project_root_path = find_base_directory(java_file_path)
-    # Check if --DEBUG_ is passed
-    debug = "--debug" in sys.argv
-    send_notification(f"debug={debug}", java_file_path)
-
-    main(java_file_path, project_root_path, debug=debug)
+    project_root_path = find_base_directory(java_file_paths[0])
+    for other_path in java_file_paths[1:]:
+        if find_base_directory(other_path) != project_root_path:
+            print(f"❌ {other_path} is not in the project {project_root_path}")
+            sys.exit(1)
+
+    debug = args.debug or args.hotswap
+    send_notification(f"debug={debug}", " ".join(java_file_paths))
+
+    status = main(
+        java_file_paths if len(java_file_paths) > 1 else java_file_paths[0],
+        project_root_path,
+        debug=debug,
+        release=args.release,
+        warm=args.warm,
+        trim_classpath=args.trim_classpath,
+        pipeline=args.pipeline,
+        profile=args.profile,
+        profile_settings=args.profile_settings,
+        profile_duration=args.profile_duration,
+        explain=args.explain,
+        keep_going=args.keep_going,
+        hotswap=args.hotswap,
+        ram_output=args.ram,
+        compile_only=args.compile_only,
+    )
+    sys.exit(status)
@@ -0,0 +1,68 @@
+"""
+Time of one javac invocation, with the default JVM against the tuned javac profile (C1 only,
+serial GC, heap per batch), without then with javac's CDS archive: the two lines tell whether
+to turn on JAVAC_PROFILE and JAVAC_CDS in config.py. Each Java file of the source dir is
+compiled by its own javac, like the small batches of an incremental build.
+
+Usage: python benchmarks/bench_javac_profile.py [source_dir] [rounds]
+    source_dir defaults to JavaSrc (the example project), rounds to 5.
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import javac_profile
+from javac_profile import get_javac_jvm_flags, get_cds_flags
+
+
+def time_javac(java_files: list[str], source_dir: str, jvm_flags: list[str], rounds: int) -> list[float]:
+    """Returns the wall time of every javac run, compiling each file alone, `rounds` times."""
+    times = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for _ in range(rounds):
+            for java_file in java_files:
+                start = time.perf_counter()
+                result = subprocess.run(["javac", *jvm_flags, "-d", output_dir, "-sourcepath", source_dir, java_file], capture_output=True, text=True)
+                times.append(time.perf_counter() - start)
+                if result.returncode != 0:
+                    sys.exit(f"javac failed on {java_file}:\n{result.stderr}")
+    return times
+
+
+def main():
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "JavaSrc")
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    java_files = sorted(os.path.join(root, file) for root, _, files in os.walk(source_dir) for file in files if file.endswith(".java"))
+    if not java_files:
+        sys.exit(f"No Java file in {source_dir}")
+
+    if shutil.which("javac") is None:
+        sys.exit("No javac on the PATH")
+
+    time_javac(java_files[:1], source_dir, [], 1)  # Warm the OS file cache
+    default_times = time_javac(java_files, source_dir, [], rounds)
+    javac_profile.JAVAC_CDS = False
+    get_cds_flags.cache_clear()
+    profile_times = time_javac(java_files, source_dir, get_javac_jvm_flags(1), rounds)
+    javac_profile.JAVAC_CDS = True  # Measure with the archive even while it's off in config.py
+    get_cds_flags.cache_clear()
+    get_cds_flags()  # Creates the archive before timing
+    cds_times = time_javac(java_files, source_dir, get_javac_jvm_flags(1), rounds)
+
+    default_ms = sum(default_times) / len(default_times) * 1000
+    print(f"{len(java_files)} files x {rounds} rounds, per javac invocation:")
+    print(f"  default JVM:         {default_ms:7.1f} ms   (min {min(default_times) * 1000:.1f})")
+    for label, times in [("JAVAC_PROFILE", profile_times), ("JAVAC_PROFILE + CDS", cds_times)]:
+        ms = sum(times) / len(times) * 1000
+        print(f"  {label + ':':20} {ms:7.1f} ms   (min {min(times) * 1000:.1f}, saves {default_ms - ms:.1f} ms, {(1 - ms / default_ms) * 100:.0f}%)")
+    print(f"  profile flags: {' '.join(get_javac_jvm_flags(1))}")
+
+
+if __name__ == "__main__":
+    main()
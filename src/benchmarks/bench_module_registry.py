@@ -0,0 +1,80 @@
+"""
+Memory of the project module maps, per 10k Java files: the old two-dictionary layout
+(path_to_module / module_to_path) against the ModuleRegistry. Then the dependency tree as the
+analysis really has it, from parsing to the compilation batches: lists of the registry's
+interned module names.
+
+Usage: python benchmarks/bench_module_registry.py [number_of_files]
+"""
+
+import os
+import sys
+import random
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from module_registry import build_module_registry, FILE
+
+
+def build_project_module_maps_dicts(project_root_path, source_dirs):
+    """The dictionary based module maps, as they were before the registry (reference for the benchmark)."""
+    path_to_module = {}
+    module_to_path = {}
+    for src_dir in source_dirs:
+        src_path = os.path.realpath(os.path.join(project_root_path, src_dir))
+        for root, _, files in os.walk(src_path):
+            root = os.path.realpath(root)
+            relative_dir_path = os.path.relpath(root, src_path)
+            package_name = relative_dir_path.replace(os.sep, ".") if relative_dir_path != "." else ""
+            if package_name:
+                path_to_module[root] = package_name
+                module_to_path[package_name] = root
+            for file in files:
+                file_path = os.path.realpath(os.path.join(root, file))
+                module_name = os.path.relpath(file_path, src_path).replace(os.sep, ".").replace(".java", "")
+                path_to_module[file_path] = module_name
+                module_to_path[module_name] = file_path
+    return path_to_module, module_to_path
+
+
+def make_project(root: str, number_of_files: int, files_per_package: int = 100):
+    for i in range(number_of_files):
+        package_dir = os.path.join(root, "src", "com", "example", "monorepo", f"component{i // files_per_package}", "internal")
+        os.makedirs(package_dir, exist_ok=True)
+        open(os.path.join(package_dir, f"GeneratedClassNumber{i}.java"), "w").close()
+
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+
+def main():
+    number_of_files = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    scale = 10_000 / number_of_files
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as root:
+        make_project(root, number_of_files)
+
+        dict_bytes, (path_to_module, module_to_path) = measure(lambda: build_project_module_maps_dicts(root, ["src"]))
+        registry_bytes, registry = measure(lambda: build_module_registry(root, ["src"]))
+        assert dict(registry.module_to_path.items()) == module_to_path
+
+        # Dependency tree of 5 imports per file, built like generate_dependency_tree: lists of the registry's names
+        modules = [registry.names[i] for i in range(len(registry)) if registry.kinds[i] == FILE]
+        edges = {module: random.sample(modules, 5) for module in modules}
+        tree_bytes, _ = measure(lambda: {module: list(dependencies) for module, dependencies in edges.items()})
+
+    print(f"{number_of_files} files, memory per 10k files:")
+    print(f"  module maps   dicts: {dict_bytes * scale / 1e6:7.2f} MB   registry: {registry_bytes * scale / 1e6:7.2f} MB")
+    print(f"  dep. tree     interned names: {tree_bytes * scale / 1e6:7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+
+STATE_DIR_NAME = ".automake"  # Incremental state lives in <output_dir>/.automake/<flavor>
+
+
+def get_build_flavor(debug: bool = False, release: int | None = None) -> str:
+    """
+    Returns the name of the build flavor for the given compiler options.
+
+    Every flavor gets its own output tree and its own incremental state, so switching
+    between a normal run and a debug session never invalidates the other one.
+
+    Args:
+        debug (bool): Whether the classes are compiled with `-g`.
+        release (int, optional): Target Java release passed to `javac --release`.
+
+    Returns:
+        str: Flavor name, e.g. "release", "debug", "release-j17", "debug-j11".
+    """
+    flavor = "debug" if debug else "release"
+    if release is not None:
+        flavor += f"-j{release}"
+    return flavor
+
+
+def get_javac_flags(debug: bool = False, release: int | None = None) -> list[str]:
+    """Returns the javac flags that define a build flavor."""
+    javac_flags = []
+    if debug:
+        javac_flags.append("-g")  # Enable debugging information
+    if release is not None:
+        javac_flags.extend(["--release", str(release)])
+    return javac_flags
+
+
+def get_flavor_output_dir(output_dir: str, flavor: str) -> str:
+    """Returns the directory holding the .class files of a flavor (e.g. bin/debug)."""
+    return os.path.join(output_dir, flavor)
+
+
+def get_state_root(output_dir: str) -> str:
+    """Returns the directory holding automake's state for a project output dir."""
+    return os.path.join(output_dir, STATE_DIR_NAME)
+
+
+def get_flavor_state_dir(output_dir: str, flavor: str) -> str:
+    """Returns the directory holding the incremental state of a flavor (e.g. bin/.automake/debug)."""
+    return os.path.join(get_state_root(output_dir), flavor)
@@ -0,0 +1,102 @@
+import os
+import time
+
+from incremental import get_sources_fingerprint
+from config import DEBUG_, load_json_file, save_json_file
+
+BUILD_LOCK_FILE = "build.lock"
+LAST_BUILD_FILE = "last_build.json"
+
+
+class BuildLock:
+    """
+    Exclusive lock of a project's output dir (<output_dir>/.automake/build.lock), held while a
+    build analyses and compiles, so builds started at the same time (editor, terminal, debugger)
+    run one after the other instead of running javac into the same directory.
+
+    `waited` tells if another build was running: its result may be reused (get_coalesced_build).
+    """
+
+    def __init__(self, state_root: str, description: str = ""):
+        self.path = os.path.join(state_root, BUILD_LOCK_FILE)
+        self.description = description
+        self.file = None
+        self.waited = False
+
+    def __enter__(self):
+        import fcntl
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, "a+")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.seek(0)
+            holder = self.file.read().strip() or "another build"
+            print(f"⏳ Waiting for {holder}")
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+            self.waited = True
+        self.file.seek(0)
+        self.file.truncate()
+        self.file.write(f"the build of {self.description} (pid {os.getpid()})".strip())
+        self.file.flush()
+        return self
+
+    def __exit__(self, *exc_info):
+        import fcntl
+
+        self.file.seek(0)
+        self.file.truncate()
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+        return False
+
+
+def get_build_files(analysis: dict) -> list[str]:
+    """Returns the sources a build compiles (the closure of its entries)."""
+    module_to_path = analysis["module_to_path"]
+    return sorted(module_to_path[module] for module in analysis["dependency_tree"])
+
+
+def record_build(state_dir: str, files: list[str], sources_fingerprint: str, classpath: str, compiled: bool, errors: str = "") -> None:
+    """
+    Records the result of a build for the builds that waited for it.
+
+    Args:
+        files (list[str]): Sources of the build.
+        sources_fingerprint (str): get_sources_fingerprint(files) when the build started.
+        errors (str): javac errors, when it failed.
+    """
+    save_json_file(
+        os.path.join(state_dir, LAST_BUILD_FILE),
+        {
+            "pid": os.getpid(),
+            "finished": time.time(),
+            "files": files,
+            "sources": sources_fingerprint,
+            "classpath": classpath,
+            "compiled": compiled,
+            "errors": errors,
+        },
+    )
+
+
+def get_coalesced_build(state_dir: str, java_file_paths: list[str], classpath: str) -> dict | None:
+    """
+    Returns the build that just finished if it covers this one: same flavor and classpath, every
+    entry file was part of it, and none of its sources changed since it started. Its result
+    ({"compiled", "errors", "pid", ...}) is then this build's result.
+    """
+    last_build = load_json_file(os.path.join(state_dir, LAST_BUILD_FILE))
+    if not isinstance(last_build, dict) or last_build.get("classpath") != classpath:
+        return None
+    files = last_build.get("files", [])
+    if not set(java_file_paths) <= set(files):
+        return None
+    try:
+        unchanged = get_sources_fingerprint(files) == last_build.get("sources")
+    except FileNotFoundError:
+        return None
+    if DEBUG_:
+        print(f"Build of pid {last_build.get('pid')} covers this one, sources {'un' if unchanged else ''}changed")
+    return last_build if unchanged else None
@@ -0,0 +1,283 @@
+import os
+import time
+from typing import NamedTuple
+
+from find_dependency_tree import analyse_project
+from find_dependency_tree_helper import get_source_dirs_from_classpath
+from module_registry import build_module_registry
+from compiler import compile_project, extract_classpath_from_xml
+from build_flavor import get_build_flavor, get_javac_flags, get_flavor_output_dir, get_flavor_state_dir, get_state_root
+from incremental import get_source_fingerprint, load_build_state, get_compile_reason
+from jar_index import get_module_jars
+from parse_cache import ParseCache
+from resources import sync_resources
+from build_lock import BuildLock
+from maven_model import get_pom_file
+from output_capture import run_captured, get_log_path
+from workspace import get_project_references, find_referenced_projects, get_project_graph, get_project_name, get_project_classpath
+from workspace import get_upstream_projects, build_workspace, get_upstream_outputs, get_upstream_changes, save_upstream_classes, get_stale_modules
+from config import DEBUG_, TRIM_CLASSPATH, PARSE_CACHE, SYNC_RESOURCES, CAPTURE_TAIL_LINES, KEEP_GOING
+
+
+class BuildPlan(NamedTuple):
+    entries: list[str]  # Entry modules
+    compilation_order: list[list[str]]
+    to_compile: list[dict]  # {"batch": modules, "reason": see get_compile_reason}, in order
+    up_to_date: list[list[str]]  # Batches that would be skipped
+
+
+class CompileResult(NamedTuple):
+    success: bool
+    recompiled: list[str]  # Modules compiled by this call
+    errors: str  # Last lines of javac's output when it failed (of every failed batch with keep_going)
+    output_dir: str  # Flavor output dir holding the classes
+    seconds: float
+
+
+class RunResult(NamedTuple):
+    compile: CompileResult
+    returncode: int | None  # None when it didn't compile
+    stdout: str  # Last `tail_lines` lines
+    stderr: str
+    seconds: float  # Of the run only
+
+
+class BuildSession:
+    """
+    Builds and runs the programs of one project from Python, keeping what it learned between calls.
+
+    The project model (.classpath), the module maps, the parsed imports and the dependency graph
+    of each set of entries are kept in memory. Each call only checks what could invalidate them:
+    the .classpath fingerprint, the mtimes of the source directories (a file was added, removed
+    or renamed: the module maps are scanned again) and the fingerprints of the files in the
+    closure of the entries (only the changed ones are parsed again). The .classpath of
+    referenced projects is read once.
+
+    Options are given to the session instead of read from config.py; results are returned
+    instead of printed (compile_project, build_workspace and the JAR index run quiet).
+
+        session = BuildSession("path/to/project", debug=True)
+        session.plan("app.Main").to_compile
+        result = session.run("src/app/Main.java", args=["--fast"])
+        result.returncode, result.stdout
+
+    Entries are Java file paths or module names (`pack.Main`), one or a list.
+    """
+
+    def __init__(
+        self,
+        project_root_path: str,
+        debug: bool = False,
+        release: int | None = None,
+        trim_classpath: bool = TRIM_CLASSPATH,
+        sync_resources: bool = SYNC_RESOURCES,
+        keep_going: bool = KEEP_GOING,
+    ):
+        self.project_root_path = os.path.realpath(project_root_path)
+        self.classpath_file = os.path.join(self.project_root_path, ".classpath")
+        self.debug = debug
+        self.release = release
+        self.trim_classpath = trim_classpath
+        self.sync_resources = sync_resources
+        self.keep_going = keep_going
+        self.flavor = get_build_flavor(debug=debug, release=release)
+        self.javac_flags = get_javac_flags(debug=debug, release=release)
+
+        self.model_fingerprint = None
+        self.registry = None
+        self.directories: dict[str, int] = {}  # Directory of the source dirs -> mtime_ns when the registry was built
+        self.analyses: dict[tuple, tuple[dict, dict]] = {}  # Entry paths -> (analysis, {path: fingerprint} of its closure)
+        self.parse_cache = None
+        self.workspace = None  # (projects, project graph, name) when the project references others
+        self.counts = {"model": 0, "discovery": 0, "analysis": 0}  # How many times each was (re)done
+
+    def refresh_model(self) -> None:
+        """Reads the .classpath (or pom.xml) again if it changed, which invalidates everything else."""
+        fingerprint = get_source_fingerprint(get_pom_file(self.classpath_file) or self.classpath_file)
+        if fingerprint == self.model_fingerprint:
+            return
+        output_dir, classpath = extract_classpath_from_xml(self.classpath_file, self.project_root_path)
+        output_dir = os.path.realpath(output_dir)
+        self.source_dirs = get_source_dirs_from_classpath(self.classpath_file)
+        self.flavor_output_dir = get_flavor_output_dir(output_dir, self.flavor)
+        self.state_dir = get_flavor_state_dir(output_dir, self.flavor)
+        self.state_root = get_state_root(output_dir)
+
+        self.workspace = None
+        if get_project_references(self.project_root_path):
+            # Same classpath as build_project_references gives the command line builds
+            projects = find_referenced_projects(self.project_root_path)
+            project_graph = get_project_graph(projects)
+            name = get_project_name(self.project_root_path)
+            _, project_classpath = get_project_classpath(name, projects, project_graph, self.flavor)
+            own_entries = set(classpath.split(":"))
+            reference_entries = [entry for entry in project_classpath.split(":") if entry and entry not in own_entries]
+            classpath = ":".join([classpath] + reference_entries) if classpath else ":".join(reference_entries)
+            self.workspace = (projects, project_graph, name)
+        self.classpath = classpath
+
+        self.parse_cache = ParseCache(self.state_root) if PARSE_CACHE else None
+        self.registry = None
+        self.analyses.clear()
+        self.model_fingerprint = fingerprint
+        self.counts["model"] += 1
+
+    def get_directory_mtimes(self) -> dict[str, int]:
+        directories = {}
+        for src_dir in self.source_dirs:
+            src_path = os.path.realpath(os.path.join(self.project_root_path, src_dir))
+            for root, _, _ in os.walk(src_path):
+                directories[root] = os.stat(root).st_mtime_ns
+        return directories
+
+    def is_registry_valid(self) -> bool:
+        if self.registry is None:
+            return False
+        try:
+            return all(os.stat(directory).st_mtime_ns == mtime_ns for directory, mtime_ns in self.directories.items())
+        except FileNotFoundError:
+            return False  # A package was deleted
+
+    def refresh_registry(self) -> None:
+        """Scans the source directories again if a file or package was added, removed or renamed."""
+        if self.is_registry_valid():
+            return
+        self.directories = self.get_directory_mtimes()  # Before scanning, so a file added meanwhile is seen next time
+        self.registry = build_module_registry(self.project_root_path, self.source_dirs)
+        self.analyses.clear()
+        self.counts["discovery"] += 1
+
+    def resolve_entries(self, entry: str | list[str]) -> list[str]:
+        """Returns the Java files of entries given as paths or module names."""
+        entry_paths = []
+        for name in [entry] if isinstance(entry, str) else entry:
+            path = os.path.realpath(name if os.path.isabs(name) else os.path.join(self.project_root_path, name))
+            if path.endswith(".java") and path in self.registry.path_to_module:
+                entry_paths.append(path)
+            elif name in self.registry.module_to_path and self.registry.module_to_path[name].endswith(".java"):
+                entry_paths.append(self.registry.module_to_path[name])
+            else:
+                raise ValueError(f"{name} is not a Java file or module of {self.project_root_path}")
+        return entry_paths
+
+    def analyse(self, entry: str | list[str]) -> dict:
+        """Returns the analysis of entries (same keys as analyse_project), redone only for what changed."""
+        self.refresh_model()
+        self.refresh_registry()
+        entry_paths = self.resolve_entries(entry)
+        key = tuple(entry_paths)
+        cached = self.analyses.get(key)
+        if cached is not None:
+            analysis, fingerprints = cached
+            try:
+                if all(get_source_fingerprint(path) == fingerprint for path, fingerprint in fingerprints.items()):
+                    return analysis
+            except FileNotFoundError:
+                pass  # Deleted: the registry sees it through its directory's mtime
+
+        analysis = analyse_project(entry_paths, self.project_root_path, parse_cache=self.parse_cache, registry=self.registry)
+        module_to_path = analysis["module_to_path"]
+        fingerprints = {}
+        for module in analysis["dependency_tree"]:
+            path = module_to_path[module]
+            cache_entry = self.parse_cache.entries.get(path) if self.parse_cache is not None else None
+            fingerprints[path] = cache_entry["fingerprint"] if cache_entry is not None else get_source_fingerprint(path)  # As it was parsed
+        self.analyses[key] = (analysis, fingerprints)
+        self.counts["analysis"] += 1
+        if DEBUG_:
+            print(f"BuildSession: analysed {len(fingerprints)} files for {[os.path.basename(path) for path in entry_paths]}")
+        return analysis
+
+    def plan(self, entry: str | list[str]) -> BuildPlan:
+        """Tells which batches compile() would compile, and why, without compiling anything."""
+        analysis = self.analyse(entry)
+        build_state = load_build_state(self.state_dir, self.javac_flags, self.classpath)
+        to_compile, up_to_date = [], []
+        recompiled_modules = set()
+        for java_group in analysis["compilation_order"]:
+            reason = get_compile_reason(
+                java_group, build_state, analysis["module_to_path"], self.flavor_output_dir, recompiled_modules, analysis["dependency_tree"]
+            )
+            if reason is None:
+                up_to_date.append(java_group)
+            else:
+                to_compile.append({"batch": java_group, "reason": reason})
+                recompiled_modules.update(java_group)
+        entries = [analysis["path_to_module"][path] for path in self.resolve_entries(entry)]
+        return BuildPlan(entries, analysis["compilation_order"], to_compile, up_to_date)
+
+    def compile(self, entry: str | list[str]) -> CompileResult:
+        """Incrementally compiles entries and their dependencies (and the projects it references)."""
+        start = time.perf_counter()
+        analysis = self.analyse(entry)
+        upstream_recompiled, upstream_outputs = set(), []
+        if self.workspace is not None:
+            projects, project_graph, name = self.workspace
+            results = build_workspace(
+                projects,
+                project_graph,
+                targets=project_graph[name],
+                debug=self.debug,
+                release=self.release,
+                trim_classpath=self.trim_classpath,
+                quiet=True,
+            )
+            upstream = get_upstream_projects(name, project_graph)
+            failed = [project for project in upstream if results.get(project) is None]
+            if failed:
+                return CompileResult(False, [], f"Referenced projects failed to build: {', '.join(failed)}", self.flavor_output_dir, time.perf_counter() - start)
+            upstream_recompiled = set().union(*(results[project] for project in upstream))
+            upstream_outputs = get_upstream_outputs(name, projects, project_graph, self.flavor)
+
+        recompiled_modules = set()
+        failure = {}
+        entry_names = ", ".join(os.path.basename(path) for path in self.resolve_entries(entry))
+        with BuildLock(self.state_root, f"{entry_names} ({self.flavor}, build session)"):
+            # Classes of the referenced projects rebuilt just now, or by another build since this flavor last compiled
+            upstream_changed, upstream_record = get_upstream_changes(self.state_dir, upstream_outputs) if upstream_outputs else (set(), {})
+            module_jars = get_module_jars(self.classpath, analysis["external_imports"], quiet=True) if self.trim_classpath else None
+            compiled = compile_project(
+                self.project_root_path,
+                analysis["compilation_order"],
+                self.flavor_output_dir,
+                self.classpath,
+                analysis["module_to_path"],
+                debug=self.debug,
+                release=self.release,
+                state_dir=self.state_dir,
+                dependency_tree=analysis["dependency_tree"],
+                module_jars=module_jars,
+                stale_modules=get_stale_modules(analysis["external_imports"], upstream_recompiled | upstream_changed),
+                recompiled_modules=recompiled_modules,
+                failure=failure,
+                keep_going=self.keep_going,
+                quiet=True,
+            )
+            if compiled and upstream_outputs:
+                save_upstream_classes(self.state_dir, upstream_record)
+            if compiled and self.sync_resources:
+                source_paths = [os.path.realpath(os.path.join(self.project_root_path, src_dir)) for src_dir in self.source_dirs]
+                sync_resources(source_paths, self.flavor_output_dir, self.state_dir)
+            if self.parse_cache is not None:
+                self.parse_cache.save(self.registry.path_to_module)
+        return CompileResult(compiled, sorted(recompiled_modules), failure.get("errors", ""), self.flavor_output_dir, time.perf_counter() - start)
+
+    def run(self, entry: str, args: list[str] = (), echo: bool = False, tail_lines: int = CAPTURE_TAIL_LINES) -> RunResult:
+        """
+        Compiles an entry, then runs its main class in a new JVM.
+
+        Args:
+            entry (str): Java file or module with a main method.
+            args (list[str]): Program arguments.
+            echo (bool): Also print the program's output as it comes.
+            tail_lines (int): Lines of stdout and stderr kept in the result. Everything is in
+                <output_dir>/logs/<main class>.log too.
+        """
+        compile_result = self.compile(entry)
+        if not compile_result.success:
+            return RunResult(compile_result, None, "", "", 0.0)
+        main_class = self.registry.path_to_module[self.resolve_entries(entry)[0]]
+        run_cmd = ["java", "-cp", f"{self.flavor_output_dir}:{self.classpath}", main_class, *args]
+        start = time.perf_counter()
+        result = run_captured(run_cmd, get_log_path(self.flavor_output_dir, main_class), echo=echo, tail_lines=tail_lines)
+        return RunResult(compile_result, result.returncode, result.stdout, result.stderr, time.perf_counter() - start)
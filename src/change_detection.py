@@ -0,0 +1,144 @@
+import os
+import shutil
+import subprocess
+
+from config import DEBUG_
+
+
+class GitChanges:
+    """
+    What git knows about the sources of a project, to find changed files without stat'ing them all.
+
+    A source recorded as built from commit `head` (it was clean then: same content as in that
+    commit) is unchanged if it is still clean and no commit since `head` touched it. Only dirty
+    files (modified, staged, untracked or ignored, from `git status`) and the files changed
+    between commits (`git diff`) need a stat.
+    """
+
+    def __init__(self, root: str, head: str | None, dirty_paths: set[str], dirty_dirs: list[str]):
+        self.root = root  # Real path of the work tree
+        self.head = head  # Current commit, None in a repository without commits
+        self.dirty_paths = dirty_paths  # Real paths of the files that differ from HEAD
+        self.dirty_dirs = dirty_dirs  # Real paths (with a trailing separator) of dirty submodules
+        self.changed_since: dict[str, set[str] | None] = {}  # commit -> paths changed since, None if unknown
+
+    def is_clean(self, path: str) -> bool:
+        """Checks if a file has the same content as in HEAD."""
+        if self.head is None or not path.startswith(self.root + os.sep):
+            return False
+        return path not in self.dirty_paths and not any(path.startswith(prefix) for prefix in self.dirty_dirs)
+
+    def is_unchanged_since(self, path: str, head: str | None) -> bool:
+        """Checks if a file that had the content of commit `head` still has it (False if git can't tell)."""
+        if not head or not self.is_clean(path):
+            return False
+        if head == self.head:
+            return True
+        if head not in self.changed_since:
+            self.changed_since[head] = run_git_paths(self.root, ["diff", "--name-only", "-z", "--no-renames", head, self.head])
+        changed_paths = self.changed_since[head]
+        if changed_paths is None:
+            return False  # e.g. the commit was rebased away
+        return path not in changed_paths and not any(path.startswith(changed + os.sep) for changed in changed_paths)
+
+    def get_head_for(self, path: str) -> str | None:
+        """Returns the commit a source file is recorded as built from: HEAD if the file is clean, else None."""
+        return self.head if self.is_clean(path) else None
+
+
+def run_git(root: str, args: list[str]) -> str | None:
+    """Runs a git command in `root`, returns its output or None if it failed."""
+    try:
+        result = subprocess.run(["git", "-C", root] + args, capture_output=True, text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        if DEBUG_:
+            print(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+        return None
+    return result.stdout
+
+
+def run_git_paths(root: str, args: list[str]) -> set[str] | None:
+    """Runs a git command listing paths (-z), returns their real paths."""
+    output = run_git(root, args)
+    if output is None:
+        return None
+    return {os.path.realpath(os.path.join(root, path)) for path in output.split("\0") if path}
+
+
+def parse_status_paths(output: str) -> list[str]:
+    """Returns the paths of `git status --porcelain -z` (both sides of renames and copies)."""
+    paths = []
+    entries = output.split("\0")
+    i = 0
+    while i < len(entries):
+        entry = entries[i]
+        i += 1
+        if len(entry) < 4:
+            continue
+        paths.append(entry[3:])
+        if entry[0] in "RC":  # The next entry is the original path
+            if i < len(entries) and entries[i]:
+                paths.append(entries[i])
+            i += 1
+    return paths
+
+
+def get_git_changes(project_root_path: str, source_dirs: list[str]) -> GitChanges | None:
+    """
+    Asks git which sources of the project differ from HEAD.
+
+    Args:
+        project_root_path (str): Root directory of the project.
+        source_dirs (list[str]): Source directories (relative to the root), the only paths `git status` looks at.
+
+    Returns:
+        GitChanges | None: None if the project isn't in a git work tree (or git isn't installed).
+    """
+    if shutil.which("git") is None:
+        return None
+    root = run_git(project_root_path, ["rev-parse", "--show-toplevel"])
+    if root is None:
+        return None
+    root = os.path.realpath(root.strip())
+    head = run_git(root, ["rev-parse", "--verify", "-q", "HEAD"])
+    head = head.strip() if head else None
+
+    pathspecs = [os.path.realpath(os.path.join(project_root_path, src_dir)) for src_dir in source_dirs]
+    pathspecs = [path for path in pathspecs if path == root or path.startswith(root + os.sep)]
+    if not pathspecs:
+        return None
+    # Ignored files are listed too: git doesn't track them, so they always need a stat
+    output = run_git(root, ["status", "--porcelain", "-z", "--untracked-files=all", "--ignored=matching", "--"] + pathspecs)
+    if output is None:
+        return None
+
+    dirty_paths, dirty_dirs = set(), []
+    for path in parse_status_paths(output):
+        path = os.path.realpath(os.path.join(root, path))
+        if os.path.isdir(path):
+            dirty_dirs.append(path.rstrip(os.sep) + os.sep)  # A submodule, or an ignored directory
+        else:
+            dirty_paths.add(path)
+    return GitChanges(root, head, dirty_paths, dirty_dirs)
+
+
+def get_source_changes(project_root_path: str, source_dirs: list[str], mode: str = "auto") -> GitChanges | None:
+    """
+    Returns the change detection backend of a build.
+
+    Args:
+        mode (str): "git" (warns outside of git), "auto" (git when available) or "stat" (stat every source).
+
+    Returns:
+        GitChanges | None: None when every source must be stat'ed.
+    """
+    if mode == "stat":
+        return None
+    git_changes = get_git_changes(project_root_path, source_dirs)
+    if git_changes is None and mode == "git":
+        print("⚠️ Not a git work tree, checking every source file instead")
+    if DEBUG_ and git_changes is not None:
+        print(f"git: HEAD {git_changes.head}, {len(git_changes.dirty_paths)} dirty files")
+    return git_changes
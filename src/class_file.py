@@ -0,0 +1,113 @@
+import os
+import re
+import struct
+
+from config import DEBUG_
+
+CLASS_FILE_MAGIC = b"\xca\xfe\xba\xbe"
+
+# Size of each constant pool entry after its tag (Utf8 is variable: 2 byte length + data)
+CONSTANT_SIZES = {3: 4, 4: 4, 5: 8, 6: 8, 7: 2, 8: 2, 9: 4, 10: 4, 11: 4, 12: 4, 15: 3, 16: 2, 17: 4, 18: 4, 19: 2, 20: 2}
+CONSTANT_UTF8 = 1
+CONSTANT_CLASS = 7
+CONSTANT_STRING = 8
+
+# `Lpack/Name;` in descriptors and signatures (`Lpack/List<Lpack/Item;>;` too)
+CLASS_DESCRIPTOR = re.compile(r"L([^;<>\[\]().:]+?)[;<]")
+
+
+def read_class_references(class_bytes: bytes) -> tuple[str, set[str], bool]:
+    """
+    Reads what a class file references from its constant pool.
+
+    References are the Class constants, plus every class named in a descriptor or a signature
+    (fields, methods, generics, annotations, local variables): all the classes javac resolved
+    to compile it, except the constants it inlined (`static final int X = 1` leaves no trace).
+
+    Args:
+        class_bytes (bytes): Content of a .class file.
+
+    Returns:
+        tuple[str, set[str], bool]: (its internal name `pack/Outer$Inner`, the internal names it
+        references, whether it declares constants other classes may have inlined).
+
+    Raises:
+        ValueError: Not a class file, or truncated.
+    """
+    if class_bytes[:4] != CLASS_FILE_MAGIC:
+        raise ValueError("Not a class file")
+    try:
+        count = struct.unpack_from(">H", class_bytes, 8)[0]
+        offset = 10
+        utf8 = {}
+        class_names = {}  # Class constant index -> Utf8 index
+        strings = set()  # Utf8 indexes of String constants (text, not class names)
+        index = 1
+        while index < count:
+            tag = class_bytes[offset]
+            if tag == CONSTANT_UTF8:
+                length = struct.unpack_from(">H", class_bytes, offset + 1)[0]
+                utf8[index] = class_bytes[offset + 3 : offset + 3 + length].decode("utf-8", errors="replace")
+                offset += 3 + length
+            else:
+                if tag == CONSTANT_CLASS:
+                    class_names[index] = struct.unpack_from(">H", class_bytes, offset + 1)[0]
+                elif tag == CONSTANT_STRING:
+                    strings.add(struct.unpack_from(">H", class_bytes, offset + 1)[0])
+                offset += 1 + CONSTANT_SIZES[tag]
+            index += 2 if tag in (5, 6) else 1  # Long and Double take two slots
+        this_class = utf8[class_names[struct.unpack_from(">H", class_bytes, offset + 2)[0]]]
+    except (struct.error, IndexError, KeyError) as e:
+        raise ValueError(f"Malformed class file ({e!r})") from None
+
+    references = set()
+    for name_index in class_names.values():
+        name = utf8[name_index]
+        if name.startswith("["):
+            references.update(CLASS_DESCRIPTOR.findall(name))  # Array class: [Lpack/Name;
+        else:
+            references.add(name)
+    for index, text in utf8.items():
+        if index not in strings and ";" in text:
+            references.update(CLASS_DESCRIPTOR.findall(text))
+    references.discard(this_class)
+    declares_constants = "ConstantValue" in utf8.values()  # Attribute of the fields initialised with a constant
+    return this_class, references, declares_constants
+
+
+def get_class_dependencies(output_dir: str, modules, class_manifest: dict[str, list[str]]) -> dict[str, dict]:
+    """
+    Reads the real module dependencies of compiled modules from their class files.
+
+    Args:
+        output_dir (str): Flavor output directory.
+        modules (Iterable[str]): Modules to read.
+        class_manifest (dict): Module -> its class files (class_manifest.py), for every module
+            of the project, to know which module a referenced class comes from.
+
+    Returns:
+        dict[str, dict]: Module -> {"deps": sorted project modules it references, "constants":
+        whether it declares constants}. Modules whose class files can't be read are left out.
+    """
+    class_to_module = {}
+    for module, class_files in class_manifest.items():
+        for class_file in class_files:
+            class_to_module[class_file[: -len(".class")].replace(os.sep, "/")] = module
+
+    class_dependencies = {}
+    for module in modules:
+        deps = set()
+        declares_constants = False
+        try:
+            for class_file in class_manifest.get(module, []):
+                with open(os.path.join(output_dir, class_file), "rb") as file:
+                    _, references, constants = read_class_references(file.read())
+                declares_constants |= constants
+                deps.update(class_to_module[name] for name in references if name in class_to_module)
+        except (OSError, ValueError) as e:
+            if DEBUG_:
+                print(f"Can't read the classes of {module}: {e}")
+            continue
+        deps.discard(module)
+        class_dependencies[module] = {"deps": sorted(deps), "constants": declares_constants}
+    return class_dependencies
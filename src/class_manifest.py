@@ -0,0 +1,139 @@
+import os
+import shutil
+
+from config import DEBUG_, load_json_file, save_json_file
+
+CLASS_MANIFEST_FILE = "class_manifest.json"
+STAGING_DIR_NAME = "staging"
+
+
+def load_class_manifest(state_dir: str) -> dict[str, list[str]]:
+    """
+    Loads the class manifest of a flavor: module -> the .class files (relative to the
+    flavor output dir) its last compilation produced, nested and anonymous classes included.
+    """
+    manifest = load_json_file(os.path.join(state_dir, CLASS_MANIFEST_FILE))
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def save_class_manifest(state_dir: str, manifest: dict[str, list[str]]) -> None:
+    save_json_file(os.path.join(state_dir, CLASS_MANIFEST_FILE), manifest)
+
+
+def get_staging_dir(state_dir: str) -> str:
+    """Returns the directory javac writes a batch to, before its classes are moved to the output dir."""
+    return os.path.join(state_dir, STAGING_DIR_NAME)
+
+
+def list_class_files(directory: str) -> list[str]:
+    """Lists the .class files under a directory, as paths relative to it."""
+    class_files = []
+    for root, _, files in os.walk(directory):
+        for file in files:
+            if file.endswith(".class"):
+                class_files.append(os.path.relpath(os.path.join(root, file), directory))
+    return sorted(class_files)
+
+
+def attribute_class_files(class_files: list[str], java_group: list[str]) -> dict[str, list[str]]:
+    """
+    Attributes the class files of a compiled batch to the modules of the batch.
+
+    `pack/Outer$Inner.class` and `pack/Outer$1.class` belong to the module of `pack.Outer`.
+    Secondary top level classes (declared in a file of another name) go to the first
+    module of the batch in the same package, or to the first module of the batch.
+
+    Args:
+        class_files (list[str]): Class files produced by the batch, relative to the output dir.
+        java_group (list[str]): Modules of the batch.
+
+    Returns:
+        dict[str, list[str]]: Module -> its class files.
+    """
+    modules = set(java_group)
+    package_modules = {}
+    for module in java_group:
+        package_modules.setdefault(module.rpartition(".")[0], module)
+
+    attributed = {module: [] for module in java_group}
+    for class_file in class_files:
+        top_level_class = class_file[: -len(".class")].split("$", 1)[0].replace(os.sep, ".")
+        if top_level_class in modules:
+            module = top_level_class
+        else:
+            module = package_modules.get(top_level_class.rpartition(".")[0], java_group[0])
+        attributed[module].append(class_file)
+    return attributed
+
+
+def install_staged_classes(staging_dir: str, output_dir: str, class_files: list[str]) -> None:
+    """Moves the classes of a compiled batch from the staging dir into the output dir."""
+    for class_file in class_files:
+        destination = os.path.join(output_dir, class_file)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(os.path.join(staging_dir, class_file), destination)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def remove_class_files(output_dir: str, class_files) -> None:
+    """Deletes class files from the output dir, then the package directories they leave empty."""
+    for class_file in class_files:
+        class_path = os.path.join(output_dir, class_file)
+        try:
+            os.remove(class_path)
+        except FileNotFoundError:
+            continue
+        if DEBUG_:
+            print(f"Removed stale class: {class_file}")
+
+        directory = os.path.dirname(class_path)
+        while directory != output_dir and directory.startswith(output_dir):
+            try:
+                os.rmdir(directory)  # Only succeeds if empty
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+
+
+def update_class_manifest(manifest: dict[str, list[str]], produced: dict[str, list[str]], output_dir: str) -> None:
+    """
+    Records the classes a batch produced and removes the classes its modules no longer produce
+    (deleted nested or anonymous classes, renamed secondary classes...).
+    """
+    stale = set()
+    for module, class_files in produced.items():
+        stale.update(manifest.get(module, []))
+        manifest[module] = class_files
+
+    for class_files in produced.values():
+        stale.difference_update(class_files)
+    if stale:
+        claimed = {class_file for class_files in manifest.values() for class_file in class_files}
+        remove_class_files(output_dir, stale - claimed)  # A class moved to another file is kept
+
+
+def install_batch_classes(staging_dir: str, output_dir: str, manifest: dict[str, list[str]], java_group: list[str]) -> None:
+    """Moves the classes javac wrote to `staging_dir` into the output dir and records them in the manifest."""
+    class_files = list_class_files(staging_dir)
+    install_staged_classes(staging_dir, output_dir, class_files)
+    update_class_manifest(manifest, attribute_class_files(class_files, java_group), output_dir)
+
+
+def remove_orphan_classes(manifest: dict[str, list[str]], module_to_path: dict[str, str], output_dir: str) -> None:
+    """
+    Removes the classes of modules whose source no longer exists (deleted or renamed files).
+
+    Args:
+        manifest (dict): Class manifest of the flavor, updated in place.
+        module_to_path (dict): Every module of the project (not only the ones of this build).
+        output_dir (str): Output directory of the flavor.
+    """
+    orphans = [module for module in manifest if module not in module_to_path or not os.path.exists(module_to_path[module])]
+    if not orphans:
+        return
+
+    stale = set()
+    for module in orphans:
+        stale.update(manifest.pop(module))
+    claimed = {class_file for class_files in manifest.values() for class_file in class_files}
+    remove_class_files(output_dir, stale - claimed)
@@ -0,0 +1,306 @@
+import os
+import time
+import shutil
+import xml.etree.ElementTree as ET
+
+from config import PRINT_OUTPUT, DEBUG_, BYTECODE_DEPENDENCIES, JAVAC_MAX_ERRORS, JAVAC_PROFILE
+from build_flavor import get_javac_flags
+from incremental import get_source_fingerprint, load_build_state, save_build_state
+from incremental import get_compile_reason, record_compiled_batch, record_checked_batch, forget_batches
+from incremental import record_class_dependencies
+from jar_index import get_batch_classpaths, is_missing_class_error
+from class_manifest import load_class_manifest, save_class_manifest, get_staging_dir, install_batch_classes, remove_orphan_classes
+from output_capture import run_captured, get_log_path, replay_log
+from javac_profile import get_javac_jvm_flags
+from maven_model import get_pom_file, load_maven_model
+
+
+def get_javac_command(
+    javac_output_dir: str, output_dir: str, classpath: str, javac_flags: list[str], java_files: list[str], max_errors: int | None = None
+) -> list[str]:
+    """
+    Returns the javac command compiling one batch. The classpath starts with the classes compiled so far.
+    javac stops reporting errors after `max_errors` (-Xmaxerrs), None: its default (100).
+    """
+    compile_cmd = ["javac"]
+    if JAVAC_PROFILE:
+        compile_cmd.extend(get_javac_jvm_flags(len(java_files)))  # -J flags, see javac_profile.py
+    compile_cmd += [
+        "-d",
+        javac_output_dir,  # Set output directory for .class files
+        "-cp",
+        f"{output_dir}:{classpath}",  # Classpath includes compiled files + dependencies
+    ]
+
+    if max_errors is not None:
+        compile_cmd.extend(["-Xmaxerrs", str(max_errors)])
+    compile_cmd.extend(javac_flags)  # -g, --release
+    compile_cmd.extend(java_files)  # Append Java files to compile
+    return compile_cmd
+
+
+def print_keep_going_report(failed_batches: list[tuple[list[str], str]], skipped_batches: list[list[str]], javac_log_path: str) -> None:
+    """Prints every failure of a --keep-going build together, then what wasn't compiled because of them."""
+    for java_group, errors in failed_batches:
+        print(f"\n❌ {', '.join(java_group)}")
+        print(errors)
+    if skipped_batches:
+        skipped_modules = [module for java_group in skipped_batches for module in java_group]
+        shown = ", ".join(skipped_modules[:10]) + (f" and {len(skipped_modules) - 10} more" if len(skipped_modules) > 10 else "")
+        print(f"\n⏭️ Not compiled, they depend on a failed batch: {shown}")
+    print(f"\n❌ Compilation failed: {len(failed_batches)} batches failed, {len(skipped_batches)} skipped (javac output in {javac_log_path})")
+
+
+def compile_project(
+    project_root_path,
+    compilation_order,
+    output_dir,
+    classpath,
+    module_to_path,
+    debug=False,
+    release=None,
+    state_dir=None,
+    dependency_tree=None,
+    module_jars=None,
+    stale_modules=None,
+    recompiled_modules=None,
+    explanation=None,
+    git_changes=None,
+    failure=None,
+    keep_going=False,
+    quiet=False,
+):
+    """
+    Compiles all Java files in the correct dependency order.
+
+    Args:
+        project_root_path (str): Root directory of the project.
+        compilation_order (list[list[str]]): Ordered list of Java modules to compile.
+        output_dir (str): Directory where compiled .class files will be stored.
+        classpath (str): The full classpath string for dependencies.
+        release (int, optional): Target Java release (`javac --release`).
+        state_dir (str, optional): Incremental state directory of the build flavor.
+            When given, batches that are up to date are not recompiled, and the classes
+            each source produces are tracked so stale ones are removed from `output_dir`.
+        dependency_tree (dict, optional): Module dependencies, so only the dependents
+            of recompiled batches get recompiled.
+        module_jars (dict, optional): Module -> JARs its imports need (jar_index.py). When
+            given with `dependency_tree`, each batch is compiled against only the JARs it and
+            its dependencies need, and retried with the full classpath if that isn't enough.
+        stale_modules (set, optional): Modules to recompile even if their sources didn't change
+            (e.g. they import classes of another project that was just recompiled).
+        recompiled_modules (set, optional): Filled with the modules compiled by this call.
+        explanation (BuildExplanation, optional): Records why each batch was compiled or skipped (--explain).
+        git_changes (GitChanges, optional): Sources git knows didn't change aren't stat'ed (change_detection.py).
+        failure (dict, optional): Filled with the failed batch ("batch") and javac's errors ("errors") if compilation fails.
+        keep_going (bool): When a batch fails, keep compiling the batches that don't depend on it
+            (needs `dependency_tree`). The ones that do are skipped, and every failure is reported
+            together at the end.
+        quiet (bool): Print nothing, not even failures (BuildSession: `failure` has the errors).
+    """
+    verbose = PRINT_OUTPUT and not quiet
+    javac_flags = get_javac_flags(debug=debug, release=release)
+    build_state = load_build_state(state_dir, javac_flags, classpath) if state_dir else None
+    if recompiled_modules is None:
+        recompiled_modules = set()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # javac output is streamed to the terminal and to this log (output_capture.py), one log per build
+    javac_log_path = get_log_path(output_dir, f"javac-{os.path.basename(output_dir)}")
+    if os.path.exists(javac_log_path):
+        os.remove(javac_log_path)
+
+    class_manifest = None
+    if state_dir:
+        # Classes of deleted or renamed sources go away, without wiping the output dir
+        class_manifest = load_class_manifest(state_dir)
+        remove_orphan_classes(class_manifest, module_to_path, output_dir)
+        staging_dir = get_staging_dir(state_dir)
+
+    batch_classpaths = None
+    full_classpath_modules = set()  # Batches the trimmed classpath wasn't enough for
+    if module_jars is not None and dependency_tree is not None:
+        batch_classpaths = get_batch_classpaths(classpath, compilation_order, dependency_tree, module_jars)
+        if build_state is not None:
+            full_classpath_modules = set(build_state.get("full_classpath_modules", []))
+
+    keep_going = keep_going and dependency_tree is not None
+    failed_batches = []  # (batch, javac errors), with keep_going
+    skipped_batches = []  # Batches depending on a failed one
+    blocked_modules = {}  # Module of a failed or skipped batch -> module of the failed batch behind it
+
+    for i, java_group in enumerate(compilation_order):
+        blocker = next((dep for module in java_group for dep in dependency_tree.get(module, []) if dep in blocked_modules), None) if blocked_modules else None
+        if blocker is not None:
+            # Its errors would only be consequences of the failed batch
+            skipped_batches.append(java_group)
+            blocked_modules.update(dict.fromkeys(java_group, blocked_modules[blocker]))
+            if explanation is not None:
+                explanation.record_blocked(java_group, blocked_modules[blocker])
+            continue
+
+        reason = {"reason": "not incremental", "module": None, "detail": "no state dir"}
+        if build_state is not None and (not stale_modules or stale_modules.isdisjoint(java_group)):
+            check_start = time.perf_counter()
+            reason = get_compile_reason(java_group, build_state, module_to_path, output_dir, recompiled_modules, dependency_tree, git_changes)
+            if explanation is not None:
+                explanation.add_time("up-to-date checks", time.perf_counter() - check_start)
+            if reason is None:
+                if DEBUG_:
+                    print(f"Up to date: {java_group}")
+                if git_changes is not None:
+                    record_checked_batch(build_state, java_group, git_changes)
+                if explanation is not None:
+                    explanation.record_skipped(java_group)
+                continue
+        elif build_state is not None:
+            stale_module = next(module for module in java_group if module in stale_modules)
+            reason = {"reason": "upstream project recompiled", "module": None, "detail": f"{stale_module} uses its classes"}
+
+        java_files = [module_to_path[module] for module in java_group]  # Get file paths
+        if verbose:
+            print(f"Compiling: {java_files}")
+
+        # Fingerprint before compiling, so an edit made during javac is seen by the next build
+        fingerprints = {module: get_source_fingerprint(module_to_path[module]) for module in java_group}
+
+        batch_classpath = classpath
+        if batch_classpaths is not None and full_classpath_modules.isdisjoint(java_group):
+            batch_classpath = batch_classpaths[i]
+
+        # With a manifest, javac writes to a staging dir so we know exactly which classes the batch produced
+        javac_output_dir = output_dir
+        if class_manifest is not None:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            javac_output_dir = staging_dir
+
+        compile_cmd = get_javac_command(javac_output_dir, output_dir, batch_classpath, javac_flags, java_files, JAVAC_MAX_ERRORS)
+        javac_start = time.perf_counter()
+        echo = verbose and not keep_going
+        trimmed = batch_classpath != classpath
+        if trimmed:
+            # Kept aside, silently: if a JAR is missing, only the retry's output is shown
+            attempt_log_path = f"{javac_log_path}.trimmed"
+            result = run_captured(compile_cmd, attempt_log_path, echo=False)
+        else:
+            result = run_captured(compile_cmd, javac_log_path, echo=echo, append=True)
+
+        retried = trimmed and result.returncode != 0 and is_missing_class_error(result.stderr + result.stdout)
+        if retried:
+            os.remove(attempt_log_path)
+            # A JAR needed indirectly (e.g. the superclass of an imported class) was trimmed
+            compile_cmd[compile_cmd.index("-cp") + 1] = f"{output_dir}:{classpath}"
+            if class_manifest is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            result = run_captured(compile_cmd, javac_log_path, echo=echo, append=True)
+            if result.returncode == 0:
+                if DEBUG_:
+                    print(f"Trimmed classpath wasn't enough for {java_group}, using the full one from now on")
+                full_classpath_modules.update(java_group)
+        elif trimmed:
+            replay_log(attempt_log_path, javac_log_path, echo=echo)  # Compiled, or failed for another reason
+
+        if explanation is not None:
+            javac_seconds = time.perf_counter() - javac_start
+            explanation.add_time("javac", javac_seconds)
+            explanation.record_compiled(java_group, reason, javac_seconds, failed=result.returncode != 0, full_classpath_retry=retried)
+
+        if result.returncode != 0 and keep_going:
+            if class_manifest is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            failed_batches.append((java_group, result.stderr))
+            blocked_modules.update({module: module for module in java_group})
+            continue
+
+        if result.returncode != 0:
+            if build_state is not None:
+                # The failed batch and everything after it must be retried next time
+                forget_batches(build_state, compilation_order[i:])
+                if class_manifest is not None and BYTECODE_DEPENDENCIES:
+                    record_class_dependencies(build_state, output_dir, recompiled_modules, class_manifest)
+                save_build_state(state_dir, build_state)
+            if class_manifest is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                save_class_manifest(state_dir, class_manifest)
+            if failure is not None:
+                failure.update(batch=java_group, errors=result.stderr)
+            if verbose:
+                print(f"❌ Compilation failed! (javac output in {javac_log_path})")  # Already printed as it came
+            return False  # Stop execution if compilation fails
+
+        if class_manifest is not None:
+            install_batch_classes(staging_dir, output_dir, class_manifest, java_group)
+
+        recompiled_modules.update(java_group)
+        if build_state is not None:
+            record_compiled_batch(build_state, java_group, module_to_path, fingerprints, git_changes)
+
+    if build_state is not None:
+        forget_batches(build_state, [java_group for java_group, _ in failed_batches] + skipped_batches)  # Retried next time
+        if batch_classpaths is not None:
+            build_state["full_classpath_modules"] = sorted(full_classpath_modules)
+        if class_manifest is not None and BYTECODE_DEPENDENCIES:
+            # The classes tell what each module really uses, the next builds recompile only those dependents
+            record_class_dependencies(build_state, output_dir, recompiled_modules, class_manifest)
+        save_build_state(state_dir, build_state)
+    if class_manifest is not None:
+        save_class_manifest(state_dir, class_manifest)
+
+    if failed_batches:
+        if failure is not None:
+            failure.update(batch=failed_batches[0][0], errors="\n".join(errors for _, errors in failed_batches))
+        if not quiet:
+            print_keep_going_report(failed_batches, skipped_batches, javac_log_path)
+        return False
+
+    if verbose:
+        print("✅ Compilation successful!")
+    return True  # Indicate successful compilation
+
+
+def extract_classpath_from_xml(classpath_file, project_root: str):
+    """
+    Parses Eclipse .classpath XML and returns:
+    - The absolute path of the output directory.
+    - A Java-compatible classpath string.
+
+    A Maven project without a .classpath is read from its pom.xml instead (see maven_model.py).
+
+    Args:
+        classpath_file (str): Path to the .classpath XML file.
+
+    Returns:
+        tuple: (absolute_output_dir, classpath_string)
+    """
+    project_root = os.path.dirname(classpath_file)  # Get the project root directory
+    pom_path = get_pom_file(classpath_file)
+    if pom_path is not None:
+        model = load_maven_model(pom_path)
+        source_paths = [os.path.join(project_root, src_dir) for src_dir in model.source_dirs]
+        return model.output_dir, ":".join(source_paths + model.classpath)
+
+    tree = ET.parse(classpath_file)
+    root = tree.getroot()
+
+    classpath_entries = []
+    output_dir = None
+
+    for entry in root.findall("classpathentry"):
+        kind = entry.get("kind")
+        path = entry.get("path")
+        if not isinstance(path, str) and not path:
+            raise AssertionError("path inexistant")
+
+        if kind == "src":
+            if path.startswith("/"):
+                continue  # `/OtherProject`: a project of the workspace, its classes are added by workspace.py
+            classpath_entries.append(os.path.join(project_root, path))  # Absolute source directories
+        elif kind == "output":
+            output_dir = os.path.join(project_root, path)  # Ensure absolute path for output directory
+        elif kind == "lib":
+            classpath_entries.append(path)  # External JARs (already absolute)
+
+    if output_dir is None:
+        raise ValueError("No output directory found in .classpath file")
+
+    return output_dir, ":".join(classpath_entries)  # Return absolute output directory & classpath
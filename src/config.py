@@ -1,9 +1,13 @@
 import subprocess
 import os
+import json
+import threading
 import xml.etree.ElementTree as ET
 
 
-CAPTURE_OUTPUT = False  # keep it to false for real time commands
+CAPTURE_OUTPUT = False  # keep it to false for real time commands (when on, the output is streamed and logged in <output_dir>/logs, see output_capture.py)
+CAPTURE_TAIL_LINES = 200  # Last lines of a captured program or javac output kept in memory for error reports
+JAVAC_MAX_ERRORS = None  # Errors javac reports before stopping (-Xmaxerrs, e.g. 20), None: its default (100)
 PRINT_OUTPUT = False  # For the main print output
 DEBUG_ = False  # Show debug statement for this one (More ingrained then print output)
 
@@ -12,6 +16,39 @@ SOCKET_LISTEN = True
 DEBUG_PORT = 5005
 LOCAL_JUNIT_PATH = os.path.expanduser("~/.local/java/junit/")
 
+WARM_JVM = False  # Run programs in a resident JVM (see warm_jvm.py), --warm
+WARM_JVM_IDLE_MINUTES = 30  # The resident JVM exits after being idle that long
+WARM_JVM_MAX_RUNS = 200  # Replace the resident JVM after that many runs
+WARM_JVM_MAX_HEAP_RATIO = 0.6  # Replace it when the heap stays that full after a run
+
+PROFILE_SETTINGS = "profile"  # JFR settings of --profile: "default" (lower overhead), "profile" or a .jfc file
+PROFILE_DURATION = None  # Stop the --profile recording after that long (e.g. "30s"), None: the whole run
+PROFILE_TOP = 10  # Lines of each --profile summary table
+
+PIPELINE = False  # Compile batches while the rest of the graph is still being parsed (see pipeline.py), --pipeline
+TRIM_CLASSPATH = False  # Give each javac batch only the JARs its imports need (see jar_index.py), --trim-classpath
+CHANGE_DETECTION = "auto"  # How changed sources are found: "git" (git status, no stat per file), "stat" or "auto" (git when in a repo)
+PARSE_CACHE = True  # Keep the imports of each file between builds, only parse the changed ones (see parse_cache.py)
+GRAPH_SNAPSHOT = True  # Reuse the dependency graph and compilation order of the last build, patched for the changed files (see graph_snapshot.py)
+SYNC_RESOURCES = True  # Mirror the non .java files of the source dirs into the output dir (see resources.py)
+RESOURCE_EXCLUDE = ["*.java", "*.class", "*.py", "*.pyc", "*.sh", "*.bat"]  # Files of the source dirs that are never resources (fnmatch patterns)
+RESOURCE_LINK = "auto"  # How resources are put in the output dir: "auto" (reflink, else hardlink, else copy), "reflink", "hardlink", "copy"
+EXPLAIN = False  # Report why each batch was (re)compiled and where the build time went (see explain.py), --explain
+KEEP_GOING = False  # On a compile error, still compile every batch that doesn't depend on the failed one and report all errors at the end, --keep-going
+BYTECODE_DEPENDENCIES = True  # Read what each module really uses from its class files, to recompile only those dependents (see class_file.py)
+ENTRY_POINT_INDEX = True  # Keep an index of the main and test classes of the project on every build, for `automake.py query mains/tests` (see entry_points.py)
+COALESCE_BUILDS = True  # A build that waited for another one of the same output dir reuses its result when it covered the same sources (see build_lock.py)
+TEST_SHARDS = os.cpu_count() or 1  # JVMs running test classes at the same time in `automake.py test`, --shards
+RAM_OUTPUT = False  # Build and run from a copy of the output dir in RAM, synced back to the disk in the background (see ram_output.py), --ram
+RAM_OUTPUT_ROOT = "/dev/shm"  # tmpfs holding the RAM output dirs
+MAVEN_OUTPUT_DIR = "automake-classes"  # Output dir of Maven projects without a .classpath, in their build directory (target/), see maven_model.py
+JAVAC_PROFILE = False  # Start javac with JVM flags tuned for short runs: C1 only, serial GC, its own CDS archive, heap sized per batch (see javac_profile.py)
+JAVAC_CDS = False  # Create and use a CDS archive of javac's classes, in ~/.cache/automake/javac_cds (JDK 13+)
+JAVAC_C1_MAX_FILES = 200  # Batches with more files keep the C2 compiler, they run long enough to gain from it
+JAVAC_HEAP_BASE_MB = 64  # Initial javac heap of a batch: this plus JAVAC_HEAP_MB_PER_FILE per file
+JAVAC_HEAP_MB_PER_FILE = 2
+JAVAC_MAX_HEAP_MB = None  # -Xmx of javac (e.g. 2048), None: the JVM default (a quarter of the RAM)
+
 
 def send_notification(title: str, message: str, timeSeconds: float = 5):
     """
@@ -29,6 +66,37 @@ def send_notification(title: str, message: str, timeSeconds: float = 5):
         print("❌ Failed to send notification.")
 
 
+def load_json_file(file_path: str, default=None):
+    """
+    Loads a JSON file, returning `default` if it doesn't exist or is unreadable.
+
+    Args:
+        file_path (str): Path to the JSON file.
+        default: Value returned when the file can't be loaded.
+    """
+    try:
+        with open(file_path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return default
+
+
+def save_json_file(file_path: str, data) -> None:
+    """
+    Writes `data` as JSON atomically (temporary file + rename), so a crash or a
+    concurrent reader never sees a half-written file.
+
+    Args:
+        file_path (str): Path to the JSON file.
+        data: JSON serializable data.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, file_path)
+
+
 def get_system_java_home():
     """
     Returns the system's Java home path by checking `java.home`.
@@ -77,6 +145,8 @@ def parse_classpath(classpath_file, project_root_path):
         path = entry.get("path")
         if not path:
             continue  # Skip if there's no path attribute
+        if entry.get("kind") == "src" and path.startswith("/"):
+            continue  # Reference to another project of the workspace (see workspace.py)
 
         # Replace JRE_CONTAINER with the detected Java home
         if "JRE_CONTAINER" in path and java_home:
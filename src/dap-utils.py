@@ -6,8 +6,10 @@ import xml.etree.ElementTree as ET
 from find_dependency_tree_helper import find_base_directory, get_source_dirs_from_classpath
 from find_dependency_tree import main as get_compilation_order
 
-from automake import execute_java_file, extract_classpath_from_xml, compile_project
+from automake import execute_java_file
+from compiler import extract_classpath_from_xml, compile_project
 from automake import main as automake_function
+from build_flavor import get_build_flavor, get_flavor_output_dir
 
 
 LOCAL_JUNIT_PATH = os.path.expanduser("~/.local/java/junit")
@@ -40,6 +42,17 @@ def get_class_path(java_file_path: str, project_root_path: str, classpath_file:
     return 0
 
 
+def get_output_dir(java_file_path: str, project_root_path: str, classpath_file: str, source_dirs: list[str] = ["src"]) -> int:
+    """Prints the output tree of the debug flavor, the one a debugger session runs from."""
+    try:
+        output_dir, classpath = extract_classpath_from_xml(classpath_file, project_root_path)
+    except:
+        return 1
+
+    print(get_flavor_output_dir(os.path.realpath(output_dir), get_build_flavor(debug=True)))
+    return 0
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Select only one option from the available choices.")
 
@@ -51,6 +64,7 @@ if __name__ == "__main__":
     # Boolean options (only one can be chosen at a time)
     group.add_argument("--mainModule", action="store_true", help="Get the name of the mainModule")
     group.add_argument("--getClassPath", action="store_true", help="Get the Java classpath")
+    group.add_argument("--getOutputDir", action="store_true", help="Get the output dir of the debug build")
 
     # Parse arguments
     args = parser.parse_args()
@@ -59,6 +73,7 @@ if __name__ == "__main__":
     switch = {
         "mainModule": get_mainfile_module_name,
         "getClassPath": get_class_path,
+        "getOutputDir": get_output_dir,
     }
 
     # Ensure a Java file path is provided
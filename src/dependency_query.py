@@ -0,0 +1,366 @@
+import os
+import sys
+import time
+import argparse
+from collections import deque
+
+import numpy as np
+
+from find_dependency_tree_helper import find_base_directory, get_source_dirs_from_classpath
+from find_dependency_tree import generate_dependency_tree, purge_self_dependencies, find_cycles
+from compiler import extract_classpath_from_xml
+from build_flavor import get_state_root
+from incremental import get_source_fingerprint
+from module_registry import build_module_registry, PACKAGE
+from maven_model import get_pom_file
+from parse_cache import ParseCache
+from entry_points import load_entry_points, update_entry_points
+from change_detection import get_source_changes
+from graph_snapshot import get_file_record, is_file_unchanged
+from config import DEBUG_, CHANGE_DETECTION, load_json_file, save_json_file
+
+INDEX_DIR_NAME = "graph"
+INDEX_VERSION = 2
+
+
+def to_csr(rows: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    """Packs adjacency lists into CSR arrays (indptr, indices)."""
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row) for row in rows])
+    indices = np.fromiter((item for row in rows for item in row), dtype=np.int32, count=int(indptr[-1]))
+    return indptr, indices
+
+
+class ReachabilityIndex:
+    """
+    Dependency graph of a whole project with a precomputed transitive closure.
+
+    Modules are numbered 0..n-1. The closure is stored per SCC: row `c` of `reach` is a
+    numpy-packed bitset of every SCC that SCC `c` (transitively) depends on, itself included.
+    Reachability checks are a single bit test, closures one `unpackbits`.
+    """
+
+    def __init__(self, modules, paths, module_scc, forward, reverse, scc_members, reach, sources=None):
+        self.modules = modules  # module id -> module name
+        self.paths = paths  # module id -> Java file path
+        self.module_ids = {module: i for i, module in enumerate(modules)}
+        self.path_ids = {path: i for i, path in enumerate(paths)}
+        self.module_scc = module_scc  # module id -> SCC id
+        self.forward = forward  # CSR (indptr, indices) of direct dependencies
+        self.reverse = reverse  # CSR of direct dependents
+        self.scc_members = scc_members  # CSR of the modules of each SCC
+        self.reach = reach  # (n_scc, ceil(n_scc / 8)) packed bits
+        self.sources = sources  # What the index was built from, see get_index_sources
+
+    @classmethod
+    def from_dependency_tree(cls, dependency_tree: dict[str, list[str]], module_to_path: dict[str, str]):
+        """Builds the index from a (self dependency free) dependency tree."""
+        modules = list(dependency_tree)
+        module_ids = {module: i for i, module in enumerate(modules)}
+        forward_rows = [[module_ids[dep] for dep in dependency_tree[module] if dep in module_ids] for module in modules]
+        reverse_rows = [[] for _ in modules]
+        for i, row in enumerate(forward_rows):
+            for dep in row:
+                reverse_rows[dep].append(i)
+
+        # Tarjan emits an SCC after every SCC it depends on, so one pass in that order fills the closure
+        sccs = find_cycles({i: row for i, row in enumerate(forward_rows)})
+        module_scc = np.empty(len(modules), dtype=np.int32)
+        for scc_id, scc in enumerate(sccs):
+            module_scc[scc] = scc_id
+
+        n_scc = len(sccs)
+        reach = np.zeros((n_scc, (n_scc + 7) // 8), dtype=np.uint8)
+        for scc_id, scc in enumerate(sccs):
+            row = reach[scc_id]
+            row[scc_id >> 3] |= 0x80 >> (scc_id & 7)
+            for dep_scc in {int(module_scc[dep]) for module in scc for dep in forward_rows[module]} - {scc_id}:
+                np.bitwise_or(row, reach[dep_scc], out=row)
+
+        paths = [module_to_path[module] for module in modules]
+        return cls(modules, paths, module_scc, to_csr(forward_rows), to_csr(reverse_rows), to_csr(sccs), reach)
+
+    def save(self, index_dir: str, sources: dict):
+        os.makedirs(index_dir, exist_ok=True)
+        np.savez(
+            os.path.join(index_dir, "graph.npz"),
+            module_scc=self.module_scc,
+            forward_indptr=self.forward[0],
+            forward_indices=self.forward[1],
+            reverse_indptr=self.reverse[0],
+            reverse_indices=self.reverse[1],
+            scc_indptr=self.scc_members[0],
+            scc_indices=self.scc_members[1],
+        )
+        np.save(os.path.join(index_dir, "reach.npy"), self.reach)
+        # Written last: the index is only valid once its metadata points at complete arrays
+        save_json_file(
+            os.path.join(index_dir, "index.json"),
+            {"version": INDEX_VERSION, "sources": sources, "modules": self.modules, "paths": self.paths},
+        )
+
+    @classmethod
+    def load(cls, index_dir: str):
+        """Loads a persisted index, or returns None if it's missing. Whether it's stale is for are_index_sources_unchanged."""
+        metadata = load_json_file(os.path.join(index_dir, "index.json"))
+        if not isinstance(metadata, dict) or metadata.get("version") != INDEX_VERSION:
+            return None
+        try:
+            arrays = np.load(os.path.join(index_dir, "graph.npz"))
+            reach = np.load(os.path.join(index_dir, "reach.npy"), mmap_mode="r")  # Rows are paged in on demand
+        except (OSError, ValueError):
+            return None
+        return cls(
+            metadata["modules"],
+            metadata["paths"],
+            arrays["module_scc"],
+            (arrays["forward_indptr"], arrays["forward_indices"]),
+            (arrays["reverse_indptr"], arrays["reverse_indices"]),
+            (arrays["scc_indptr"], arrays["scc_indices"]),
+            reach,
+            metadata["sources"],
+        )
+
+    def module_id(self, module: str) -> int:
+        """Resolves a module name, or a Java file path, to its id."""
+        if module in self.module_ids:
+            return self.module_ids[module]
+        real_path = os.path.realpath(module)
+        if real_path in self.path_ids:
+            return self.path_ids[real_path]
+        raise KeyError(f"Unknown module: {module}")
+
+    def _row(self, csr, i: int) -> list[str]:
+        indptr, indices = csr
+        return [self.modules[j] for j in indices[indptr[i] : indptr[i + 1]]]
+
+    def _expand_sccs(self, scc_ids) -> list[str]:
+        indptr, indices = self.scc_members
+        return [self.modules[j] for scc_id in scc_ids for j in indices[indptr[scc_id] : indptr[scc_id + 1]]]
+
+    def dependencies(self, module: str) -> list[str]:
+        """Modules `module` directly depends on."""
+        return self._row(self.forward, self.module_id(module))
+
+    def dependents(self, module: str) -> list[str]:
+        """Modules directly depending on `module` (reverse edges)."""
+        return self._row(self.reverse, self.module_id(module))
+
+    def depends_on(self, module: str, dependency: str) -> bool:
+        """Checks if `module` transitively depends on `dependency`."""
+        scc_id = int(self.module_scc[self.module_id(module)])
+        dep_scc = int(self.module_scc[self.module_id(dependency)])
+        return bool(self.reach[scc_id, dep_scc >> 3] & (0x80 >> (dep_scc & 7)))
+
+    def transitive_dependencies(self, module: str) -> list[str]:
+        """Everything `module` transitively pulls in (its closure), without itself."""
+        i = self.module_id(module)
+        scc_ids = np.flatnonzero(np.unpackbits(self.reach[self.module_scc[i]], count=len(self.reach)))
+        return [name for name in self._expand_sccs(scc_ids) if name != self.modules[i]]
+
+    def transitive_dependents(self, module: str) -> list[str]:
+        """Every module whose closure contains `module`, without itself."""
+        i = self.module_id(module)
+        scc_id = int(self.module_scc[i])
+        scc_ids = np.flatnonzero(self.reach[:, scc_id >> 3] & (0x80 >> (scc_id & 7)))
+        return [name for name in self._expand_sccs(scc_ids) if name != self.modules[i]]
+
+    def shortest_path(self, module: str, dependency: str) -> list[str] | None:
+        """
+        Explains why `dependency` is in the closure of `module`.
+
+        Returns:
+            list[str] | None: The shortest dependency chain from `module` to `dependency`,
+            or None if `module` doesn't depend on it.
+        """
+        start, target = self.module_id(module), self.module_id(dependency)
+        if not self.depends_on(module, dependency):
+            return None
+
+        target_scc = int(self.module_scc[target])
+        indptr, indices = self.forward
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(self.modules[node])
+                    node = parents[node]
+                return path[::-1]
+            for dep in indices[indptr[node] : indptr[node + 1]]:
+                dep = int(dep)
+                if dep in parents:
+                    continue
+                dep_scc = int(self.module_scc[dep])
+                if self.reach[dep_scc, target_scc >> 3] & (0x80 >> (target_scc & 7)):  # Prune dead ends
+                    parents[dep] = node
+                    queue.append(dep)
+        return None
+
+
+def get_index_dir(project_root_path: str) -> str:
+    output_dir, _ = extract_classpath_from_xml(f"{project_root_path}/.classpath", project_root_path)
+    return os.path.join(get_state_root(os.path.realpath(output_dir)), INDEX_DIR_NAME)
+
+
+def get_dir_mtime(dir_path: str) -> int | None:
+    try:
+        return os.stat(dir_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_index_sources(registry, source_paths: list[str], project_file: str, git_changes=None) -> dict:
+    """
+    Records what an index is built from: the mtime of every source and package directory (it
+    changes when a file is added, removed or renamed in it), the [fingerprint, head] of every Java
+    file (graph_snapshot.get_file_record) and the fingerprint of the .classpath or pom.xml.
+    """
+    dirs = {path: get_dir_mtime(path) for path in source_paths}
+    dirs.update((registry.path(i), get_dir_mtime(registry.path(i))) for i in range(len(registry)) if registry.kinds[i] == PACKAGE)
+    files = {path: get_file_record(path, git_changes=git_changes) for path in registry.path_to_module if path.endswith(".java")}
+    return {"project_file": [project_file, get_source_fingerprint(project_file)], "dirs": dirs, "files": files}
+
+
+def are_index_sources_unchanged(sources: dict, git_changes=None) -> bool:
+    """
+    Checks the sources of an index without listing the project again: one stat per directory,
+    and one per Java file only when git can't tell it's unchanged.
+    """
+    project_file, fingerprint = sources["project_file"]
+    try:
+        if get_source_fingerprint(project_file) != fingerprint:
+            return False
+        if any(get_dir_mtime(dir_path) != mtime_ns for dir_path, mtime_ns in sources["dirs"].items()):
+            return False
+        return all(is_file_unchanged(path, record, git_changes) for path, record in sources["files"].items())
+    except FileNotFoundError:
+        return False
+
+
+def load_reachability_index(project_root_path: str, rebuild: bool = False) -> ReachabilityIndex:
+    """
+    Returns the reachability index of a project, rebuilding it only when a source changed
+    (are_index_sources_unchanged: the project isn't walked again to find out).
+
+    Args:
+        project_root_path (str): Root directory of the project.
+        rebuild (bool): Ignore the persisted index.
+
+    Returns:
+        ReachabilityIndex: The index over every Java file of the project.
+    """
+    source_dirs = get_source_dirs_from_classpath(f"{project_root_path}/.classpath")
+    git_changes = get_source_changes(project_root_path, source_dirs, CHANGE_DETECTION)
+    index_dir = get_index_dir(project_root_path)
+
+    if not rebuild:
+        index = ReachabilityIndex.load(index_dir)
+        if index is not None and are_index_sources_unchanged(index.sources, git_changes):
+            return index
+
+    registry = build_module_registry(project_root_path, source_dirs)
+    path_to_module, module_to_path = registry.path_to_module, registry.module_to_path
+    java_file_paths = [path for path in path_to_module if path.endswith(".java")]
+    project_file = get_pom_file(f"{project_root_path}/.classpath") or f"{project_root_path}/.classpath"
+    source_paths = [os.path.realpath(os.path.join(project_root_path, src_dir)) for src_dir in source_dirs]
+    sources = get_index_sources(registry, source_paths, project_file, git_changes)  # Before parsing, like the builds
+
+    if DEBUG_:
+        print(f"Building reachability index of {len(java_file_paths)} files")
+    dependency_tree = generate_dependency_tree(
+        java_file_paths, project_root_path, module_to_path, path_to_module, source_dirs, ignore_parse_errors=True
+    )
+    dependency_tree = purge_self_dependencies(dependency_tree)
+    index = ReachabilityIndex.from_dependency_tree(dependency_tree, module_to_path)
+    index.save(index_dir, sources)
+    return index
+
+
+def load_entry_point_index(project_root_path: str, rebuild: bool = False) -> dict[str, dict[str, str]]:
+    """
+    Returns the main and test classes of a project as the last build indexed them (entry_points.py).
+    The index is only built here when there is none yet, or with `rebuild` (then only the files
+    that changed since they were last parsed are parsed).
+    """
+    output_dir, _ = extract_classpath_from_xml(f"{project_root_path}/.classpath", project_root_path)
+    state_root = get_state_root(os.path.realpath(output_dir))
+    entry_points = None if rebuild else load_entry_points(state_root)
+    if entry_points is None:
+        registry = build_module_registry(project_root_path, get_source_dirs_from_classpath(f"{project_root_path}/.classpath"))
+        parse_cache = ParseCache(state_root)
+        entry_points = update_entry_points(state_root, registry.path_to_module, parse_cache)
+        parse_cache.save(registry.path_to_module)
+    return entry_points
+
+
+def query_main(argv: list[str]) -> int:
+    """Entry point of `automake.py query ...`."""
+    parser = argparse.ArgumentParser(prog="automake.py query", description="Query the project dependency graph.")
+    parser.add_argument(
+        "kind",
+        choices=["deps", "rdeps", "closure", "rclosure", "why", "mains", "tests"],
+        help="deps/rdeps: direct dependencies/dependents, closure/rclosure: transitive ones, why: shortest dependency path, "
+        "mains/tests: classes with a main method/JUnit tests (module and path, from the index of the last build)",
+    )
+    parser.add_argument("module", nargs="?", help="Module name (pack.Cat) or Java file path (for mains/tests: only list the ones under this path)")
+    parser.add_argument("target", nargs="?", help="Dependency to explain (for `why`)")
+    parser.add_argument("--project", default=None, help="Project root (default: found from the module path or cwd)")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it's up to date")
+    args = parser.parse_args(argv)
+
+    if args.module is None and args.kind not in ("mains", "tests"):
+        parser.error(f"`{args.kind}` needs a module")
+
+    if args.project:
+        project_root_path = os.path.realpath(args.project)
+    elif args.module is not None and os.path.exists(args.module):
+        project_root_path = find_base_directory(os.path.realpath(args.module))
+    else:
+        project_root_path = find_base_directory(os.path.join(os.getcwd(), "_"))
+
+    if args.kind in ("mains", "tests"):
+        start = time.perf_counter()
+        entry_points = load_entry_point_index(project_root_path, rebuild=args.rebuild)
+        prefix = os.path.realpath(args.module) if args.module is not None else None
+        for module, path in sorted(entry_points[args.kind].items()):
+            if prefix is None or path == prefix or path.startswith(prefix.rstrip(os.sep) + os.sep):
+                print(f"{module}\t{path}")
+        if DEBUG_:
+            print(f"query took {(time.perf_counter() - start) * 1000:.3f} ms")
+        return 0
+
+    index = load_reachability_index(project_root_path, rebuild=args.rebuild)
+
+    start = time.perf_counter()
+    try:
+        if args.kind == "why":
+            if args.target is None:
+                parser.error("`why` needs a target module")
+            result = index.shortest_path(args.module, args.target)
+            if result is None:
+                print(f"{args.module} doesn't depend on {args.target}")
+                return 1
+            print(" -> ".join(result))
+        else:
+            query = {
+                "deps": index.dependencies,
+                "rdeps": index.dependents,
+                "closure": index.transitive_dependencies,
+                "rclosure": index.transitive_dependents,
+            }[args.kind]
+            for module in sorted(query(args.module)):
+                print(module)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+
+    if DEBUG_:
+        print(f"query took {(time.perf_counter() - start) * 1000:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(query_main(sys.argv[1:]))
@@ -0,0 +1,51 @@
+import os
+
+from config import DEBUG_, load_json_file, save_json_file
+
+ENTRY_POINTS_FILE = "entry_points.json"
+
+
+def update_entry_points(state_root: str, path_to_module, parse_cache) -> dict[str, dict[str, str]]:
+    """
+    Brings the index of the main classes and JUnit test classes of a project up to date
+    (<output_dir>/.automake/entry_points.json).
+
+    It comes from the parse cache, the same per file analysis as the dependency graph: a file is
+    only parsed again when it changed since it was last read, by a build or by this (files that
+    don't parse too: the parse cache keeps their error). Builds call it after releasing the build lock.
+
+    Args:
+        state_root (str): Project state directory (get_state_root).
+        path_to_module (Mapping): Module maps of the whole project.
+        parse_cache (ParseCache): Parse cache of the project.
+
+    Returns:
+        dict: {"mains": {module: path}, "tests": {module: path}}
+    """
+    entry_points = {"mains": {}, "tests": {}}
+    for path, module in path_to_module.items():
+        if not path.endswith(".java"):
+            continue
+        try:
+            entry = parse_cache.get_entry(path)
+        except Exception:
+            continue  # Not parsable (e.g. module-info.java), not an entry point
+        if entry["main"]:
+            entry_points["mains"][module] = path
+        if entry["tests"]:
+            entry_points["tests"][module] = path
+
+    index_path = os.path.join(state_root, ENTRY_POINTS_FILE)
+    if load_json_file(index_path) != entry_points:
+        save_json_file(index_path, entry_points)
+        if DEBUG_:
+            print(f"Entry points: {len(entry_points['mains'])} mains, {len(entry_points['tests'])} test classes")
+    return entry_points
+
+
+def load_entry_points(state_root: str) -> dict[str, dict[str, str]] | None:
+    """Returns the index as the last build left it (nothing is parsed or stat'ed), None if there is none."""
+    entry_points = load_json_file(os.path.join(state_root, ENTRY_POINTS_FILE))
+    if not isinstance(entry_points, dict) or not {"mains", "tests"} <= entry_points.keys():
+        return None
+    return entry_points
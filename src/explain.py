@@ -0,0 +1,165 @@
+import os
+import time
+from collections import defaultdict
+
+from config import save_json_file
+
+EXPLAIN_JSON_FILE = "explain.json"
+EXPLAIN_REPORT_FILE = "explain.txt"
+EXPLAIN_TOP = 10  # Lines of the root cause and slowest batch tables
+
+
+class BuildExplanation:
+    """
+    Records what a build did with each batch and why (--explain).
+
+    Every batch is either "skipped" (up to date), "compiled", "failed" or "blocked" (not compiled
+    because it depends on a failed batch, with --keep-going). Compiled batches keep the
+    reason they were compiled for, the javac time, and the root cause: the change that started the
+    chain of recompilations reaching them (a "dependency recompiled" reason is followed back to the
+    batch that changed first), which is how a hub class making large rebuilds shows up.
+    """
+
+    def __init__(self, reset_reason: dict | None = None):
+        self.reset_reason = reset_reason  # Why the whole incremental state was dropped, if it was
+        self.batches: list[dict] = []
+        self.phases: dict[str, float] = defaultdict(float)  # phase -> seconds
+        self.root_causes: dict[str, str] = {}  # recompiled module -> root cause label
+        self.start = time.perf_counter()
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        self.phases[phase] += seconds
+
+    def record_skipped(self, java_group: list[str]) -> None:
+        self.batches.append({"modules": list(java_group), "status": "skipped", "reason": None, "root_cause": None, "seconds": 0.0})
+
+    def record_blocked(self, java_group: list[str], failed_module: str) -> None:
+        """Records a batch not given to javac because it depends on the failed batch of `failed_module`."""
+        reason = {"reason": "dependency failed", "module": failed_module, "detail": f"depends on {failed_module}"}
+        self.batches.append({"modules": list(java_group), "status": "blocked", "reason": reason, "root_cause": failed_module, "seconds": 0.0})
+
+    def record_compiled(self, java_group: list[str], reason: dict, seconds: float, failed: bool = False, full_classpath_retry: bool = False) -> None:
+        """
+        Records a batch given to javac.
+
+        Args:
+            java_group (list[str]): Modules of the batch.
+            reason (dict): {"reason", "module", "detail"}, from incremental.get_compile_reason or
+                get_build_state_reset_reason.
+            seconds (float): Time spent in javac (retries included).
+            failed (bool): javac failed.
+            full_classpath_retry (bool): The trimmed classpath wasn't enough, javac ran a second time.
+        """
+        if reason["reason"] == "new source" and self.reset_reason is not None:
+            reason = self.reset_reason  # Not new, everything is recompiled because of that
+
+        if reason["reason"] == "dependency recompiled" and reason["module"] is not None:
+            root_cause = self.root_causes.get(reason["module"], reason["module"])
+        elif reason["module"] is not None:
+            root_cause = reason["module"]
+        else:
+            root_cause = f"({reason['reason']})"
+        if not failed:
+            for module in java_group:
+                self.root_causes[module] = root_cause
+
+        self.batches.append(
+            {
+                "modules": list(java_group),
+                "status": "failed" if failed else "compiled",
+                "reason": reason,
+                "root_cause": root_cause,
+                "seconds": round(seconds, 4),
+                "full_classpath_retry": full_classpath_retry,
+            }
+        )
+
+    def get_root_cause_table(self) -> list[dict]:
+        """Root causes sorted by the javac time they cost: [{"root_cause", "batches", "files", "seconds"}]."""
+        table = {}
+        for batch in self.batches:
+            if batch["status"] in ("skipped", "blocked"):
+                continue
+            row = table.setdefault(batch["root_cause"], {"root_cause": batch["root_cause"], "batches": 0, "files": 0, "seconds": 0.0})
+            row["batches"] += 1
+            row["files"] += len(batch["modules"])
+            row["seconds"] += batch["seconds"]
+        return sorted(table.values(), key=lambda row: (-row["seconds"], -row["files"], row["root_cause"]))
+
+    def to_json(self) -> dict:
+        statuses = defaultdict(int)
+        for batch in self.batches:
+            statuses[batch["status"]] += 1
+        return {
+            "total_seconds": round(time.perf_counter() - self.start, 4),
+            "phases": {phase: round(seconds, 4) for phase, seconds in self.phases.items()},
+            "reset_reason": self.reset_reason,
+            "counts": dict(statuses),
+            "root_causes": self.get_root_cause_table(),
+            "batches": self.batches,
+        }
+
+    def format_report(self, top: int = EXPLAIN_TOP) -> str:
+        report = self.to_json()
+        counts = report["counts"]
+        lines = [
+            f"Build: {len(self.batches)} batches, {counts.get('compiled', 0)} compiled, "
+            f"{counts.get('skipped', 0)} up to date, {counts.get('failed', 0)} failed, {report['total_seconds']:.2f}s"
+        ]
+        if counts.get("blocked"):
+            lines[0] += f" ({counts['blocked']} not compiled, they depend on a failed batch)"
+        if report["phases"]:
+            lines.append("Time: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in report["phases"].items()))
+        if self.reset_reason is not None:
+            lines.append(f"Everything was recompiled: {self.reset_reason['reason']} ({self.reset_reason['detail']})")
+
+        if report["root_causes"]:
+            lines.append("\nWhat triggered the recompilations:")
+            for row in report["root_causes"][:top]:
+                lines.append(f"  {row['seconds']:7.2f}s  {row['batches']:4} batches  {row['files']:5} files  {row['root_cause']}")
+
+        compiled = sorted((batch for batch in self.batches if batch["status"] in ("compiled", "failed")), key=lambda batch: -batch["seconds"])
+        if compiled:
+            lines.append("\nSlowest batches:")
+            for batch in compiled[:top]:
+                lines.append(f"  {batch['seconds']:7.2f}s  {format_batch(batch['modules'])}")
+
+        lines.append("\nBatches (in compilation order):")
+        for batch in self.batches:
+            if batch["status"] == "skipped":
+                lines.append(f"  ⏭️ {format_batch(batch['modules'])}: up to date")
+                continue
+            if batch["status"] == "blocked":
+                lines.append(f"  ⛔ {format_batch(batch['modules'])}: not compiled, {batch['reason']['detail']} (failed)")
+                continue
+            icon = "❌" if batch["status"] == "failed" else "🔨"
+            reason = batch["reason"]
+            line = f"  {icon} {format_batch(batch['modules'])}: {reason['reason']} ({reason['detail']}), {batch['seconds']:.2f}s"
+            if batch["root_cause"] not in (reason["module"], f"({reason['reason']})"):
+                line += f", root cause {batch['root_cause']}"
+            if batch["full_classpath_retry"]:
+                line += ", retried with the full classpath"
+            lines.append(line)
+        return "\n".join(lines) + "\n"
+
+    def save(self, state_dir: str) -> str:
+        """Writes explain.json and explain.txt to the state dir. Returns the path of the text report."""
+        os.makedirs(state_dir, exist_ok=True)
+        save_json_file(os.path.join(state_dir, EXPLAIN_JSON_FILE), self.to_json())
+        report_path = os.path.join(state_dir, EXPLAIN_REPORT_FILE)
+        with open(report_path, "w") as file:
+            file.write(self.format_report())
+        return report_path
+
+
+def format_batch(modules: list[str]) -> str:
+    return modules[0] if len(modules) == 1 else f"{modules[0]} (+{len(modules) - 1} in cycle)"
+
+
+def print_explanation(explanation: BuildExplanation, state_dir: str, top: int = 5) -> None:
+    """Saves the explanation and prints its summary (the full report is in the state dir)."""
+    report_path = explanation.save(state_dir)
+    summary = explanation.format_report(top=top).split("\nBatches (in compilation order):")[0]
+    print("\n------------------------ Explain ------------------------------")
+    print(summary.rstrip())
+    print(f"\n📝 Full report: {report_path} (and {EXPLAIN_JSON_FILE})")
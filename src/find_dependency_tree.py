@@ -2,8 +2,10 @@
 import os
 import sys
 import numpy as np
+import javalang
 from find_dependency_tree_helper import *
 from java_file_analyser import *
+from module_registry import build_module_registry
 
 from collections import defaultdict, deque
 from config import CAPTURE_OUTPUT, send_notification, PRINT_OUTPUT, DEBUG_, DEBUG_PORT
@@ -74,20 +76,85 @@ def module_to_path(project_root_path: str, source_dirs: list[str], direct_depend
     return output_dict
 
 
+def get_module_dependencies(
+    module: str,
+    module_to_path: dict[str, str],
+    path_to_module: dict[str, str],
+    ignore_parse_errors: bool = False,
+    external_imports: dict[str, list[str]] | None = None,
+    parse_cache=None,
+) -> list[str]:
+    """
+    Parses one module and returns the project modules it directly depends on.
+
+    Args:
+        module (str): Module name.
+        module_to_path (dict): Module name to path.
+        path_to_module (dict): Path to module name.
+        ignore_parse_errors (bool): Give a file javalang can't parse no dependencies instead of failing.
+        external_imports (dict, optional): Filled with the library imports of the module.
+        parse_cache (ParseCache, optional): Reuses the imports of files that didn't change (parse_cache.py).
+
+    Returns:
+        list[str]: Interned names of its dependencies (self dependencies included).
+    """
+    current_path = module_to_path[module]
+
+    if DEBUG_:
+        print(f"Processing module: {module} ({current_path})")
+
+    # Analyze the file
+    try:
+        if parse_cache is not None:
+            tree_ast = parse_cache.get_header(current_path)
+        else:
+            tree_ast, content = parse_java_file(current_path)
+    except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError):
+        if not ignore_parse_errors:
+            raise
+        print(f"⚠️ Could not parse {current_path}, ignoring its dependencies")
+        return []
+    imports = get_imports(tree_ast, module_to_path, path_to_module)
+    package = get_package(tree_ast)
+    if external_imports is not None:
+        external_imports[module] = get_external_imports(tree_ast, module_to_path)
+
+    if DEBUG_:
+        print(f"package = {package}, {type(package)}")
+        print(f"imports = {imports}")
+    # Not using method calls or instantiations
+    # package, imports, method_calls, instantiations = analyze_java_file(current_path)
+
+    # Determine dependencies (interned, so the same module name is only stored once)
+    module_dependency_names = [sys.intern(dep) for dep in find_file_dependencies_simple(package, imports, path_to_module, module_to_path)]
+
+    if DEBUG_:
+        print(f"module_dependency_names = {module_dependency_names}")
+    return module_dependency_names
+
+
 def generate_dependency_tree(
-    java_file_path: str,
+    java_file_path: str | list[str],
     project_root_path: str,
     module_to_path: dict[str, str],
     path_to_module: dict[str, str],
     source_dirs: list[str] = ["src"],
+    ignore_parse_errors: bool = False,
+    external_imports: dict[str, list[str]] | None = None,
+    parse_cache=None,
 ) -> dict[str, list[str]]:
     """
     Generates a dependency tree for a given Java file using iterative tree traversal (BFS).
 
     Args:
-        java_file_path (str): Path to the root Java file.
+        java_file_path (str | list[str]): Path to the root Java file. With several roots,
+            their closures are merged into one tree and shared files are only parsed once.
         project_root_path (str): Root directory of the Java project.
         modules_to_path_dict (dict, optional): Caching dictionary for module-to-path mapping.
+        ignore_parse_errors (bool): Give files javalang can't parse (e.g. module-info.java)
+            no dependencies instead of failing. Used when scanning a whole project.
+        external_imports (dict, optional): Filled with the library imports of each module.
+        parse_cache (ParseCache, optional): Reuses the imports of files that didn't change.
 
     Returns:
         dict: A hierarchical dependency tree.
@@ -98,10 +165,12 @@ def generate_dependency_tree(
     # Initialize queue for BFS traversal
     queue = deque()
 
-    # Get module name for the root Java file
-    module_name = path_to_module[java_file_path]
-    module_to_path[module_name] = java_file_path
-    queue.append(module_name)
+    # Get module name for the root Java file(s)
+    java_file_paths = [java_file_path] if isinstance(java_file_path, str) else java_file_path
+    for root_file_path in java_file_paths:
+        module_name = path_to_module[root_file_path]
+        module_to_path[module_name] = root_file_path
+        queue.append(module_name)
 
     visited = set()
 
@@ -113,28 +182,14 @@ def generate_dependency_tree(
             continue
 
         visited.add(current_module)
-        current_path = module_to_path[current_module]
-
-        if DEBUG_:
-            print(f"Processing module: {current_module} ({current_path})")
-
-        # Analyze the file
-
-        tree_ast, content = parse_java_file(current_path)
-        imports = get_imports(tree_ast, module_to_path, path_to_module)
-        package = get_package(tree_ast)
-
-        if DEBUG_:
-            print(f"package = {package}, {type(package)}")
-            print(f"imports = {imports}")
-        # Not using method calls or instantiations
-        # package, imports, method_calls, instantiations = analyze_java_file(current_path)
-
-        # Determine dependencies
-        module_dependency_names = find_file_dependencies_simple(package, imports, path_to_module, module_to_path)
-
-        if DEBUG_:
-            print(f"module_dependency_names = {module_dependency_names}")
+        module_dependency_names = get_module_dependencies(
+            current_module,
+            module_to_path,
+            path_to_module,
+            ignore_parse_errors=ignore_parse_errors,
+            external_imports=external_imports,
+            parse_cache=parse_cache,
+        )
         dependency_tree_modules[current_module] = module_dependency_names
 
         # Add new dependencies to the queue
@@ -168,53 +223,82 @@ from collections import deque
 from collections import defaultdict, deque
 
 
-def find_cycles(dependency_tree):
+def iter_sccs(roots, get_dependencies):
     """
-    Detects cycles in the dependency tree using Tarjan's Strongly Connected Components (SCC) algorithm.
+    Yields the strongly connected components of a graph discovered lazily from `roots`.
+
+    This is Tarjan's algorithm, iterative so deep dependency chains don't hit Python's
+    recursion limit. `get_dependencies(node)` is only called when a node is first reached,
+    and an SCC is yielded as soon as its whole subgraph has been explored: it always comes
+    after every SCC it depends on, while the rest of the graph is still undiscovered.
 
     Args:
-        dependency_tree (dict): A dictionary mapping modules to their dependencies.
+        roots (iterable): Nodes to start from.
+        get_dependencies (callable): node -> list of the nodes it depends on.
 
-    Returns:
-        list of lists: Each inner list is a group of files that must be compiled together.
+    Yields:
+        list: A group of nodes that must be compiled together.
     """
     index = 0
     stack = []
     indices = {}
     lowlinks = {}
     on_stack = set()
-    sccs = []
 
-    def strongconnect(node):
+    def visit(node):
         nonlocal index
         indices[node] = index
         lowlinks[node] = index
         index += 1
         stack.append(node)
         on_stack.add(node)
+        work.append((node, iter(get_dependencies(node))))
 
-        for neighbor in dependency_tree.get(node, []):
-            if neighbor not in indices:
-                strongconnect(neighbor)
-                lowlinks[node] = min(lowlinks[node], lowlinks[neighbor])
-            elif neighbor in on_stack:
-                lowlinks[node] = min(lowlinks[node], indices[neighbor])
+    for root in roots:
+        if root in indices:
+            continue
+
+        work = []  # Explicit call stack of (node, remaining neighbors)
+        visit(root)
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in indices:
+                    visit(neighbor)
+                    break  # Descend, come back to the remaining neighbors later
+                elif neighbor in on_stack:
+                    lowlinks[node] = min(lowlinks[node], indices[neighbor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlinks[parent] = min(lowlinks[parent], lowlinks[node])
+
+                if lowlinks[node] == indices[node]:
+                    scc = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.remove(w)
+                        scc.append(w)
+                        if w == node:
+                            break
+                    yield scc
 
-        if lowlinks[node] == indices[node]:
-            scc = []
-            while True:
-                w = stack.pop()
-                on_stack.remove(w)
-                scc.append(w)
-                if w == node:
-                    break
-            sccs.append(scc)
 
-    for node in dependency_tree:
-        if node not in indices:
-            strongconnect(node)
+def find_cycles(dependency_tree):
+    """
+    Detects cycles in the dependency tree using Tarjan's Strongly Connected Components (SCC) algorithm.
 
-    return sccs
+    SCCs are returned in the order Tarjan completes them: an SCC always comes after every
+    SCC it depends on.
+
+    Args:
+        dependency_tree (dict): A dictionary mapping modules to their dependencies.
+
+    Returns:
+        list of lists: Each inner list is a group of files that must be compiled together.
+    """
+    return list(iter_sccs(dependency_tree, lambda node: dependency_tree.get(node, [])))
 
 
 def get_compilation_batches(dependency_tree):
@@ -234,34 +318,35 @@ def get_compilation_batches(dependency_tree):
     # Step 1: Detect strongly connected components (cycles)
     sccs = find_cycles(dependency_tree)
 
-    # Create a mapping of modules to their SCC group
+    # Create a mapping of modules to the index of their SCC group
     module_to_scc = {}
-    for scc in sccs:
+    for scc_index, scc in enumerate(sccs):
         for module in scc:
-            module_to_scc[module] = tuple(scc)  # Use a tuple for immutability
+            module_to_scc[module] = scc_index
 
-    # Step 2: Build a new DAG (dependency graph) of SCCs
-    scc_graph = defaultdict(set)
-    scc_in_degree = {scc: 0 for scc in map(tuple, sccs)}
+    # Step 2: Build a new DAG (dependency graph) of SCCs (dicts as ordered sets, for a stable order)
+    scc_graph = [{} for _ in sccs]
 
     for module, dependencies in dependency_tree.items():
+        module_scc = module_to_scc[module]
         for dep in dependencies:
-            if module_to_scc[module] != module_to_scc[dep]:  # Ignore internal cycle dependencies
-                scc_graph[module_to_scc[module]].add(module_to_scc[dep])
+            dep_scc = module_to_scc[dep]
+            if module_scc != dep_scc:  # Ignore internal cycle dependencies
+                scc_graph[module_scc][dep_scc] = None
 
     # Step 3: Compute topological ordering of SCCs
-    scc_in_degree = {scc: 0 for scc in map(tuple, sccs)}
-    for deps in scc_graph.values():
+    scc_in_degree = [0] * len(sccs)
+    for deps in scc_graph:
         for dep in deps:
             scc_in_degree[dep] += 1
 
     # Start with SCCs that have no incoming dependencies
-    queue = deque([scc for scc in scc_in_degree if scc_in_degree[scc] == 0])
+    queue = deque([scc for scc in range(len(sccs)) if scc_in_degree[scc] == 0])
     compilation_batches = []
 
     while queue:
         scc = queue.popleft()
-        compilation_batches.append(list(scc))  # Each SCC is compiled together
+        compilation_batches.append(sccs[scc])  # Each SCC is compiled together
 
         for neighbor in scc_graph[scc]:
             scc_in_degree[neighbor] -= 1
@@ -271,12 +356,25 @@ def get_compilation_batches(dependency_tree):
     return compilation_batches[::-1]
 
 
-def main(java_file_path: str, project_root_path: str):
+def analyse_project(java_file_path: str | list[str], project_root_path: str, parse_cache=None, registry=None) -> dict:
+    """
+    Runs the whole analysis for a Java file: module maps, dependency tree and compilation batches.
+
+    Args:
+        java_file_path (str | list[str]): Path to the root Java file, or several entry files
+            whose closures are merged into one graph and compiled together.
+        project_root_path (str): Root directory of the Java project.
+        parse_cache (ParseCache, optional): Only parse the files that changed since the cache was written.
+        registry (ModuleRegistry, optional): Module registry of the project, if it's already built.
 
-    module_to_path_dict = {}
+    Returns:
+        dict: {"compilation_order", "dependency_tree", "module_to_path", "path_to_module", "source_dirs", "external_imports"}
+    """
     classpath = f"{project_root_path}/.classpath"
     source_dirs = get_source_dirs_from_classpath(classpath)
-    path_to_module, module_to_path = build_project_module_maps(project_root_path, source_dirs)
+    if registry is None:
+        registry = build_module_registry(project_root_path, source_dirs)
+    path_to_module, module_to_path = registry.path_to_module, registry.module_to_path
 
     if DEBUG_:
         print(f"path_to_module =\n{path_to_module}\n")
@@ -295,7 +393,12 @@ def main(java_file_path: str, project_root_path: str):
     if DEBUG_:
         print("\n\n")
 
-    dependency_tree = generate_dependency_tree(java_file_path, project_root_path, module_to_path, path_to_module, source_dirs)
+    external_imports = {}
+    dependency_tree = generate_dependency_tree(
+        java_file_path, project_root_path, module_to_path, path_to_module, source_dirs, external_imports=external_imports, parse_cache=parse_cache
+    )
+
+    # Module names are the registry's interned strings, the tree and the batches share them
     dependency_tree = purge_self_dependencies(dependency_tree)
 
     # Print the tree structure for DEBUG_ging
@@ -308,7 +411,19 @@ def main(java_file_path: str, project_root_path: str):
         print("\n")
         print(f"compilation_order = {compilation_order}")
 
-    return compilation_order, module_to_path, path_to_module
+    return {
+        "compilation_order": compilation_order,
+        "dependency_tree": dependency_tree,
+        "module_to_path": module_to_path,
+        "path_to_module": path_to_module,
+        "source_dirs": source_dirs,
+        "external_imports": external_imports,
+    }
+
+
+def main(java_file_path: str, project_root_path: str):
+    analysis = analyse_project(java_file_path, project_root_path)
+    return analysis["compilation_order"], analysis["module_to_path"], analysis["path_to_module"]
 
 
 if __name__ == "__main__":
@@ -9,6 +9,8 @@ from typing import Tuple
 # from graphviz import Digraph
 
 from config import DEBUG_
+from module_registry import build_module_registry
+from maven_model import get_pom_file, load_maven_model
 
 # List of files indicating the root of a Java project
 PROJECT_ROOT_FILES = {".git", "pom.xml", "build.gradle", "build.xml", ".classpath", ".project"}
@@ -34,10 +36,17 @@ def find_base_directory(java_file, max_depth=10):
 
 
 def get_source_dirs_from_classpath(classpath_file) -> list[str]:
-    """Parses .classpath to extract source directories."""
+    """Parses .classpath to extract source directories (pom.xml when there's no .classpath, see maven_model.py)."""
+    pom_path = get_pom_file(classpath_file)
+    if pom_path is not None:
+        source_dirs = load_maven_model(pom_path).source_dirs
+        if len(source_dirs) == 0:
+            raise AssertionError(f"\n\nSource dirs are empty, there's no source dir in {pom_path}\n\n")
+        return source_dirs
     tree = ET.parse(classpath_file)
     root = tree.getroot()
     source_dirs: list[str] = [str(entry.get("path")) for entry in root.findall(".//classpathentry[@kind='src']")]
+    source_dirs = [src_dir for src_dir in source_dirs if not src_dir.startswith("/")]  # `/OtherProject` is a project reference
     if len(source_dirs) == 0:
         raise AssertionError("\n\nSource dirs are empty, there's no source dir in classpath. Assuming src\n\n")
     return source_dirs
@@ -46,76 +55,26 @@ def get_source_dirs_from_classpath(classpath_file) -> list[str]:
 def build_project_module_maps(project_root_path, source_dirs):
     """
     Scans the project source directories and builds:
-    1. A dictionary mapping Java file paths to module names.
-    2. A dictionary mapping package directories to package names.
+    1. A mapping of Java file paths to module names.
+    2. A mapping of package directories to package names.
     3. Ensures module names do not contain `src.` or `mysrc.` prefixes.
     4. Uses real paths to avoid relative path issues.
 
+    Both mappings are dict-like views over one compact ModuleRegistry (see module_registry.py),
+    which interns every module name once and doesn't store the paths.
+
     Args:
         project_root_path (str): Root directory of the project.
         source_dirs (list[str]): List of source directories to scan.
 
     Returns:
-        tuple: (dict[path -> module], dict[module -> path])
+        tuple: (mapping[path -> module], mapping[module -> path])
 
     Raises:
         ValueError: If two different source directories contain the same package name.
     """
-    path_to_module = {}  # Maps Java file paths & package directories to module/package names
-    module_to_path = {}  # Maps module/package names to Java file paths & package directories
-    package_dirs = {}  # Track package directories to detect duplicates
-
-    for src_dir in source_dirs:
-        src_path = os.path.realpath(os.path.join(project_root_path, src_dir))  # Use realpath for consistency
-
-        if not os.path.exists(src_path):
-            continue  # Skip non-existent source directories
-
-        for root, _, files in os.walk(src_path):
-            root = os.path.realpath(root)  # Normalize root path
-
-            # Compute package name relative to the src_dir
-            relative_dir_path = os.path.relpath(root, src_path)
-            package_name = relative_dir_path.replace(os.sep, ".") if relative_dir_path != "." else ""
-
-            # Ensure no duplicate package exists in different source directories
-            if package_name and package_name in package_dirs and package_dirs[package_name] != root:
-                raise ValueError(
-                    f"Error: Package '{package_name}' exists in multiple source directories: " f"{package_dirs[package_name]} and {root}"
-                )
-
-            # Store package directory (only if it's a package, not the root)
-            if package_name:
-                package_dirs[package_name] = root
-                path_to_module[root] = package_name  # Directory to package name
-                module_to_path[package_name] = root  # Package name to directory
-
-            for file in files:
-                if not file.endswith(".java"):  # Skip non-Java files
-                    continue
-
-                file_path = os.path.realpath(os.path.join(root, file))  # Use realpath
-
-                # Convert file path to module name (without src. or mysrc. prefix)
-                relative_path = os.path.relpath(file_path, src_path)
-                module_name = relative_path.replace(os.sep, ".").replace(".java", "")  # Convert path to dot notation
-
-                # If the file is directly inside `src/` or `mysrc/`, use only the filename
-                if package_name == "":
-                    module_name = file.replace(".java", "")
-
-                # Populate dictionaries
-                path_to_module[file_path] = module_name
-
-                # Check for duplicate module definitions
-                if module_name in module_to_path:
-                    raise ValueError(
-                        f"Error: Module '{module_name}' is defined in multiple locations: " f"{module_to_path[module_name]} and {file_path}"
-                    )
-
-                module_to_path[module_name] = file_path
-
-    return path_to_module, module_to_path
+    registry = build_module_registry(project_root_path, source_dirs)
+    return registry.path_to_module, registry.module_to_path
 
 
 def find_file_dependencies(java_file_path, package, imports, method_calls, base_dir=".") -> dict:
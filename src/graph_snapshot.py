@@ -0,0 +1,234 @@
+import os
+import sys
+import marshal
+import hashlib
+import threading
+
+from find_dependency_tree import analyse_project, get_module_dependencies, get_compilation_batches
+from find_dependency_tree_helper import get_source_dirs_from_classpath
+from module_registry import build_module_registry
+from incremental import get_source_fingerprint
+from config import DEBUG_
+
+GRAPH_SNAPSHOT_DIR = "graph"
+GRAPH_SNAPSHOT_VERSION = 1
+
+
+def get_snapshot_path(state_root: str, roots: list[str]) -> str:
+    """Returns the snapshot file of a set of entry modules (one snapshot per set of entries)."""
+    key = hashlib.sha1("\n".join(sorted(roots)).encode()).hexdigest()[:16]
+    return os.path.join(state_root, GRAPH_SNAPSHOT_DIR, f"{key}.marshal")
+
+
+def get_registry_fingerprint(registry) -> str:
+    """Fingerprint of the modules of a project: changes when a file or package is added, removed or moved."""
+    digest = hashlib.blake2b(digest_size=16)
+    for values in (registry.source_roots, sorted(registry.names), sorted(registry.path_overrides.values())):
+        digest.update("\0".join(values).encode())
+        digest.update(b"\1")
+    return digest.hexdigest()
+
+
+def load_graph_snapshot(snapshot_path: str) -> dict | None:
+    try:
+        with open(snapshot_path, "rb") as file:
+            snapshot = marshal.load(file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != (GRAPH_SNAPSHOT_VERSION, marshal.version, sys.version_info[:2]):
+        return None
+    return snapshot
+
+
+def save_graph_snapshot(snapshot_path: str, snapshot: dict) -> None:
+    os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+    tmp_path = f"{snapshot_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        marshal.dump(snapshot, file)
+    os.replace(tmp_path, snapshot_path)
+
+
+def get_file_record(java_file_path: str, parse_cache=None, git_changes=None) -> list:
+    """Returns [fingerprint, head] of a source, as when its imports were read (from the parse cache if it has it)."""
+    entry = parse_cache.entries.get(java_file_path) if parse_cache is not None else None
+    if entry is not None:
+        return [entry["fingerprint"], entry["head"]]
+    head = git_changes.get_head_for(java_file_path) if git_changes is not None else None
+    return [get_source_fingerprint(java_file_path), head]
+
+
+def is_file_unchanged(java_file_path: str, record: list, git_changes=None) -> bool:
+    fingerprint, head = record
+    if git_changes is not None and git_changes.is_unchanged_since(java_file_path, head):
+        return True
+    return fingerprint == get_source_fingerprint(java_file_path)
+
+
+def patch_compilation_order(
+    compilation_order: list[list[str]], dependency_tree: dict[str, list[str]], changed_modules: set[str], new_modules: list[str]
+) -> list[list[str]]:
+    """
+    Updates a compilation order after the dependencies of some modules changed, recomputing only
+    the batches that can be affected.
+
+    Batches are ordered dependencies first, so every unchanged edge goes to an earlier batch. The
+    batches before the first changed module, and after the last batch a changed (or new) module
+    now depends on, keep their place: a new cycle or a split cycle can only involve the batches
+    in between, which are recomputed (SCCs and topological order) with the new modules.
+
+    Args:
+        compilation_order (list[list[str]]): Previous order, modules that are gone already removed.
+        dependency_tree (dict): Current dependencies (self dependencies purged).
+        changed_modules (set[str]): Existing modules whose dependencies changed.
+        new_modules (list[str]): Modules that weren't in the previous order.
+
+    Returns:
+        list[list[str]]: The new order.
+    """
+    if not changed_modules and not new_modules:
+        return compilation_order
+
+    batch_index = {module: i for i, java_group in enumerate(compilation_order) for module in java_group}
+    start = min((batch_index[module] for module in changed_modules), default=len(compilation_order))
+    end = max((batch_index[module] for module in changed_modules), default=start - 1)
+    for module in list(changed_modules) + new_modules:
+        for dep in dependency_tree[module]:
+            if dep in batch_index:
+                end = max(end, batch_index[dep])
+
+    window_modules = [module for java_group in compilation_order[start : end + 1] for module in java_group] + new_modules
+    window = set(window_modules)
+    window_tree = {module: [dep for dep in dependency_tree[module] if dep in window] for module in window_modules}
+    if DEBUG_:
+        print(f"Graph snapshot: recomputing batches {start} to {end} ({len(window_modules)} modules)")
+    return compilation_order[:start] + get_compilation_batches(window_tree) + compilation_order[end + 1 :]
+
+
+def patch_analysis(snapshot: dict, registry, roots: list[str], source_dirs: list[str], registry_fingerprint: str, parse_cache=None, git_changes=None):
+    """
+    Brings the analysis of a snapshot up to date. Only the changed files are parsed again.
+
+    Returns:
+        tuple[dict, bool] | None: (analysis, snapshot changed), None if a full analysis is needed.
+    """
+    path_to_module, module_to_path = registry.path_to_module, registry.module_to_path
+    dependency_tree, files, external_imports = snapshot["tree"], snapshot["files"], snapshot["external_imports"]
+    registry_changed = snapshot["registry"] != registry_fingerprint
+    if registry_changed and parse_cache is None:
+        return None  # Files were added or removed, every import must be resolved again: as long as a full analysis
+
+    changed_files = set()
+    for module, record in files.items():
+        if module not in module_to_path:
+            continue  # Deleted, dropped below if nothing depends on it anymore
+        if not is_file_unchanged(module_to_path[module], record, git_changes):
+            changed_files.add(module)
+        elif git_changes is not None and record[1] is None and git_changes.is_clean(module_to_path[module]):
+            record[1] = git_changes.head  # Compared to a recent commit next time
+            snapshot["changed"] = True
+
+    if not changed_files and not registry_changed:
+        return snapshot_to_analysis(snapshot, registry, source_dirs), snapshot.pop("changed", False)
+
+    # With other files in the project, imports (wildcards, same package classes) may resolve differently
+    to_resolve = [module for module in dependency_tree if module in module_to_path] if registry_changed else sorted(changed_files)
+    changed_modules = set()
+    for module in to_resolve:
+        dependencies = get_module_dependencies(module, module_to_path, path_to_module, external_imports=external_imports, parse_cache=parse_cache)
+        dependencies = [dep for dep in dependencies if dep != module]
+        if module in changed_files:
+            files[module] = get_file_record(module_to_path[module], parse_cache, git_changes)
+        if dependencies != dependency_tree[module]:
+            dependency_tree[module] = dependencies
+            changed_modules.add(module)
+
+    # Modules reached for the first time
+    new_modules = []
+    queue = [dep for module in changed_modules for dep in dependency_tree[module] if dep not in dependency_tree]
+    while queue:
+        module = queue.pop()
+        if module in dependency_tree:
+            continue
+        dependencies = get_module_dependencies(module, module_to_path, path_to_module, external_imports=external_imports, parse_cache=parse_cache)
+        dependency_tree[module] = [dep for dep in dependencies if dep != module]
+        files[module] = get_file_record(module_to_path[module], parse_cache, git_changes)
+        new_modules.append(module)
+        queue.extend(dep for dep in dependency_tree[module] if dep not in dependency_tree)
+
+    # Modules nothing reaches anymore
+    reachable = set(roots)
+    stack = list(roots)
+    while stack:
+        for dep in dependency_tree[stack.pop()]:
+            if dep not in reachable:
+                reachable.add(dep)
+                stack.append(dep)
+    for module in [module for module in dependency_tree if module not in reachable]:
+        del dependency_tree[module]
+        files.pop(module, None)
+        external_imports.pop(module, None)
+    new_modules = [module for module in new_modules if module in reachable]
+    changed_modules &= reachable
+
+    compilation_order = [[module for module in java_group if module in reachable] for java_group in snapshot["order"]]
+    compilation_order = [java_group for java_group in compilation_order if java_group]
+    snapshot["order"] = patch_compilation_order(compilation_order, dependency_tree, changed_modules, new_modules)
+    snapshot["registry"] = registry_fingerprint
+    snapshot.pop("changed", None)
+    if DEBUG_:
+        print(f"Graph snapshot: {len(changed_files)} changed files, {len(changed_modules)} with new dependencies, {len(new_modules)} new modules")
+    return snapshot_to_analysis(snapshot, registry, source_dirs), True
+
+
+def snapshot_to_analysis(snapshot: dict, registry, source_dirs: list[str]) -> dict:
+    return {
+        "compilation_order": snapshot["order"],
+        "dependency_tree": snapshot["tree"],
+        "module_to_path": registry.module_to_path,
+        "path_to_module": registry.path_to_module,
+        "source_dirs": source_dirs,
+        "external_imports": snapshot["external_imports"],
+    }
+
+
+def analyse_project_with_snapshot(java_file_paths: list[str], project_root_path: str, state_root: str, parse_cache=None, git_changes=None) -> dict:
+    """
+    Same as analyse_project, but reuses the graph and compilation order of the last analysis of
+    the same entry files (a marshal snapshot in <output_dir>/.automake/graph/).
+
+    When no file changed, the snapshot is used as it is. When some did, only they are parsed
+    again, and only the batches their new dependencies can affect are recomputed
+    (patch_compilation_order). When files were added or removed, every import is resolved
+    again from the parse cache (no parsing), then patched the same way.
+
+    Returns:
+        dict: Same keys as analyse_project.
+    """
+    source_dirs = get_source_dirs_from_classpath(f"{project_root_path}/.classpath")
+    registry = build_module_registry(project_root_path, source_dirs)
+    roots = [registry.path_to_module[java_file_path] for java_file_path in java_file_paths]
+    registry_fingerprint = get_registry_fingerprint(registry)
+    snapshot_path = get_snapshot_path(state_root, roots)
+
+    snapshot = load_graph_snapshot(snapshot_path)
+    if snapshot is not None and snapshot["roots"] == sorted(roots):
+        patched = patch_analysis(snapshot, registry, roots, source_dirs, registry_fingerprint, parse_cache, git_changes)
+        if patched is not None:
+            analysis, snapshot_changed = patched
+            if snapshot_changed:
+                save_graph_snapshot(snapshot_path, snapshot)
+            return analysis
+
+    analysis = analyse_project(java_file_paths, project_root_path, parse_cache=parse_cache, registry=registry)
+    module_to_path = analysis["module_to_path"]
+    snapshot = {
+        "version": (GRAPH_SNAPSHOT_VERSION, marshal.version, sys.version_info[:2]),
+        "roots": sorted(roots),
+        "registry": registry_fingerprint,
+        "tree": analysis["dependency_tree"],
+        "order": analysis["compilation_order"],
+        "external_imports": analysis["external_imports"],
+        "files": {module: get_file_record(module_to_path[module], parse_cache, git_changes) for module in analysis["dependency_tree"]},
+    }
+    save_graph_snapshot(snapshot_path, snapshot)
+    return analysis
@@ -0,0 +1,257 @@
+import os
+import time
+import socket
+import struct
+import hashlib
+
+from config import DEBUG_, load_json_file, save_json_file
+
+HOTSWAP_SESSION_FILE = "hotswap_session.json"
+JDWP_HANDSHAKE = b"JDWP-Handshake"
+JDWP_TIMEOUT = 10.0  # Seconds to wait for a JDWP reply
+
+# Command sets and commands (https://docs.oracle.com/en/java/javase/17/docs/specs/jdwp/jdwp-protocol.html)
+VIRTUAL_MACHINE = 1
+CLASSES_BY_SIGNATURE = 2
+DISPOSE = 6
+ID_SIZES = 7
+EXIT = 10
+CLASS_PATHS = 13
+CAPABILITIES_NEW = 17
+REDEFINE_CLASSES = 18
+CAN_REDEFINE_CLASSES = 7  # Index in the CapabilitiesNew reply
+
+# Errors of RedefineClasses meaning the JVM can't swap this change, a restart is needed
+NOT_SWAPPABLE_ERRORS = {
+    60: "invalid class format",
+    61: "circular class definition",
+    62: "fails verification",
+    63: "methods added",
+    64: "fields or schema changed",
+    66: "class hierarchy changed",
+    67: "methods deleted",
+    68: "unsupported class version",
+    69: "class name doesn't match",
+    70: "class modifiers changed",
+    71: "method modifiers changed",
+    72: "class attributes changed",
+}
+
+
+class JdwpError(Exception):
+    def __init__(self, error_code: int, command: str):
+        super().__init__(f"JDWP error {error_code} on {command}")
+        self.error_code = error_code
+
+
+class JdwpConnection:
+    """Minimal JDWP client: the few VirtualMachine commands hot swapping needs."""
+
+    def __init__(self, host: str, port: int, timeout: float = JDWP_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.next_id = 1
+        try:
+            self.sock.sendall(JDWP_HANDSHAKE)
+            if self.recv_exactly(len(JDWP_HANDSHAKE)) != JDWP_HANDSHAKE:
+                raise ConnectionError("Not a JDWP agent (bad handshake)")
+            sizes = struct.unpack(">5i", self.command(VIRTUAL_MACHINE, ID_SIZES))
+            self.reference_type_id_size = sizes[3]
+        except BaseException:
+            self.sock.close()
+            raise
+
+    def recv_exactly(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("JDWP connection closed")
+            data += chunk
+        return data
+
+    def command(self, command_set: int, command: int, data: bytes = b"") -> bytes:
+        """Sends a command and returns the data of its reply (events the JVM sends meanwhile are skipped)."""
+        packet_id = self.next_id
+        self.next_id += 1
+        self.sock.sendall(struct.pack(">iiBBB", 11 + len(data), packet_id, 0, command_set, command) + data)
+        while True:
+            length, reply_id, flags = struct.unpack(">iiB", self.recv_exactly(9))
+            rest = self.recv_exactly(length - 9)
+            if flags & 0x80 and reply_id == packet_id:
+                error_code = struct.unpack(">H", rest[:2])[0]
+                if error_code:
+                    raise JdwpError(error_code, f"command {command_set}/{command}")
+                return rest[2:]
+
+    def can_redefine_classes(self) -> bool:
+        return bool(self.command(VIRTUAL_MACHINE, CAPABILITIES_NEW)[CAN_REDEFINE_CLASSES])
+
+    def get_class_paths(self) -> list[str]:
+        reply = self.command(VIRTUAL_MACHINE, CLASS_PATHS)
+        _, offset = read_string(reply, 0)  # Base directory
+        count = struct.unpack_from(">i", reply, offset)[0]
+        offset += 4
+        class_paths = []
+        for _ in range(count):
+            class_path, offset = read_string(reply, offset)
+            class_paths.append(class_path)
+        return class_paths
+
+    def get_loaded_classes(self, signature: str) -> list[bytes]:
+        """Returns the reference type ids of the loaded classes with a JNI signature (one per class loader)."""
+        reply = self.command(VIRTUAL_MACHINE, CLASSES_BY_SIGNATURE, encode_string(signature))
+        count = struct.unpack_from(">i", reply, 0)[0]
+        entry_size = 1 + self.reference_type_id_size + 4  # tag, id, status
+        return [reply[4 + i * entry_size + 1 : 4 + i * entry_size + 1 + self.reference_type_id_size] for i in range(count)]
+
+    def redefine_classes(self, classes: list[tuple[bytes, bytes]]) -> None:
+        """Replaces the bytecode of loaded classes, [(reference type id, class file bytes)], all at once."""
+        data = struct.pack(">i", len(classes))
+        for type_id, class_bytes in classes:
+            data += type_id + struct.pack(">i", len(class_bytes)) + class_bytes
+        self.command(VIRTUAL_MACHINE, REDEFINE_CLASSES, data)
+
+    def exit(self, exit_code: int = 0) -> None:
+        try:
+            self.command(VIRTUAL_MACHINE, EXIT, struct.pack(">i", exit_code))
+        except (ConnectionError, OSError):
+            pass  # The JVM may be gone before replying
+        self.sock.close()
+
+    def close(self) -> None:
+        """Detaches (the JVM keeps running and listening for the next debugger)."""
+        try:
+            self.command(VIRTUAL_MACHINE, DISPOSE)
+        except (ConnectionError, OSError, JdwpError):
+            pass
+        self.sock.close()
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack(">i", len(data)) + data
+
+
+def read_string(data: bytes, offset: int) -> tuple[str, int]:
+    length = struct.unpack_from(">i", data, offset)[0]
+    return data[offset + 4 : offset + 4 + length].decode("utf-8"), offset + 4 + length
+
+
+def get_class_signature(class_file: str) -> str:
+    """`pack/Outer$Inner.class` -> `Lpack/Outer$Inner;`"""
+    return "L" + class_file[: -len(".class")].replace(os.sep, "/") + ";"
+
+
+def scan_class_files(output_dir: str, previous: dict[str, list] | None = None) -> dict[str, list]:
+    """
+    Lists the class files of the output dir with their [mtime_ns, size, sha1]. Files whose
+    mtime and size are the same as in `previous` aren't read again.
+    """
+    previous = previous or {}
+    class_files = {}
+    for root, _, files in os.walk(output_dir):
+        for file in files:
+            if not file.endswith(".class"):
+                continue
+            path = os.path.join(root, file)
+            class_file = os.path.relpath(path, output_dir)
+            stat = os.stat(path)
+            recorded = previous.get(class_file)
+            if recorded is not None and recorded[:2] == [stat.st_mtime_ns, stat.st_size]:
+                class_files[class_file] = recorded
+                continue
+            with open(path, "rb") as f:
+                class_files[class_file] = [stat.st_mtime_ns, stat.st_size, hashlib.sha1(f.read()).hexdigest()]
+    return class_files
+
+
+def wait_for_port(port: int, timeout: float = 5.0) -> None:
+    """Waits until a stopped JVM released its debug port, so the next one can listen on it."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(("", port))
+                return
+            except OSError:
+                time.sleep(0.1)
+
+
+def record_session_classes(output_dir: str, state_dir: str, port: int) -> None:
+    """Records the classes a debug session starts with, to know later which ones changed."""
+    save_json_file(os.path.join(state_dir, HOTSWAP_SESSION_FILE), {"port": port, "classes": scan_class_files(output_dir)})
+
+
+def hot_swap(output_dir: str, state_dir: str, port: int, host: str = "localhost") -> str:
+    """
+    Pushes the classes that changed since the debug session started (or since the last swap)
+    into the JVM listening for a debugger on `port`, with JDWP RedefineClasses.
+
+    Only classes the JVM already loaded are redefined, the others are loaded from the output
+    dir when first used. If the JVM can't swap the change (a field, method or superclass was
+    added or removed...), or swapping fails otherwise (another JDWP error, the program ended
+    meanwhile), it's asked to exit so it can be restarted.
+
+    Returns:
+        str: "swapped", "restart" (the JVM was stopped), "none" (no JVM is listening, or it
+        isn't running this output dir: start one), or "busy" (a debugger is attached, or it's
+        another program).
+    """
+    try:
+        connection = JdwpConnection(host, port)
+    except ConnectionRefusedError:
+        return "none"
+    except (ConnectionError, OSError, JdwpError) as e:
+        print(f"⚠️ Couldn't attach to the JVM on port {port}: {e}")
+        return "busy"
+
+    try:
+        if output_dir not in connection.get_class_paths():
+            print(f"⚠️ The JVM on port {port} isn't running this program")
+            connection.close()
+            return "busy"
+
+        session_path = os.path.join(state_dir, HOTSWAP_SESSION_FILE)
+        session = load_json_file(session_path, {})
+        previous = session.get("classes", {})
+        current = scan_class_files(output_dir, previous)
+        changed = [class_file for class_file, record in current.items() if class_file in previous and previous[class_file][2] != record[2]]
+
+        to_redefine = []
+        for class_file in sorted(changed):
+            with open(os.path.join(output_dir, class_file), "rb") as f:
+                class_bytes = f.read()
+            for type_id in connection.get_loaded_classes(get_class_signature(class_file)):
+                to_redefine.append((type_id, class_bytes))
+        if DEBUG_:
+            print(f"Hot swap: {len(changed)} changed classes, {len(to_redefine)} loaded")
+
+        if to_redefine:
+            if not connection.can_redefine_classes():
+                print("🔁 This JVM can't redefine classes, restarting it")
+                connection.exit()
+                wait_for_port(port)
+                return "restart"
+            connection.redefine_classes(to_redefine)
+
+        session["classes"] = current
+        save_json_file(session_path, session)
+        connection.close()
+        print(f"🔥 Hot swapped {len(to_redefine)} classes into the running JVM")
+        return "swapped"
+    except (JdwpError, ConnectionError, OSError) as e:
+        # Not swappable, another JDWP error, or the program ended meanwhile: started again either way
+        if isinstance(e, JdwpError) and e.error_code in NOT_SWAPPABLE_ERRORS:
+            print(f"🔁 Can't hot swap ({NOT_SWAPPABLE_ERRORS[e.error_code]}), restarting the program")
+        else:
+            print(f"🔁 Hot swap failed ({e}), restarting the program")
+        try:
+            connection.exit()  # Nothing raised if it's already gone
+        except JdwpError:
+            connection.close()
+        wait_for_port(port)
+        return "restart"
+    except BaseException:
+        connection.close()
+        raise
@@ -0,0 +1,197 @@
+import os
+import hashlib
+
+from class_file import get_class_dependencies
+from config import load_json_file, save_json_file
+
+BUILD_STATE_FILE = "build_state.json"
+BUILD_STATE_VERSION = 1
+
+
+def get_source_fingerprint(java_file_path: str) -> list[int]:
+    """Returns a cheap fingerprint of a source file: [mtime_ns, size]."""
+    stat = os.stat(java_file_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def get_sources_fingerprint(file_paths, fingerprints: dict[str, list[int]] | None = None) -> str:
+    """
+    Returns one fingerprint for a set of files, changing when any of them is added, removed or modified.
+    `fingerprints` gives the get_source_fingerprint of files already stat'ed (e.g. when they were parsed).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for file_path in sorted(file_paths):
+        mtime_ns, size = fingerprints[file_path] if fingerprints is not None and file_path in fingerprints else get_source_fingerprint(file_path)
+        digest.update(f"{file_path}\0{mtime_ns}\0{size}\n".encode())
+    return digest.hexdigest()
+
+
+def get_class_file_path(output_dir: str, module: str) -> str:
+    """Returns the .class file javac writes for the top level class of a module."""
+    return os.path.join(output_dir, *module.split(".")) + ".class"
+
+
+def new_build_state(javac_flags: list[str], classpath: str) -> dict:
+    return {
+        "version": BUILD_STATE_VERSION,
+        "javac_flags": javac_flags,
+        "classpath": classpath,
+        "sources": {},  # module -> {"path": str, "fingerprint": [mtime_ns, size], "head": commit the source was clean at, or None}
+        "class_deps": {},  # module -> {"deps": modules its class files reference, "constants": bool} (class_file.py)
+    }
+
+
+def load_build_state(state_dir: str, javac_flags: list[str], classpath: str) -> dict:
+    """
+    Loads the incremental build state of a flavor.
+
+    The state is thrown away (everything gets recompiled) when it was written by
+    another version, or with other javac flags or another classpath.
+
+    Args:
+        state_dir (str): State directory of the build flavor.
+        javac_flags (list[str]): Flags of the current build.
+        classpath (str): Classpath of the current build.
+
+    Returns:
+        dict: The build state.
+    """
+    build_state = load_json_file(os.path.join(state_dir, BUILD_STATE_FILE))
+    if (
+        not isinstance(build_state, dict)
+        or build_state.get("version") != BUILD_STATE_VERSION
+        or build_state.get("javac_flags") != javac_flags
+        or build_state.get("classpath") != classpath
+    ):
+        return new_build_state(javac_flags, classpath)
+    return build_state
+
+
+def save_build_state(state_dir: str, build_state: dict) -> None:
+    save_json_file(os.path.join(state_dir, BUILD_STATE_FILE), build_state)
+
+
+def get_compile_reason(
+    java_group: list[str],
+    build_state: dict,
+    module_to_path: dict[str, str],
+    output_dir: str,
+    recompiled_modules: set[str],
+    dependency_tree: dict[str, list[str]] | None = None,
+    git_changes=None,
+) -> dict | None:
+    """
+    Tells why a compilation batch must be (re)compiled.
+
+    A batch is up to date when every one of its sources is unchanged since its last
+    successful compilation, its class files still exist, and none of its dependencies
+    were recompiled during this build.
+
+    The dependencies of a module whose class files were read (build_state["class_deps"]) are
+    the modules its bytecode references, plus the modules it imports that declare constants
+    (javac inlines them, leaving no reference). Otherwise they're its imports.
+
+    Args:
+        java_group (list[str]): Modules of the batch.
+        build_state (dict): Incremental state of the flavor.
+        module_to_path (dict): Module name to Java file path.
+        output_dir (str): Output directory of the flavor.
+        recompiled_modules (set[str]): Modules recompiled so far during this build.
+        dependency_tree (dict, optional): Module dependencies. Without it, any earlier
+            recompilation makes every later batch dirty.
+        git_changes (GitChanges, optional): When given, sources git knows are unchanged since
+            the commit they were built from aren't stat'ed (change_detection.py).
+
+    Returns:
+        dict | None: None if the batch is up to date, else {"reason", "module", "detail"}: reason is
+        "new source", "source moved", "source changed", "class missing" or "dependency recompiled",
+        module the module it's about (the dependency for "dependency recompiled").
+    """
+    if dependency_tree is None and recompiled_modules:
+        return {"reason": "dependency recompiled", "module": None, "detail": "an earlier batch was recompiled"}
+
+    for module in java_group:
+        java_file_path = module_to_path[module]
+        recorded = build_state["sources"].get(module)
+        if recorded is None:
+            return {"reason": "new source", "module": module, "detail": java_file_path}
+        if recorded["path"] != java_file_path:
+            return {"reason": "source moved", "module": module, "detail": f"{recorded['path']} → {java_file_path}"}
+        if git_changes is not None and git_changes.is_unchanged_since(java_file_path, recorded.get("head")):
+            pass
+        elif recorded["fingerprint"] != get_source_fingerprint(java_file_path):
+            return {"reason": "source changed", "module": module, "detail": java_file_path}
+        class_file_path = get_class_file_path(output_dir, module)
+        if not os.path.exists(class_file_path):
+            return {"reason": "class missing", "module": module, "detail": class_file_path}
+        if dependency_tree is not None:
+            class_deps = build_state.get("class_deps", {})
+            deps = dependency_tree.get(module, [])
+            if module in class_deps:
+                deps = class_deps[module]["deps"] + [dep for dep in deps if class_deps.get(dep, {}).get("constants", True)]
+            for dep in deps:
+                if dep in recompiled_modules:
+                    return {"reason": "dependency recompiled", "module": dep, "detail": f"{module} depends on {dep}"}
+
+    return None
+
+
+def get_build_state_reset_reason(state_dir: str, javac_flags: list[str], classpath: str) -> dict | None:
+    """
+    Tells why load_build_state would start from an empty state (everything recompiled).
+
+    Returns:
+        dict | None: None if the recorded state is kept, else {"reason", "module": None, "detail"}.
+    """
+    build_state = load_json_file(os.path.join(state_dir, BUILD_STATE_FILE))
+    if not isinstance(build_state, dict):
+        return {"reason": "no previous build", "module": None, "detail": state_dir}
+    if build_state.get("version") != BUILD_STATE_VERSION:
+        return {"reason": "build state version changed", "module": None, "detail": f"{build_state.get('version')} → {BUILD_STATE_VERSION}"}
+    if build_state.get("javac_flags") != javac_flags:
+        old_flags = " ".join(build_state.get("javac_flags") or []) or "(none)"
+        return {"reason": "javac flags changed", "module": None, "detail": f"{old_flags} → {' '.join(javac_flags) or '(none)'}"}
+    if build_state.get("classpath") != classpath:
+        old_entries = (build_state.get("classpath") or "").split(":")
+        new_entries = classpath.split(":")
+        changes = [f"+{entry}" for entry in new_entries if entry not in old_entries]
+        changes += [f"-{entry}" for entry in old_entries if entry not in new_entries]
+        return {"reason": "classpath changed", "module": None, "detail": ", ".join(changes) or "entries reordered"}
+    return None
+
+
+def record_compiled_batch(
+    build_state: dict, java_group: list[str], module_to_path: dict[str, str], fingerprints: dict[str, list[int]], git_changes=None
+):
+    """Marks the modules of a successfully compiled batch as up to date."""
+    for module in java_group:
+        java_file_path = module_to_path[module]
+        head = git_changes.get_head_for(java_file_path) if git_changes is not None else None
+        build_state["sources"][module] = {"path": java_file_path, "fingerprint": fingerprints[module], "head": head}
+
+
+def record_class_dependencies(build_state: dict, output_dir: str, recompiled_modules, class_manifest: dict[str, list[str]]) -> None:
+    """Records the dependencies the class files of the recompiled modules reference, for the next builds."""
+    class_deps = build_state.setdefault("class_deps", {})
+    for module in recompiled_modules:
+        class_deps.pop(module, None)  # Its imports are used if its classes can't be read
+    class_deps.update(get_class_dependencies(output_dir, recompiled_modules, class_manifest))
+    for module in [module for module in class_deps if module not in build_state["sources"]]:
+        del class_deps[module]
+
+
+def record_checked_batch(build_state: dict, java_group: list[str], git_changes) -> None:
+    """
+    Moves the commit of the up to date sources of a batch to HEAD when they are clean, so
+    they're compared to a recent commit next time (one `git diff` for most of the sources).
+    """
+    for module in java_group:
+        recorded = build_state["sources"][module]
+        recorded["head"] = git_changes.get_head_for(recorded["path"])
+
+
+def forget_batches(build_state: dict, java_groups: list[list[str]]):
+    """Drops the records of batches whose compilation failed or never happened, so they are retried."""
+    for java_group in java_groups:
+        for module in java_group:
+            build_state["sources"].pop(module, None)
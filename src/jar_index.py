@@ -0,0 +1,356 @@
+import os
+import re
+import mmap
+import struct
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import deque
+
+from config import DEBUG_, PRINT_OUTPUT, load_json_file, save_json_file
+from maven_model import read_xml, get_text
+
+CACHE_DIR = os.path.join(os.path.expanduser("~/.cache/automake"), "jar_index")
+JAR_INDEX_VERSION = 2
+
+# Packages provided by the JDK itself (not on the classpath, never a reason to keep a JAR)
+JDK_PACKAGE_PREFIXES = ("java.", "javax.", "jdk.", "sun.", "com.sun.", "org.w3c.", "org.xml.", "org.ietf.")
+
+# javac errors a JAR missing from the classpath causes: a package, or a class file a used class refers to, not found.
+# Not a bare "cannot find symbol": a typo gives that too, and imports are resolved to their JARs already
+MISSING_CLASS_ERROR = re.compile(r"error: (cannot access \S+|package \S+ does not exist)|class file for \S+ not found")
+
+EOCD = struct.Struct("<IHHHHIIH")  # End of central directory record
+EOCD64_LOCATOR = struct.Struct("<IIQI")
+EOCD64 = struct.Struct("<IQHHIIQQQQ")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+
+
+def read_jar_entries(jar_path: str) -> list[str]:
+    """
+    Lists the entry names of a JAR by reading only its zip central directory (mmap, no decompression).
+
+    Args:
+        jar_path (str): Path to the JAR.
+
+    Returns:
+        list[str]: Entry names, e.g. "javafx/scene/Scene.class".
+    """
+    with open(jar_path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < EOCD.size:
+            return []
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # The end of central directory record is in the last 64 KiB (after an optional comment)
+            eocd_offset = data.rfind(b"PK\x05\x06", max(0, len(data) - 65536 - EOCD.size))
+            if eocd_offset < 0:
+                raise ValueError(f"Not a zip file: {jar_path}")
+            _, _, _, _, entry_count, _, directory_offset, _ = EOCD.unpack_from(data, eocd_offset)
+
+            if directory_offset == 0xFFFFFFFF or entry_count == 0xFFFF:  # ZIP64
+                locator_offset = eocd_offset - EOCD64_LOCATOR.size
+                _, _, eocd64_offset, _ = EOCD64_LOCATOR.unpack_from(data, locator_offset)
+                fields = EOCD64.unpack_from(data, eocd64_offset)
+                entry_count, directory_offset = fields[7], fields[9]
+
+            names = []
+            offset = directory_offset
+            for _ in range(entry_count):
+                header = CENTRAL_HEADER.unpack_from(data, offset)
+                if header[0] != 0x02014B50:
+                    raise ValueError(f"Corrupted central directory in {jar_path}")
+                name_length, extra_length, comment_length = header[10], header[11], header[12]
+                start = offset + CENTRAL_HEADER.size
+                names.append(data[start : start + name_length].decode("utf-8", "replace"))
+                offset = start + name_length + extra_length + comment_length
+            return names
+
+
+def index_jar_entries(names: list[str]) -> dict:
+    """Returns the packages and top level classes provided by a JAR, from its entry names."""
+    packages = set()
+    classes = set()
+    for name in names:
+        if not name.endswith(".class"):
+            continue
+        if name.startswith("META-INF/versions/"):  # Multi-release JAR: META-INF/versions/<N>/pack/Cls.class
+            name = name.split("/", 3)[-1]
+        directory, _, file_name = name.rpartition("/")
+        if "$" in file_name or file_name in ("module-info.class", "package-info.class"):
+            continue
+        package = directory.replace("/", ".")
+        packages.add(package)
+        classes.add(f"{package}.{file_name[:-6]}" if package else file_name[:-6])
+    return {"packages": sorted(packages), "classes": sorted(classes)}
+
+
+def load_jar_index(jar_path: str) -> dict:
+    """
+    Returns the index of a JAR ({"packages": [...], "classes": [...], "requires": read_jar_requirements}).
+
+    The index is cached per JAR in ~/.cache/automake/jar_index, and rebuilt when the JAR's
+    mtime or size changes.
+    """
+    real_path = os.path.realpath(jar_path)
+    stat = os.stat(real_path)
+    cache_file = os.path.join(CACHE_DIR, hashlib.sha1(real_path.encode()).hexdigest() + ".json")
+
+    cached = load_json_file(cache_file)
+    if (
+        isinstance(cached, dict)
+        and cached.get("version") == JAR_INDEX_VERSION
+        and cached.get("path") == real_path
+        and cached.get("fingerprint") == [stat.st_mtime_ns, stat.st_size]
+    ):
+        return cached
+
+    if DEBUG_:
+        print(f"Indexing {real_path}")
+    index = index_jar_entries(read_jar_entries(real_path))
+    index["requires"] = read_jar_requirements(real_path)
+    index.update({"version": JAR_INDEX_VERSION, "path": real_path, "fingerprint": [stat.st_mtime_ns, stat.st_size]})
+    save_json_file(cache_file, index)
+    return index
+
+
+def split_classpath(classpath: str) -> tuple[list[str], list[str]]:
+    """Splits a classpath string into (directories and other entries, JARs)."""
+    others, jars = [], []
+    for entry in classpath.split(":"):
+        if not entry:
+            continue
+        if entry.endswith((".jar", ".zip")) and os.path.isfile(entry):
+            jars.append(entry)
+        else:
+            others.append(entry)
+    return others, jars
+
+
+class ClasspathIndex:
+    """Which JAR of a classpath provides which package and class."""
+
+    def __init__(self, classpath: str):
+        _, self.jars = split_classpath(classpath)
+        self.class_to_jar: dict[str, str] = {}
+        self.package_to_jars: dict[str, list[str]] = {}
+        self.requirements: dict[str, dict] = {}  # JAR -> read_jar_requirements
+        self.jar_closures: dict[str, set[str]] = {}  # JAR -> itself and the JARs it needs, transitively
+        for jar in self.jars:
+            try:
+                index = load_jar_index(jar)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not index {jar}: {e}")
+                continue
+            self.requirements[jar] = index["requires"]
+            for class_name in index["classes"]:
+                self.class_to_jar.setdefault(class_name, jar)  # First one on the classpath wins, like javac
+            for package in index["packages"]:
+                self.package_to_jars.setdefault(package, []).append(jar)
+
+    def resolve_import(self, imported: str) -> list[str] | None:
+        """
+        Resolves a library import to the JAR(s) providing it.
+
+        Args:
+            imported (str): Import path, "pack.*" for wildcard imports. Static imports and
+                nested classes (pack.Outer.member) resolve to the JAR of their top level class.
+
+        Returns:
+            list[str] | None: The JARs providing the import, [] for JDK imports, None if unresolved.
+        """
+        wildcard = imported.endswith(".*")
+        name = imported[:-2] if wildcard else imported
+        if wildcard and name in self.package_to_jars:
+            return self.package_to_jars[name]
+
+        # pack.Cls, pack.Cls.Nested, pack.Cls.staticMember -> pack.Cls
+        parts = name.split(".")
+        for end in range(len(parts), 0, -1):
+            class_name = ".".join(parts[:end])
+            if class_name in self.class_to_jar:
+                return [self.class_to_jar[class_name]]
+
+        if name.startswith(JDK_PACKAGE_PREFIXES):
+            return []
+        package = name if wildcard else name.rpartition(".")[0]
+        return self.package_to_jars.get(package)
+
+    def get_jar_closure(self, jar: str) -> set[str]:
+        """Returns a JAR and the JARs of the classpath it needs at compile time, transitively (cached per JAR)."""
+        closure = self.jar_closures.get(jar)
+        if closure is None:
+            closure = {jar}
+            queue = deque([jar])
+            while queue:
+                requirements = self.requirements.get(queue.popleft())
+                if requirements is None:
+                    continue  # Couldn't be indexed
+                for dependency in match_jar_dependencies(requirements, self.jars) - closure:
+                    closure.add(dependency)
+                    queue.append(dependency)
+            self.jar_closures[jar] = closure
+        return closure
+
+    def get_jars(self, imports: list[str]) -> set[str]:
+        """
+        Returns the JARs needed by a list of imports (unresolved ones are ignored), with the JARs
+        those need at compile time: javac reads the signatures of junit's assertThat, which use
+        hamcrest's Matcher.
+        """
+        jars = set()
+        for imported in imports:
+            for jar in self.resolve_import(imported) or []:
+                jars |= self.get_jar_closure(jar)
+        return jars
+
+
+def get_module_jars(classpath: str, external_imports: dict[str, list[str]], quiet: bool = False) -> dict[str, set[str]]:
+    """
+    Resolves the library imports of every analysed module to the JARs they need.
+
+    Also warns about the JARs of the classpath this build never uses (report_unused_jars) and,
+    when PRINT_OUTPUT is on, the imports no JAR provides.
+
+    Args:
+        classpath (str): Classpath string (directories and JARs).
+        external_imports (dict): Module -> imports that aren't project modules.
+        quiet (bool): Don't warn.
+
+    Returns:
+        dict[str, set[str]]: Module -> JARs its own imports need, with the JARs those need at
+        compile time (ClasspathIndex.get_jar_closure), so a trimmed classpath rarely needs the retry.
+    """
+    classpath_index = ClasspathIndex(classpath)
+    module_jars = {}
+    unresolved = set()
+    for module, imports in external_imports.items():
+        jars = set()
+        for imported in imports:
+            resolved = classpath_index.resolve_import(imported)
+            if resolved is None:
+                if not imported.endswith(".*"):  # A wildcard may be of a project package (com.acme.app.*)
+                    unresolved.add(imported)
+                continue
+            for jar in resolved:
+                jars |= classpath_index.get_jar_closure(jar)
+        module_jars[module] = jars
+
+    if quiet:
+        return module_jars
+    if unresolved and (PRINT_OUTPUT or DEBUG_):
+        print(f"⚠️ Imports not found on the classpath: {', '.join(sorted(unresolved))}")
+
+    # The JARs of the modules already include the ones they need (get_jar_closure)
+    used_jars = set().union(*module_jars.values()) if module_jars else set()
+    report_unused_jars(classpath, [jar for jar in classpath_index.jars if jar not in used_jars])
+
+    return module_jars
+
+
+def read_jar_requirements(jar_path: str) -> dict:
+    """
+    Reads what a JAR needs at compile time: the file names of its manifest Class-Path, and the
+    artifactIds of the dependencies its embedded Maven pom.xml declares (test, provided and
+    optional ones left out).
+    """
+    names = set()
+    artifacts = set()
+    try:
+        with zipfile.ZipFile(jar_path) as jar:
+            entries = jar.namelist()
+            if "META-INF/MANIFEST.MF" in entries:
+                manifest = jar.read("META-INF/MANIFEST.MF").decode("utf-8", errors="replace").replace("\r\n ", "").replace("\n ", "")
+                for line in manifest.splitlines():
+                    if line.startswith("Class-Path:"):
+                        names.update(os.path.basename(entry) for entry in line[len("Class-Path:") :].split())
+            for entry in entries:
+                if entry.startswith("META-INF/maven/") and entry.endswith("/pom.xml"):
+                    with jar.open(entry) as pom:
+                        for dependency in read_xml(pom).findall("dependencies/dependency"):
+                            if get_text(dependency, "scope") not in ("test", "provided") and get_text(dependency, "optional") != "true":
+                                artifacts.add(get_text(dependency, "artifactId"))
+    except (OSError, zipfile.BadZipFile, ET.ParseError):
+        pass
+    return {"class_path": sorted(names), "artifacts": sorted(artifact for artifact in artifacts if artifact)}
+
+
+def match_jar_dependencies(requirements: dict, jars: list[str]) -> set[str]:
+    """Returns the JARs of `jars` that match the requirements of a JAR (read_jar_requirements), by file name: <artifactId>-<version>.jar."""
+    names = set(requirements["class_path"])
+    artifacts = set(requirements["artifacts"])
+    dependencies = set()
+    for jar in jars:
+        name = os.path.basename(jar)
+        artifact, _, version = name.rpartition("-")
+        while artifact and not version[:1].isdigit():  # artifact-with-dashes-1.2.jar
+            artifact, _, rest = artifact.rpartition("-")
+            version = f"{rest}-{version}"
+        if name in names or (artifact in artifacts and version[:1].isdigit()):
+            dependencies.add(jar)
+    return dependencies
+
+
+def report_unused_jars(classpath: str, unused_jars: list[str]) -> None:
+    """
+    Warns about the JARs of a classpath a build never uses, once: again only when the list changes
+    (the last one is kept per classpath in ~/.cache/automake/jar_index). With DEBUG_, every build.
+    """
+    report_path = os.path.join(CACHE_DIR, f"unused-{hashlib.sha1(classpath.encode()).hexdigest()[:16]}.json")
+    if load_json_file(report_path) == unused_jars and not DEBUG_:
+        return
+    save_json_file(report_path, unused_jars)
+    if unused_jars:
+        print("⚠️ JARs on the classpath that this build never uses:")
+        for jar in unused_jars:
+            print(f"   {jar}")
+
+
+def get_batch_jars(
+    java_group: list[str],
+    dependency_tree: dict[str, list[str]],
+    module_jars: dict[str, set[str]],
+    closure_jars: dict[str, set[str]],
+) -> set[str]:
+    """
+    Returns the JARs a batch needs: the ones imported by its modules and by everything they
+    (transitively) depend on, since javac reads the signatures of those classes too.
+
+    `closure_jars` (module -> JARs of its closure) must already hold the batch's
+    dependencies; the batch's modules are added to it.
+    """
+    batch_jars = set()
+    for module in java_group:
+        batch_jars |= module_jars.get(module, set())
+        for dep in dependency_tree.get(module, []):
+            if dep in closure_jars:
+                batch_jars |= closure_jars[dep]
+    for module in java_group:
+        closure_jars[module] = batch_jars
+    return batch_jars
+
+
+def trim_classpath(classpath: str, jars: set[str]) -> str:
+    """Keeps every non JAR entry of a classpath, and only the given JARs."""
+    others, all_jars = split_classpath(classpath)
+    return ":".join(others + [jar for jar in all_jars if jar in jars])
+
+
+def is_missing_class_error(javac_output: str) -> bool:
+    """Tells if javac failed on a class it couldn't find, which a JAR left out of a trimmed classpath may have."""
+    return MISSING_CLASS_ERROR.search(javac_output) is not None
+
+
+def get_batch_classpaths(
+    classpath: str,
+    compilation_order: list[list[str]],
+    dependency_tree: dict[str, list[str]],
+    module_jars: dict[str, set[str]],
+) -> list[str]:
+    """
+    Computes a trimmed classpath for every compilation batch (see get_batch_jars).
+
+    Returns:
+        list[str]: One classpath string per batch, in compilation order.
+    """
+    closure_jars: dict[str, set[str]] = {}
+    # Dependencies come first, so their closures are known
+    return [trim_classpath(classpath, get_batch_jars(java_group, dependency_tree, module_jars, closure_jars)) for java_group in compilation_order]
@@ -20,6 +20,59 @@ def get_package(tree):
     return None
 
 
+def declares_main_method(tree) -> bool:
+    """Checks if a top level type of the AST declares `public static void main(String[])`."""
+    for type_declaration in tree.types:
+        for method in getattr(type_declaration, "methods", []):
+            if method.name != "main" or not {"public", "static"} <= method.modifiers:
+                continue
+            if method.return_type is not None or len(method.parameters) != 1:
+                continue
+            parameter_type = method.parameters[0].type
+            if parameter_type.name == "String" and (len(parameter_type.dimensions) == 1 or method.parameters[0].varargs):
+                return True
+    return False
+
+
+JUNIT4_TEST = "org.junit.Test"
+JUPITER_TEST = "org.junit.jupiter.api.Test"  # JUnit 5, not run by JUnitCore
+
+
+def get_annotation_names(name: str, tree) -> list[str]:
+    """
+    Returns the fully qualified names an annotation of the AST can stand for: itself when it's
+    qualified, else its single type import, else its own package's or one of the wildcard imports'.
+    """
+    if "." in name:
+        return [name]
+    for imp in tree.imports:
+        if not imp.static and not imp.wildcard and imp.path.rsplit(".", 1)[-1] == name:
+            return [imp.path]
+    package = f"{tree.package.name}." if tree.package else ""
+    return [f"{package}{name}"] + [f"{imp.path}.{name}" for imp in tree.imports if imp.wildcard and not imp.static]
+
+
+def declares_test_annotation(tree, annotation_name: str) -> bool:
+    """Checks if a top level (non abstract) class of the AST has methods annotated with `annotation_name` (fully qualified)."""
+    for type_declaration in tree.types:
+        if "abstract" in getattr(type_declaration, "modifiers", set()):
+            continue
+        for method in getattr(type_declaration, "methods", []):
+            if any(annotation_name in get_annotation_names(annotation.name, tree) for annotation in method.annotations):
+                return True
+    return False
+
+
+def declares_tests(tree) -> bool:
+    """Checks if a top level (non abstract) class of the AST has JUnit 4 `@org.junit.Test` methods."""
+    return declares_test_annotation(tree, JUNIT4_TEST)
+
+
+def declares_jupiter_tests(tree) -> bool:
+    """Checks if a top level (non abstract) class of the AST has JUnit 5 `@org.junit.jupiter.api.Test` methods."""
+    return declares_test_annotation(tree, JUPITER_TEST)
+
+
 def get_imports(tree, module_to_path, path_to_module):
     """
     Extracts and resolves all imports in a Java file using module_to_path and path_to_module.
@@ -54,6 +107,33 @@ def get_imports(tree, module_to_path, path_to_module):
     return imports
 
 
+def get_external_imports(tree, module_to_path) -> list[str]:
+    """
+    Lists the imports of a Java file that don't point into the project (library or JDK imports).
+
+    Args:
+        tree: Parsed Java AST.
+        module_to_path (dict): Dictionary mapping module names to file paths.
+
+    Returns:
+        list: Import paths, with a `.*` suffix for wildcard imports (e.g. "javafx.scene.*").
+    """
+    external_imports = []
+    for imp in tree.imports:
+        # pack.Cat, pack.Cat.Inner and static pack.Cat.member point into the project. Only classes
+        # count: a library often shares the project's package prefix (com.acme.lib next to com.acme.app)
+        parts = imp.path.split(".")
+        if any(is_class_module(".".join(parts[:end]), module_to_path) for end in range(len(parts), 0, -1)):
+            continue
+        external_imports.append(f"{imp.path}.*" if imp.wildcard else imp.path)
+    return external_imports
+
+
+def is_class_module(name: str, module_to_path) -> bool:
+    """Checks if a name is a Java file of the project (not one of its package directories)."""
+    return name in module_to_path and module_to_path[name].endswith(".java")
+
+
 if __name__ == "__main__":
     # Path to the main Java file
     java_file_path = "MainFile.java"
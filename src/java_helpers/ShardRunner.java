@@ -0,0 +1,75 @@
+import java.io.IOException;
+import java.io.PrintWriter;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.List;
+
+/**
+ * Test shard runner of automake (see test_runner.py).
+ *
+ * Runs JUnit 4 test classes one after the other through JUnitCore, called by reflection so the
+ * helper compiles without JUnit, and writes a report line per class (flushed as it goes, so a
+ * crashed shard still reports the classes it finished).
+ *
+ * Usage: java -cp <helper>:<classes>:<junit> ShardRunner <report file> <test class>...
+ *
+ * Report lines (tab separated, tabs and newlines escaped in the values):
+ *   CLASS  class  run count  failure count  ignore count  milliseconds
+ *   FAIL   class  test header  message  stack trace
+ *   ERROR  class  message                (the class couldn't be loaded or run)
+ */
+public final class ShardRunner {
+	private ShardRunner() {
+	}
+
+	public static void main(String[] args) throws Exception {
+		Class<?> coreClass = Class.forName("org.junit.runner.JUnitCore");
+		Object core = coreClass.getDeclaredConstructor().newInstance();
+		Method run = coreClass.getMethod("run", Class[].class);
+		boolean passed = true;
+
+		try (PrintWriter report = new PrintWriter(Files.newBufferedWriter(Paths.get(args[0]), StandardCharsets.UTF_8))) {
+			for (int i = 1; i < args.length; i++) {
+				String className = args[i];
+				try {
+					Class<?> testClass = Class.forName(className, false, ShardRunner.class.getClassLoader());
+					long start = System.nanoTime();
+					Object result = run.invoke(core, (Object) new Class<?>[] { testClass });
+					long millis = (System.nanoTime() - start) / 1_000_000;
+
+					int runCount = (Integer) call(result, "getRunCount");
+					int failureCount = (Integer) call(result, "getFailureCount");
+					int ignoreCount = (Integer) call(result, "getIgnoreCount");
+					report.println("CLASS\t" + className + "\t" + runCount + "\t" + failureCount + "\t" + ignoreCount + "\t" + millis);
+					for (Object failure : (List<?>) call(result, "getFailures")) {
+						report.println("FAIL\t" + className + "\t" + escape(call(failure, "getTestHeader")) + "\t"
+								+ escape(call(failure, "getMessage")) + "\t" + escape(call(failure, "getTrace")));
+					}
+					passed &= failureCount == 0;
+				} catch (InvocationTargetException e) {
+					report.println("ERROR\t" + className + "\t" + escape(e.getCause()));
+					passed = false;
+				} catch (ReflectiveOperationException | LinkageError e) {
+					report.println("ERROR\t" + className + "\t" + escape(e));
+					passed = false;
+				}
+				report.flush();
+			}
+		} catch (IOException e) {
+			System.err.println("ShardRunner: can't write the report: " + e);
+			System.exit(2);
+		}
+		System.exit(passed ? 0 : 1);
+	}
+
+	private static Object call(Object target, String methodName) throws ReflectiveOperationException {
+		return target.getClass().getMethod(methodName).invoke(target);
+	}
+
+	private static String escape(Object value) {
+		return String.valueOf(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\r", "").replace("\n", "\\n");
+	}
+}
@@ -0,0 +1,413 @@
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.EOFException;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.io.PrintStream;
+import java.lang.ref.WeakReference;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+import java.net.SocketTimeoutException;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.Paths;
+import java.nio.file.StandardCopyOption;
+import java.security.Permission;
+import java.util.Properties;
+import java.util.concurrent.LinkedBlockingQueue;
+
+/**
+ * Resident JVM of automake's warm runner (see warm_jvm.py).
+ *
+ * Runs one program at a time, each in a fresh, disposable class loader, and forwards its
+ * stdin/stdout/stderr and exit status over a local socket. After each run, the JVM exits
+ * (and gets replaced by a fresh one) when the program leaked threads or its class loader,
+ * when the heap grew too much, or after a maximum number of runs.
+ *
+ * Usage: java WarmRunner <port file> <token file> <idle minutes> <max runs> <max heap ratio>
+ *
+ * Protocol (big endian): the server sends READY once it accepted the connection. Only then the
+ * client sends the token, the main class, the class path entries and the program arguments
+ * (strings are an int length + UTF-8 bytes, lists an int count + strings), then STDIN frames. The
+ * server answers STARTED, then STDOUT/STDERR frames and one EXIT frame. A frame is a type byte, an
+ * int length and the payload. A client that gave up waiting for READY (the runner was busy) has
+ * sent nothing, so its connection, accepted later from the backlog, runs nothing.
+ */
+public final class WarmRunner {
+	private static final int STDIN = 0;
+	private static final int STDOUT = 1;
+	private static final int STDERR = 2;
+	private static final int EXIT = 3;
+	private static final int STARTED = 4;
+	private static final int READY = 5;
+
+	private static volatile ThreadGroup programGroup;
+	private static volatile Integer trappedExitStatus;
+
+	private WarmRunner() {
+	}
+
+	public static void main(String[] args) throws Exception {
+		Path portFile = Paths.get(args[0]);
+		String token = Files.readString(Paths.get(args[1])).trim();
+		int idleMinutes = Integer.parseInt(args[2]);
+		int maxRuns = Integer.parseInt(args[3]);
+		double maxHeapRatio = Double.parseDouble(args[4]);
+		String pid = Long.toString(ProcessHandle.current().pid());
+
+		installExitTrap();
+
+		try (ServerSocket server = new ServerSocket(0, 1, InetAddress.getLoopbackAddress())) {
+			server.setSoTimeout(idleMinutes * 60_000);
+			Path tmpFile = portFile.resolveSibling(portFile.getFileName() + "." + pid + ".tmp");
+			Files.writeString(tmpFile, server.getLocalPort() + "\n" + pid + "\n");
+			Files.move(tmpFile, portFile, StandardCopyOption.REPLACE_EXISTING, StandardCopyOption.ATOMIC_MOVE);
+
+			for (int runs = 1;; runs++) {
+				Socket socket;
+				try {
+					socket = server.accept();
+				} catch (SocketTimeoutException e) {
+					break; // Idle for too long
+				}
+
+				boolean recycle;
+				try (socket) {
+					recycle = serve(socket, token);
+				} catch (IOException e) {
+					recycle = true; // The client vanished mid run, the program may still be running
+				}
+
+				if (recycle || runs >= maxRuns || heapRatio() > maxHeapRatio) {
+					break;
+				}
+			}
+		} finally {
+			// Only remove the port file if a newer runner didn't replace it already
+			if (Files.exists(portFile) && Files.readString(portFile).endsWith("\n" + pid + "\n")) {
+				Files.deleteIfExists(portFile);
+			}
+		}
+		Runtime.getRuntime().halt(0); // Leaked non daemon threads must not keep this JVM alive
+	}
+
+	/** Serves one run. Returns true if this JVM is no longer clean and must be recycled. */
+	private static boolean serve(Socket socket, String token) throws IOException {
+		socket.setTcpNoDelay(true);
+		DataInputStream in = new DataInputStream(new BufferedInputStream(socket.getInputStream()));
+		DataOutputStream out = new DataOutputStream(new BufferedOutputStream(socket.getOutputStream()));
+
+		String mainClass;
+		String[] classPath;
+		String[] programArgs;
+		try {
+			writeFrame(out, READY, new byte[0], 0, 0);
+			if (!token.equals(readString(in))) {
+				return false;
+			}
+			mainClass = readString(in);
+			classPath = readStrings(in);
+			programArgs = readStrings(in);
+		} catch (IOException e) {
+			return false; // The client gave up before sending a run (it waited while we were busy): nothing ran
+		}
+
+		writeFrame(out, STARTED, new byte[0], 0, 0);
+
+		StdinStream stdin = new StdinStream();
+		Thread stdinPump = new Thread(() -> pumpStdin(in, stdin), "warm-runner-stdin");
+		stdinPump.setDaemon(true);
+		stdinPump.start();
+
+		RunResult result = runProgram(mainClass, classPath, programArgs, stdin, out);
+
+		byte[] status = new byte[4];
+		int exitStatus = result.exitStatus;
+		for (int i = 0; i < 4; i++) {
+			status[i] = (byte) (exitStatus >>> (24 - 8 * i));
+		}
+		writeFrame(out, EXIT, status, 0, 4);
+
+		// The client is released, now check if the program left anything behind
+		if (result.threadsLeaked) {
+			return true;
+		}
+		for (int i = 0; i < 3 && result.loader.get() != null; i++) {
+			System.gc();
+			try {
+				Thread.sleep(10);
+			} catch (InterruptedException e) {
+				Thread.currentThread().interrupt();
+			}
+		}
+		return result.loader.get() != null; // Static state outside the loader still references it
+	}
+
+	private static final class RunResult {
+		int exitStatus;
+		boolean threadsLeaked;
+		WeakReference<ClassLoader> loader;
+	}
+
+	private static RunResult runProgram(String mainClass, String[] classPath, String[] programArgs, InputStream stdin, DataOutputStream out)
+			throws IOException {
+		URL[] urls = new URL[classPath.length];
+		for (int i = 0; i < classPath.length; i++) {
+			urls[i] = Paths.get(classPath[i]).toUri().toURL();
+		}
+
+		RunResult result = new RunResult();
+		URLClassLoader loader = new URLClassLoader("warm-runner-program", urls, ClassLoader.getPlatformClassLoader());
+		ThreadGroup group = new ThreadGroup("warm-runner-program");
+		int[] status = { 0 };
+
+		Properties savedProperties = (Properties) System.getProperties().clone();
+		InputStream savedIn = System.in;
+		PrintStream savedOut = System.out;
+		PrintStream savedErr = System.err;
+		System.setIn(stdin);
+		System.setOut(new PrintStream(new FrameOutputStream(out, STDOUT), true, StandardCharsets.UTF_8));
+		System.setErr(new PrintStream(new FrameOutputStream(out, STDERR), true, StandardCharsets.UTF_8));
+		trappedExitStatus = null;
+		programGroup = group;
+
+		try {
+			Thread mainThread = new Thread(group, () -> {
+				try {
+					Method main = Class.forName(mainClass, true, loader).getMethod("main", String[].class);
+					main.invoke(null, (Object) programArgs);
+				} catch (ClassNotFoundException e) {
+					System.err.println("Error: Could not find or load main class " + mainClass);
+					status[0] = 1;
+				} catch (NoSuchMethodException e) {
+					System.err.println("Error: Main method not found in class " + mainClass);
+					status[0] = 1;
+				} catch (Throwable e) {
+					Throwable cause = e instanceof InvocationTargetException ? e.getCause() : e;
+					if (!isTrappedExit(cause)) {
+						System.err.print("Exception in thread \"main\" ");
+						cause.printStackTrace();
+						status[0] = 1;
+					}
+				}
+			}, "main");
+			mainThread.setContextClassLoader(loader);
+			mainThread.start();
+
+			// Like a real JVM: the program ends when its last non daemon thread ends (or on System.exit)
+			while (trappedExitStatus == null) {
+				Thread running = findLiveThread(group, false);
+				if (running == null) {
+					break;
+				}
+				try {
+					running.join(50);
+				} catch (InterruptedException e) {
+					Thread.currentThread().interrupt();
+					break;
+				}
+			}
+		} finally {
+			System.out.flush();
+			System.err.flush();
+			System.setIn(savedIn);
+			System.setOut(savedOut);
+			System.setErr(savedErr);
+			System.setProperties(savedProperties);
+			programGroup = null;
+			loader.close();
+		}
+
+		result.exitStatus = trappedExitStatus != null ? trappedExitStatus : status[0];
+		result.threadsLeaked = findLiveThread(group, true) != null;
+		result.loader = new WeakReference<>(loader);
+		return result;
+	}
+
+	private static Thread findLiveThread(ThreadGroup group, boolean includeDaemons) {
+		Thread[] threads = new Thread[group.activeCount() + 8];
+		int count = group.enumerate(threads, true);
+		for (int i = 0; i < count; i++) {
+			if (threads[i].isAlive() && (includeDaemons || !threads[i].isDaemon())) {
+				return threads[i];
+			}
+		}
+		return null;
+	}
+
+	private static double heapRatio() {
+		Runtime runtime = Runtime.getRuntime();
+		return (double) (runtime.totalMemory() - runtime.freeMemory()) / runtime.maxMemory();
+	}
+
+	/** Thrown instead of exiting when the program calls System.exit. */
+	private static final class ExitTrappedException extends SecurityException {
+		private static final long serialVersionUID = 1L;
+	}
+
+	private static boolean isTrappedExit(Throwable e) {
+		for (; e != null; e = e.getCause()) {
+			if (e instanceof ExitTrappedException) {
+				return true;
+			}
+		}
+		return false;
+	}
+
+	/**
+	 * Turns System.exit calls of the program into an exception. Needs a security manager, which
+	 * recent JDKs removed: without it, System.exit ends this JVM (the client then recycles it).
+	 */
+	@SuppressWarnings("removal")
+	private static boolean installExitTrap() {
+		try {
+			System.setSecurityManager(new SecurityManager() {
+				@Override
+				public void checkPermission(Permission perm) {
+				}
+
+				@Override
+				public void checkPermission(Permission perm, Object context) {
+				}
+
+				@Override
+				public void checkExit(int status) {
+					ThreadGroup group = programGroup;
+					ThreadGroup current = Thread.currentThread().getThreadGroup();
+					if (group != null && current != null && group.parentOf(current)) {
+						if (trappedExitStatus == null) {
+							trappedExitStatus = status;
+						}
+						throw new ExitTrappedException();
+					}
+				}
+			});
+			return true;
+		} catch (UnsupportedOperationException | SecurityException e) {
+			return false;
+		}
+	}
+
+	private static void pumpStdin(DataInputStream in, StdinStream stdin) {
+		try {
+			while (true) {
+				int type = in.readUnsignedByte();
+				int length = in.readInt();
+				byte[] data = new byte[length];
+				in.readFully(data);
+				if (type != STDIN || length == 0) {
+					break;
+				}
+				stdin.queue.add(data);
+			}
+		} catch (IOException e) {
+			// Client gone: the program sees the end of its input
+		}
+		stdin.queue.add(StdinStream.EOF);
+	}
+
+	/** System.in of a program, fed by the stdin frames of the client. */
+	private static final class StdinStream extends InputStream {
+		static final byte[] EOF = new byte[0];
+		final LinkedBlockingQueue<byte[]> queue = new LinkedBlockingQueue<>();
+		private byte[] current = new byte[0];
+		private int position;
+
+		@Override
+		public int read() throws IOException {
+			byte[] one = new byte[1];
+			return read(one, 0, 1) == -1 ? -1 : one[0] & 0xff;
+		}
+
+		@Override
+		public synchronized int read(byte[] buffer, int offset, int length) throws IOException {
+			if (length == 0) {
+				return 0;
+			}
+			while (position == current.length) {
+				if (current == EOF) {
+					return -1;
+				}
+				try {
+					current = queue.take();
+				} catch (InterruptedException e) {
+					Thread.currentThread().interrupt();
+					throw new IOException("Interrupted while reading stdin", e);
+				}
+				position = 0;
+				if (current == EOF) {
+					queue.add(EOF); // Stay at the end for every later read
+					return -1;
+				}
+			}
+			int count = Math.min(length, current.length - position);
+			System.arraycopy(current, position, buffer, offset, count);
+			position += count;
+			return count;
+		}
+
+		@Override
+		public synchronized int available() {
+			return current.length - position;
+		}
+	}
+
+	/** stdout/stderr of a program, sent as frames (unbuffered, like a terminal). */
+	private static final class FrameOutputStream extends OutputStream {
+		private final DataOutputStream out;
+		private final int type;
+
+		FrameOutputStream(DataOutputStream out, int type) {
+			this.out = out;
+			this.type = type;
+		}
+
+		@Override
+		public void write(int b) throws IOException {
+			write(new byte[] { (byte) b }, 0, 1);
+		}
+
+		@Override
+		public void write(byte[] buffer, int offset, int length) throws IOException {
+			if (length > 0) {
+				writeFrame(out, type, buffer, offset, length);
+			}
+		}
+	}
+
+	private static void writeFrame(DataOutputStream out, int type, byte[] buffer, int offset, int length) throws IOException {
+		synchronized (out) {
+			out.writeByte(type);
+			out.writeInt(length);
+			out.write(buffer, offset, length);
+			out.flush();
+		}
+	}
+
+	private static String readString(DataInputStream in) throws IOException {
+		int length = in.readInt();
+		if (length < 0) {
+			throw new EOFException("Negative string length");
+		}
+		byte[] data = new byte[length];
+		in.readFully(data);
+		return new String(data, StandardCharsets.UTF_8);
+	}
+
+	private static String[] readStrings(DataInputStream in) throws IOException {
+		String[] strings = new String[in.readInt()];
+		for (int i = 0; i < strings.length; i++) {
+			strings[i] = readString(in);
+		}
+		return strings;
+	}
+}
@@ -0,0 +1,148 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import functools
+import subprocess
+
+from config import DEBUG_, JAVAC_CDS, JAVAC_C1_MAX_FILES, JAVAC_HEAP_BASE_MB, JAVAC_HEAP_MB_PER_FILE, JAVAC_MAX_HEAP_MB
+
+CACHE_DIR = os.path.join(os.path.expanduser("~/.cache/automake"), "javac_cds")
+
+# Compiled once to record which classes javac loads: every phase runs (parse, attribute, generate)
+TRAINING_SOURCE = """
+import java.util.*;
+
+public class Training {
+    interface Shape { double area(); }
+    static class Circle implements Shape {
+        private final double radius;
+        Circle(double radius) { this.radius = radius; }
+        public double area() { return Math.PI * radius * radius; }
+    }
+
+    public static void main(String[] args) {
+        List<Shape> shapes = new ArrayList<>();
+        for (String arg : args) shapes.add(new Circle(Double.parseDouble(arg)));
+        Map<Boolean, Long> counts = new HashMap<>();
+        shapes.stream().map(Shape::area).forEach(area -> counts.merge(area > 1, 1L, Long::sum));
+        System.out.println(String.format("%s", counts));
+    }
+}
+"""
+
+
+def get_javac_version() -> tuple[str, int] | None:
+    """Returns the version of the javac on the PATH ("17.0.9", 17), None if unknown."""
+    try:
+        result = subprocess.run(["javac", "-version"], capture_output=True, text=True)
+    except OSError:
+        return None
+    words = (result.stdout + result.stderr).split()  # javac 17.0.9 (stderr before JDK 9)
+    if len(words) < 2 or words[0] != "javac":
+        return None
+    version = words[1]
+    parts = version.split(".")
+    try:
+        return version, int(parts[1]) if parts[0] == "1" else int(parts[0].split("-")[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def get_archive_path(version: str) -> str | None:
+    """Returns the CDS archive of the javac on the PATH, keyed by its version and installation (a JDK update gets a new one)."""
+    javac = shutil.which("javac")
+    if javac is None:
+        return None
+    javac = os.path.realpath(javac)
+    key = hashlib.sha1(f"{javac}:{os.stat(javac).st_mtime_ns}:{version}".encode()).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"javac-{version}-{key}.jsa")
+
+
+def create_archive(archive_path: str) -> bool:
+    """
+    Creates a CDS archive of the classes javac loads, by compiling a small file with
+    -XX:ArchiveClassesAtExit (JDK 13+). A failure is remembered, so it's only tried once per JDK.
+    """
+    failed_marker = f"{archive_path}.failed"
+    if os.path.exists(failed_marker):
+        return False
+    print("📦 Creating the CDS archive of javac (once per JDK)")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{archive_path}.{os.getpid()}.tmp"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        source_path = os.path.join(tmp_dir, "Training.java")
+        with open(source_path, "w") as file:
+            file.write(TRAINING_SOURCE)
+        result = subprocess.run(
+            ["javac", f"-J-XX:ArchiveClassesAtExit={tmp_path}", "-J-XX:+UseSerialGC", "-d", tmp_dir, source_path], capture_output=True, text=True
+        )
+    if result.returncode != 0 or not os.path.exists(tmp_path):
+        if DEBUG_:
+            print(f"Could not create the javac CDS archive:\n{result.stderr}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        open(failed_marker, "w").close()
+        return False
+    os.replace(tmp_path, archive_path)  # Atomic: a concurrent build sees the whole archive or none
+    return True
+
+
+@functools.cache
+def get_cds_flags() -> tuple[str, ...]:
+    """
+    Returns the JVM flags making javac start from its CDS archive, creating the archive first if
+    needed. Nothing when the JDK is older than 13 (no dynamic archives) or it couldn't be created.
+
+    The archive keeps javac's own classes already parsed and verified, which is most of the
+    startup time of a small compile. -Xshare:auto makes the JVM ignore an archive it can't map
+    (e.g. written by another build of the JDK) instead of failing.
+    """
+    if not JAVAC_CDS:
+        return ()
+    javac_version = get_javac_version()
+    if javac_version is None or javac_version[1] < 13:
+        if DEBUG_:
+            print(f"No javac CDS archive: javac version {javac_version}")
+        return ()
+    archive_path = get_archive_path(javac_version[0])
+    if archive_path is None or (not os.path.exists(archive_path) and not create_archive(archive_path)):
+        return ()
+    return ("-Xshare:auto", f"-XX:SharedArchiveFile={archive_path}")
+
+
+def get_heap_flags(batch_size: int) -> list[str]:
+    """Returns the heap of a javac run: the initial heap grows with the number of files, so small batches don't reserve a big heap and big ones don't start by resizing it."""
+    initial_mb = JAVAC_HEAP_BASE_MB + JAVAC_HEAP_MB_PER_FILE * batch_size
+    if JAVAC_MAX_HEAP_MB is not None:
+        return [f"-Xms{min(initial_mb, JAVAC_MAX_HEAP_MB)}m", f"-Xmx{JAVAC_MAX_HEAP_MB}m"]
+    try:
+        default_max_mb = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // 2**20 // 4  # The JVM's default -Xmx
+    except (ValueError, OSError):
+        default_max_mb = 1024
+    return [f"-Xms{min(initial_mb, default_max_mb)}m"]  # Above -Xmx, the JVM wouldn't start
+
+
+def get_javac_jvm_flags(batch_size: int) -> list[str]:
+    """
+    Returns the -J flags tuning the JVM of one javac run for startup: most batches compile a few
+    files, so javac spends more time starting than compiling.
+
+    - The C1 compiler only (-XX:TieredStopAtLevel=1), which compiles javac's hot code sooner. Big
+      batches (more than JAVAC_C1_MAX_FILES files) run long enough to gain from C2, they keep it.
+    - The serial GC, which starts faster than G1 and is enough for a short lived single job.
+    - javac's own CDS archive (get_cds_flags).
+    - A heap sized for the batch (get_heap_flags).
+
+    Args:
+        batch_size (int): Number of files javac compiles.
+
+    Returns:
+        list[str]: Flags to put right after `javac`.
+    """
+    jvm_flags = ["-XX:+UseSerialGC"]
+    if batch_size <= JAVAC_C1_MAX_FILES:
+        jvm_flags.append("-XX:TieredStopAtLevel=1")
+    jvm_flags.extend(get_cds_flags())
+    jvm_flags.extend(get_heap_flags(batch_size))
+    return [f"-J{flag}" for flag in jvm_flags]
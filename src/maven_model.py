@@ -0,0 +1,395 @@
+import os
+import re
+import hashlib
+import xml.etree.ElementTree as ET
+from collections import deque
+from typing import NamedTuple
+
+from incremental import get_sources_fingerprint
+from config import DEBUG_, MAVEN_OUTPUT_DIR, load_json_file, save_json_file
+
+CACHE_DIR = os.path.join(os.path.expanduser("~/.cache/automake"), "maven")
+MAVEN_MODEL_VERSION = 1  # Bump when the cached model changes
+
+PROPERTY = re.compile(r"\$\{([^}]+)\}")
+CLASSPATH_SCOPES = {"compile", "provided", "runtime", "system"}  # The main source set's, test dependencies aren't on it
+TRANSITIVE_SCOPES = {"compile", "runtime"}  # Dependencies of a dependency that come with it
+
+reported_missing = set()  # POMs whose missing dependencies were already reported by this process
+
+
+class MavenModel(NamedTuple):
+    source_dirs: list[str]  # Main source dir, relative to the project root (empty when it doesn't exist)
+    test_source_dirs: list[str]  # Not built: they share the packages of the main one, which the module registry doesn't allow
+    output_dir: str  # Absolute, <build directory>/MAVEN_OUTPUT_DIR
+    classpath: list[str]  # Absolute JAR paths in the local repository, nearest first
+    missing: list[str]  # group:artifact:version not found in the local repository
+
+
+class Pom(NamedTuple):
+    """A POM with its parents merged in."""
+
+    coordinates: tuple[str, str, str]  # group, artifact, version
+    properties: dict[str, str]
+    managed: dict[str, dict]  # "group:artifact" -> managed dependency (dependencyManagement)
+    dependencies: list[dict]  # {"group", "artifact", "version", "scope", "type", "classifier", "optional", "exclusions", "system_path"}
+    build: dict[str, str]  # directory, sourceDirectory, testSourceDirectory, relative to the project or absolute
+    files: list[str]  # POM files read, for the cache
+
+
+def get_pom_file(classpath_file: str) -> str | None:
+    """Returns the pom.xml of a Maven project without a .classpath (the .classpath wins when both exist)."""
+    pom_path = os.path.join(os.path.dirname(classpath_file), "pom.xml")
+    if not os.path.exists(classpath_file) and os.path.exists(pom_path):
+        return pom_path
+    return None
+
+
+def get_local_repository() -> str:
+    """Returns the local Maven repository: <localRepository> of ~/.m2/settings.xml, else ~/.m2/repository."""
+    settings_path = os.path.expanduser("~/.m2/settings.xml")
+    if os.path.exists(settings_path):
+        try:
+            repository = get_text(read_xml(settings_path), "localRepository")
+            if repository:
+                return os.path.expanduser(repository.replace("${user.home}", os.path.expanduser("~")))
+        except ET.ParseError:
+            pass
+    return os.path.expanduser("~/.m2/repository")
+
+
+def get_artifact_path(repository: str, group: str, artifact: str, version: str, extension: str = "jar", classifier: str = "") -> str:
+    """Returns where Maven puts an artifact in a local repository."""
+    suffix = f"-{classifier}" if classifier else ""
+    return os.path.join(repository, *group.split("."), artifact, version, f"{artifact}-{version}{suffix}.{extension}")
+
+
+def read_xml(xml_path: str) -> ET.Element:
+    """Parses an XML file and drops the namespaces of its tags (POMs declare the Maven one)."""
+    root = ET.parse(xml_path).getroot()
+    for element in root.iter():
+        if isinstance(element.tag, str):
+            element.tag = element.tag.rsplit("}", 1)[-1]
+    return root
+
+
+def get_text(element: ET.Element | None, path: str) -> str | None:
+    found = element.find(path) if element is not None else None
+    return found.text.strip() if found is not None and found.text else None
+
+
+def interpolate(value: str | None, properties: dict[str, str]) -> str | None:
+    """Replaces the ${property} of a POM value (properties may use other properties, ${env.NAME} reads the environment)."""
+
+    def replace(match: re.Match) -> str:
+        name = match.group(1)
+        if name in properties:
+            return properties[name]
+        if name.startswith("env."):
+            return os.environ.get(name[len("env.") :], match.group(0))
+        return match.group(0)  # Unknown: left as is
+
+    for _ in range(10):
+        if value is None or "${" not in value:
+            break
+        replaced = PROPERTY.sub(replace, value)
+        if replaced == value:
+            break
+        value = replaced
+    return value
+
+
+def read_dependencies(parent: ET.Element | None) -> list[dict]:
+    dependencies = []
+    for element in parent.findall("dependency") if parent is not None else []:
+        dependencies.append(
+            {
+                "group": get_text(element, "groupId"),
+                "artifact": get_text(element, "artifactId"),
+                "version": get_text(element, "version"),
+                "scope": get_text(element, "scope"),
+                "type": get_text(element, "type") or "jar",
+                "classifier": get_text(element, "classifier") or "",
+                "optional": get_text(element, "optional") == "true",
+                "exclusions": [f"{get_text(exclusion, 'groupId')}:{get_text(exclusion, 'artifactId')}" for exclusion in element.findall("exclusions/exclusion")],
+                "system_path": get_text(element, "systemPath"),
+            }
+        )
+    return dependencies
+
+
+def get_artifact_id(pom_path: str) -> str | None:
+    try:
+        return get_text(read_xml(pom_path), "artifactId")
+    except ET.ParseError:
+        return None  # Not the parent then, it's read from the repository
+
+
+def load_pom(pom_path: str, repository: str, depth: int = 0, missing_parents: list[tuple[str, str]] | None = None) -> Pom:
+    """
+    Reads a POM and merges its parents into it (properties, managed dependencies, dependencies,
+    build directories), the way Maven builds the effective POM, minus profiles and plugins.
+
+    The parent is read from <relativePath> (../pom.xml by default) when it's the right project,
+    else from the local repository. BOMs (`<scope>import</scope>` in dependencyManagement) are
+    read from the local repository.
+
+    Args:
+        missing_parents (list | None): When given, a parent that isn't there or isn't valid XML is
+            skipped (the POM is read without what it inherits) and its ("group:artifact:version",
+            path) added to it, instead of raising.
+
+    Raises:
+        FileNotFoundError: The POM or one of its parents isn't there.
+        ET.ParseError: It isn't valid XML.
+    """
+    if depth > 20:
+        raise ValueError(f"Too many parents above {pom_path}")
+    root = read_xml(pom_path)
+    project_dir = os.path.dirname(os.path.realpath(pom_path))
+
+    parent = None
+    parent_coordinates = ["", "", ""]
+    parent_element = root.find("parent")
+    if parent_element is not None:
+        parent_coordinates = [get_text(parent_element, name) or "" for name in ("groupId", "artifactId", "version")]
+        relative_path = parent_element.find("relativePath")
+        parent_path = os.path.join(project_dir, get_text(parent_element, "relativePath") or "..")
+        if os.path.isdir(parent_path):
+            parent_path = os.path.join(parent_path, "pom.xml")
+        is_local = relative_path is None or get_text(parent_element, "relativePath")  # <relativePath/>: only from the repository
+        if not (is_local and os.path.exists(parent_path) and get_artifact_id(parent_path) == parent_coordinates[1]):
+            parent_path = get_artifact_path(repository, *parent_coordinates, extension="pom")
+        try:
+            parent = load_pom(parent_path, repository, depth + 1, missing_parents)
+        except (FileNotFoundError, ET.ParseError) as e:
+            if missing_parents is None:
+                raise
+            if DEBUG_:
+                print(f"Can't read the parent POM {parent_path}: {e}")
+            missing_parents.append((":".join(parent_coordinates), parent_path))
+
+    inherited = parent.coordinates if parent else parent_coordinates  # From <parent> when it couldn't be read
+    group = get_text(root, "groupId") or inherited[0]
+    artifact = get_text(root, "artifactId") or ""
+    version = get_text(root, "version") or inherited[2]
+
+    properties = dict(parent.properties) if parent else {}
+    properties_element = root.find("properties")
+    for element in properties_element if properties_element is not None else []:
+        if isinstance(element.tag, str):
+            properties[element.tag] = (element.text or "").strip()
+    properties.update(
+        {
+            "project.groupId": group,
+            "project.artifactId": artifact,
+            "project.version": version,
+            "pom.version": version,
+            "version": version,
+            "project.basedir": project_dir,
+            "basedir": project_dir,
+        }
+    )
+    if parent:
+        properties["project.parent.groupId"], _, properties["project.parent.version"] = parent.coordinates
+    coordinates = (interpolate(group, properties), artifact, interpolate(version, properties))
+
+    files = (parent.files if parent else []) + [os.path.realpath(pom_path)]
+    managed = dict(parent.managed) if parent else {}
+    own_managed = {}
+    for dependency in read_dependencies(root.find("dependencyManagement/dependencies")):
+        for key in ("group", "artifact", "version", "scope", "classifier"):
+            dependency[key] = interpolate(dependency[key], properties)
+        if dependency["scope"] == "import" and dependency["type"] == "pom":
+            bom_path = get_artifact_path(repository, dependency["group"], dependency["artifact"], dependency["version"], extension="pom")
+            try:
+                bom = load_pom(bom_path, repository, depth + 1)
+            except (FileNotFoundError, ET.ParseError, ValueError) as e:
+                if DEBUG_:
+                    print(f"Can't read the BOM {bom_path}: {e}")
+                continue
+            files.extend(bom.files)
+            for key, bom_dependency in bom.managed.items():
+                own_managed.setdefault(key, bom_dependency)  # Declared ones win over imported ones
+        else:
+            own_managed[f"{dependency['group']}:{dependency['artifact']}"] = dependency
+    managed.update(own_managed)
+
+    dependencies = list(parent.dependencies) if parent else []
+    for dependency in read_dependencies(root.find("dependencies")):
+        for key in ("group", "artifact", "version", "scope", "classifier", "system_path"):
+            dependency[key] = interpolate(dependency[key], properties)
+        dependencies.append(dependency)
+
+    build = dict(parent.build) if parent else {}
+    for name in ("directory", "sourceDirectory", "testSourceDirectory"):
+        value = get_text(root, f"build/{name}")
+        if value is not None:
+            build[name] = interpolate(value, properties)
+    if parent:
+        # Inherited paths are relative to this project, not the parent (${project.basedir} was the parent's)
+        build = {name: value.replace(parent.properties["project.basedir"], project_dir) for name, value in build.items()}
+
+    return Pom(coordinates, properties, managed, dependencies, build, files)
+
+
+def get_version_dir(repository: str, group: str, artifact: str, version: str) -> str | None:
+    """Resolves a version range (`[1.2,2.0)`) to the highest version in the local repository, other versions are kept."""
+    if not version or version[0] not in "[(":
+        return version
+    if "," not in version:
+        return version.strip("[]()")  # [1.2]: exactly that one
+    artifact_dir = os.path.join(repository, *group.split("."), artifact)
+    low, high = (bound.strip() for bound in version[1:-1].split(",", 1))
+
+    def key(text: str) -> list:
+        return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"[.-]", text)]
+
+    candidates = []
+    for local_version in os.listdir(artifact_dir) if os.path.isdir(artifact_dir) else []:
+        if low and (key(local_version) < key(low) or (version[0] == "(" and key(local_version) == key(low))):
+            continue
+        if high and (key(local_version) > key(high) or (version[-1] == ")" and key(local_version) == key(high))):
+            continue
+        candidates.append(local_version)
+    return max(candidates, key=key) if candidates else None
+
+
+def resolve_classpath(pom: Pom, repository: str) -> tuple[list[str], list[str], list[str], list[str]]:
+    """
+    Resolves the JARs of a project's dependencies and theirs, from the local repository only.
+
+    Like Maven, the nearest declaration of an artifact wins (breadth first), the project's
+    dependencyManagement sets the versions of transitive dependencies too, and exclusions and
+    optional dependencies are honoured.
+
+    Returns:
+        tuple: (JAR paths, "group:artifact:version" of the missing ones, their JAR paths, POMs of
+        the repository read)
+    """
+    classpath, missing, missing_paths, files = [], [], [], []
+    resolved = set()  # group:artifact already placed
+    queue = deque((dependency, frozenset(), True) for dependency in pom.dependencies)
+    while queue:
+        dependency, exclusions, direct = queue.popleft()
+        key = f"{dependency['group']}:{dependency['artifact']}"
+        if key in resolved or key in exclusions or f"{dependency['group']}:*" in exclusions:
+            continue
+        managed = pom.managed.get(key, {})
+        scope = dependency["scope"] if direct and dependency["scope"] else managed.get("scope") or dependency["scope"] or "compile"
+        version = managed.get("version") if not direct or not dependency["version"] else dependency["version"]
+        version = version or dependency["version"]
+        if scope not in CLASSPATH_SCOPES or (not direct and (scope not in TRANSITIVE_SCOPES or dependency["optional"])):
+            continue
+        resolved.add(key)
+
+        if scope == "system":
+            if dependency["system_path"]:
+                classpath.append(dependency["system_path"])
+            continue
+        version = get_version_dir(repository, dependency["group"], dependency["artifact"], version) if version else None
+        if not version:
+            missing.append(f"{key}:{dependency['version'] or '?'}")
+            continue
+
+        if dependency["type"] != "pom":
+            classifier = "tests" if dependency["type"] == "test-jar" else dependency["classifier"]
+            jar_path = get_artifact_path(repository, dependency["group"], dependency["artifact"], version, classifier=classifier)
+            if os.path.exists(jar_path):
+                classpath.append(jar_path)
+            else:
+                missing.append(f"{key}:{version}")
+                missing_paths.append(jar_path)
+                continue
+
+        pom_path = get_artifact_path(repository, dependency["group"], dependency["artifact"], version, extension="pom")
+        try:
+            dependency_pom = load_pom(pom_path, repository)
+        except (FileNotFoundError, ET.ParseError, ValueError) as e:
+            if DEBUG_:
+                print(f"No dependencies read for {key}:{version}: {e}")
+            continue
+        files.extend(dependency_pom.files)
+        transitive_exclusions = exclusions | set(dependency["exclusions"])
+        for transitive in dependency_pom.dependencies:
+            transitive = dict(transitive)
+            if not transitive["version"]:
+                transitive["version"] = dependency_pom.managed.get(f"{transitive['group']}:{transitive['artifact']}", {}).get("version")
+            if not transitive["scope"]:
+                transitive["scope"] = dependency_pom.managed.get(f"{transitive['group']}:{transitive['artifact']}", {}).get("scope")
+            queue.append((transitive, transitive_exclusions, False))
+    return classpath, missing, missing_paths, files
+
+
+def get_model_key(pom_path: str, repository: str) -> str:
+    with open(pom_path, "rb") as file:
+        pom_hash = hashlib.sha1(file.read()).hexdigest()
+    return hashlib.sha1(f"{MAVEN_MODEL_VERSION}:{os.path.realpath(pom_path)}:{repository}:{MAVEN_OUTPUT_DIR}:{pom_hash}".encode()).hexdigest()[:16]
+
+
+def is_model_valid(cached: dict) -> bool:
+    """The cached model holds as long as no POM it read changed and no missing JAR appeared."""
+    try:
+        if get_sources_fingerprint(cached["files"]) != cached["fingerprint"]:
+            return False
+    except FileNotFoundError:
+        return False
+    return not any(os.path.exists(path) for path in cached["missing_paths"])
+
+
+def report_missing(pom_path: str, model: MavenModel, repository: str) -> None:
+    if model.missing and pom_path not in reported_missing:
+        reported_missing.add(pom_path)
+        print(f"❌ Not in {repository}: {', '.join(model.missing)} (run `mvn dependency:go-offline` once to download them)")
+
+
+def load_maven_model(pom_path: str) -> MavenModel:
+    """
+    Returns the project model of a Maven project, read from its pom.xml without running Maven:
+    source dirs, output dir, and the classpath of its dependencies resolved offline from the local
+    repository (~/.m2/repository, or <localRepository> of ~/.m2/settings.xml).
+
+    That's the main source set (src/main/java and its compile, provided, runtime and system
+    dependencies), what `mvn compile` builds.
+
+    The model is cached in ~/.cache/automake/maven/, keyed by the hash of the POM, and kept as long
+    as none of the POMs it read (parents, BOMs, dependencies) changed.
+
+    The classes go to <build directory>/MAVEN_OUTPUT_DIR (target/automake-classes), not
+    target/classes, so Maven never packages automake's state and flavor directories.
+
+    Args:
+        pom_path (str): pom.xml of the project.
+
+    Returns:
+        MavenModel: The model. Dependencies and parent POMs not in the local repository are in
+        `missing`, the build goes on without them (`mvn dependency:go-offline` downloads them).
+    """
+    repository = get_local_repository()
+    cache_path = os.path.join(CACHE_DIR, f"{get_model_key(pom_path, repository)}.json")
+    cached = load_json_file(cache_path)
+    if isinstance(cached, dict) and is_model_valid(cached):
+        model = MavenModel(**cached["model"])
+        report_missing(pom_path, model, repository)
+        return model
+
+    missing_parents = []
+    pom = load_pom(pom_path, repository, missing_parents=missing_parents)
+    project_dir = os.path.dirname(os.path.realpath(pom_path))
+    source_dir = os.path.relpath(os.path.join(project_dir, pom.build.get("sourceDirectory", "src/main/java")), project_dir)
+    test_source_dir = os.path.relpath(os.path.join(project_dir, pom.build.get("testSourceDirectory", "src/test/java")), project_dir)
+    source_dirs = [source_dir] if os.path.isdir(os.path.join(project_dir, source_dir)) else []
+    test_source_dirs = [test_source_dir] if os.path.isdir(os.path.join(project_dir, test_source_dir)) else []
+    output_dir = os.path.join(project_dir, pom.build.get("directory", "target"), MAVEN_OUTPUT_DIR)
+    classpath, missing, missing_paths, repository_files = resolve_classpath(pom, repository)
+    # Without its parent, the POM lacks the versions and dependencies it inherits: reported like a missing JAR
+    missing = [f"{coordinates} (parent POM)" for coordinates, _ in missing_parents] + missing
+    missing_paths = [path for _, path in missing_parents] + missing_paths
+    model = MavenModel(source_dirs, test_source_dirs, output_dir, classpath, missing)
+
+    report_missing(pom_path, model, repository)
+    if DEBUG_:
+        print(f"Maven model of {':'.join(pom.coordinates)}: {source_dirs}, {len(classpath)} JARs")
+    files = sorted(set(pom.files + repository_files))
+    save_json_file(cache_path, {"model": model._asdict(), "files": files, "fingerprint": get_sources_fingerprint(files), "missing_paths": missing_paths})
+    return model
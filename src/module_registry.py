@@ -0,0 +1,212 @@
+import os
+import sys
+from array import array
+from collections.abc import Mapping
+
+PACKAGE = 1  # Kind flag of a package directory
+FILE = 2  # Kind flag of a Java file
+
+
+class ModuleRegistry:
+    """
+    Compact table of every module (package directory or Java file) of a project.
+
+    Each module name is interned once and gets an integer id. Paths are not stored: a
+    module only keeps the id of its source root and a kind flag (in compact arrays), and
+    its path is rebuilt from the root and the name when asked for. Only the rare paths that
+    can't be derived this way (symlinked files, dots in directory names) are kept aside.
+
+    `path_to_module` and `module_to_path` are dict-like views over the registry, so code
+    written against the old dictionaries keeps working.
+    """
+
+    def __init__(self):
+        self.names: list[str] = []  # id -> interned module name
+        self.ids: dict[str, int] = {}  # module name -> id
+        self.source_roots: list[str] = []  # root id -> real path of the source directory
+        self.root_ids = array("H")  # id -> root id
+        self.kinds = array("B")  # id -> PACKAGE / FILE
+        self.path_overrides: dict[int, str] = {}  # id -> path, for paths that can't be derived
+        self.override_ids: dict[str, int] = {}  # path -> id, reverse of path_overrides
+        self.path_to_module = PathToModuleView(self)
+        self.module_to_path = ModuleToPathView(self)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add_source_root(self, src_path: str) -> int:
+        self.source_roots.append(src_path)
+        return len(self.source_roots) - 1
+
+    def derive_path(self, root_id: int, name: str, kind: int) -> str:
+        relative_path = name.replace(".", os.sep)
+        if kind == FILE:
+            relative_path += ".java"
+        return os.path.join(self.source_roots[root_id], relative_path)
+
+    def add(self, name: str, root_id: int, kind: int, path: str) -> int:
+        """Registers a module and returns its id."""
+        name = sys.intern(name)
+        module_id = len(self.names)
+        self.names.append(name)
+        self.ids[name] = module_id
+        self.root_ids.append(root_id)
+        self.kinds.append(kind)
+        if root_id >= len(self.source_roots) or self.derive_path(root_id, name, kind) != path:
+            self.path_overrides[module_id] = path
+            self.override_ids[path] = module_id
+        return module_id
+
+    def path(self, module_id: int) -> str:
+        if module_id in self.path_overrides:
+            return self.path_overrides[module_id]
+        return self.derive_path(self.root_ids[module_id], self.names[module_id], self.kinds[module_id])
+
+    def id_of_path(self, path: str) -> int | None:
+        """Returns the id of the module at `path`, or None if it isn't registered."""
+        if path in self.override_ids:
+            return self.override_ids[path]
+
+        kind = FILE if path.endswith(".java") else PACKAGE
+        for root_id, src_path in enumerate(self.source_roots):
+            if not path.startswith(src_path + os.sep):
+                continue
+            relative_path = path[len(src_path) + 1 :]
+            if kind == FILE:
+                relative_path = relative_path[:-5]
+            module_id = self.ids.get(relative_path.replace(os.sep, "."))
+            if module_id is not None and module_id not in self.path_overrides and self.root_ids[module_id] == root_id and self.kinds[module_id] == kind:
+                return module_id
+        return None
+
+
+class PathToModuleView(Mapping):
+    """Read only `path -> module name` view of a ModuleRegistry."""
+
+    def __init__(self, registry: ModuleRegistry):
+        self.registry = registry
+
+    def __getitem__(self, path: str) -> str:
+        module_id = self.registry.id_of_path(path)
+        if module_id is None:
+            raise KeyError(path)
+        return self.registry.names[module_id]
+
+    def __contains__(self, path) -> bool:
+        return isinstance(path, str) and self.registry.id_of_path(path) is not None
+
+    def __iter__(self):
+        return (self.registry.path(module_id) for module_id in range(len(self.registry)))
+
+    def __len__(self):
+        return len(self.registry)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class ModuleToPathView(Mapping):
+    """`module name -> path` view of a ModuleRegistry."""
+
+    def __init__(self, registry: ModuleRegistry):
+        self.registry = registry
+
+    def __getitem__(self, name: str) -> str:
+        return self.registry.path(self.registry.ids[name])
+
+    def __setitem__(self, name: str, path: str):
+        # Only used to re-assert known entries (e.g. the root file of a dependency tree)
+        if name in self.registry.ids:
+            module_id = self.registry.ids[name]
+            if self.registry.path(module_id) != path:
+                self.registry.path_overrides[module_id] = path
+                self.registry.override_ids[path] = module_id
+        else:
+            self.registry.add(name, 0, FILE if path.endswith(".java") else PACKAGE, path)
+
+    def __contains__(self, name) -> bool:
+        return name in self.registry.ids
+
+    def __iter__(self):
+        return iter(self.registry.names)
+
+    def __len__(self):
+        return len(self.registry)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+def build_module_registry(project_root_path: str, source_dirs: list[str]) -> ModuleRegistry:
+    """
+    Scans the project source directories and registers every package directory and Java file.
+
+    Module names don't contain the source directory (no `src.` or `mysrc.` prefix), and
+    real paths are used to avoid relative path issues.
+
+    Args:
+        project_root_path (str): Root directory of the project.
+        source_dirs (list[str]): List of source directories to scan.
+
+    Returns:
+        ModuleRegistry: The registry of the project.
+
+    Raises:
+        ValueError: If two different source directories contain the same package name,
+            or a module is defined in multiple locations.
+    """
+    registry = ModuleRegistry()
+    package_dirs = {}  # Track package directories to detect duplicates
+
+    for src_dir in source_dirs:
+        src_path = os.path.realpath(os.path.join(project_root_path, src_dir))  # Use realpath for consistency
+
+        if not os.path.exists(src_path):
+            continue  # Skip non-existent source directories
+
+        root_id = registry.add_source_root(src_path)
+
+        for root, _, files in os.walk(src_path):
+            root = os.path.realpath(root)  # Normalize root path
+
+            # Compute package name relative to the src_dir
+            relative_dir_path = os.path.relpath(root, src_path)
+            package_name = relative_dir_path.replace(os.sep, ".") if relative_dir_path != "." else ""
+
+            # Ensure no duplicate package exists in different source directories
+            if package_name and package_name in package_dirs and package_dirs[package_name] != root:
+                raise ValueError(
+                    f"Error: Package '{package_name}' exists in multiple source directories: " f"{package_dirs[package_name]} and {root}"
+                )
+
+            # Store package directory (only if it's a package, not the root)
+            if package_name:
+                if package_name in registry.ids:
+                    raise ValueError(f"Error: Package '{package_name}' clashes with the module at {registry.module_to_path[package_name]}")
+                package_dirs[package_name] = root
+                registry.add(package_name, root_id, PACKAGE, root)
+
+            for file in files:
+                if not file.endswith(".java"):  # Skip non-Java files
+                    continue
+
+                file_path = os.path.realpath(os.path.join(root, file))  # Use realpath
+
+                # Convert file path to module name (without src. or mysrc. prefix)
+                relative_path = os.path.relpath(os.path.join(root, file), src_path)
+                module_name = relative_path.replace(os.sep, ".").replace(".java", "")  # Convert path to dot notation
+
+                # If the file is directly inside `src/` or `mysrc/`, use only the filename
+                if package_name == "":
+                    module_name = file.replace(".java", "")
+
+                # Check for duplicate module definitions
+                if module_name in registry.ids:
+                    raise ValueError(
+                        f"Error: Module '{module_name}' is defined in multiple locations: "
+                        f"{registry.module_to_path[module_name]} and {file_path}"
+                    )
+
+                registry.add(module_name, root_id, FILE, file_path)
+
+    return registry
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import subprocess
+from collections import deque
+from typing import NamedTuple
+
+from config import CAPTURE_TAIL_LINES
+
+
+class CapturedRun(NamedTuple):
+    """Result of run_captured, used like a CompletedProcess (returncode, stdout, stderr)."""
+
+    returncode: int
+    stdout: str  # Only the last lines
+    stderr: str  # Only the last lines
+
+
+def get_log_path(output_dir: str, name: str) -> str:
+    """Returns the log of a captured run, next to the flavor output dirs (<output_dir>/../logs/<name>.log)."""
+    return os.path.join(os.path.dirname(output_dir), "logs", f"{name}.log")
+
+
+def run_captured(
+    cmd: list[str], log_path: str | None = None, echo: bool = True, tail_lines: int = CAPTURE_TAIL_LINES, append: bool = False
+) -> CapturedRun:
+    """
+    Runs a command, reading its stdout and stderr as they come instead of buffering them until it exits.
+
+    Output goes to the terminal (if `echo`) and to the log file as it arrives, and only the last
+    `tail_lines` lines of each stream are kept in memory, for error reports. The program keeps
+    the terminal's stdin.
+
+    Args:
+        cmd (list[str]): Command to run.
+        log_path (str, optional): File getting both streams, as they interleave.
+        echo (bool): Write the output to the terminal too.
+        tail_lines (int): Lines of each stream kept in memory.
+        append (bool): Append to the log instead of replacing it.
+
+    Returns:
+        CapturedRun: Exit code and the tails of the output.
+    """
+    log = None
+    if log_path is not None:
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        log = open(log_path, "ab" if append else "wb")
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    tails = {"stdout": deque(maxlen=tail_lines), "stderr": deque(maxlen=tail_lines)}
+    lock = threading.Lock()  # Chunks of both streams are echoed and logged one at a time
+
+    def pump(pipe, name: str, terminal) -> None:
+        partial = b""
+        while chunk := pipe.read1(65536):
+            lines = (partial + chunk).split(b"\n")
+            partial = lines.pop()
+            with lock:
+                if echo:
+                    terminal.write(chunk)
+                    terminal.flush()
+                if log is not None:
+                    log.write(chunk)
+                tails[name].extend(line.decode(errors="replace") for line in lines)
+        if partial:
+            tails[name].append(partial.decode(errors="replace"))
+
+    threads = [
+        threading.Thread(target=pump, args=(process.stdout, "stdout", sys.stdout.buffer), daemon=True),
+        threading.Thread(target=pump, args=(process.stderr, "stderr", sys.stderr.buffer), daemon=True),
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        returncode = process.wait()
+    except KeyboardInterrupt:
+        process.terminate()
+        returncode = process.wait()
+    finally:
+        if log is not None:
+            log.close()
+
+    return CapturedRun(returncode, "\n".join(tails["stdout"]), "\n".join(tails["stderr"]))
+
+
+def replay_log(source_path: str, log_path: str, echo: bool = True) -> None:
+    """Appends a log kept aside (the output of an attempt that could have been retried) to `log_path`, printing it if `echo`, then deletes it."""
+    with open(source_path, "rb") as source:
+        output = source.read()
+    with open(log_path, "ab") as log:
+        log.write(output)
+    if echo:
+        sys.stderr.buffer.write(output)
+        sys.stderr.flush()
+    os.remove(source_path)
@@ -0,0 +1,109 @@
+import os
+from typing import NamedTuple
+
+import javalang
+
+from java_file_analyser import parse_java_file, declares_main_method, declares_tests, declares_jupiter_tests
+from incremental import get_source_fingerprint
+from config import load_json_file, save_json_file
+
+PARSE_CACHE_FILE = "parse_cache.json"
+PARSE_CACHE_VERSION = 4
+
+
+class PackageDeclaration(NamedTuple):
+    name: str
+
+
+class ImportDeclaration(NamedTuple):
+    path: str
+    wildcard: bool
+    static: bool
+
+
+class FileHeader(NamedTuple):
+    """The part of a parsed Java file the dependency analysis reads (same attributes as javalang's CompilationUnit)."""
+
+    package: PackageDeclaration | None
+    imports: list[ImportDeclaration]
+
+
+class ParseCache:
+    """
+    Package and imports of each Java file, kept between builds (<output_dir>/.automake/parse_cache.json),
+    with whether it declares a main method, JUnit 4 tests or JUnit 5 ones (entry_points.py).
+
+    An entry is reused when its file is unchanged: git says so (change_detection.py) or its
+    [mtime, size] fingerprint is the same. Only the files that changed are parsed again. Imports
+    are resolved to modules on every build, so adding or removing files elsewhere is seen.
+
+    Files that don't parse get an entry too, with the error, raised again until they change.
+    """
+
+    def __init__(self, state_root: str, git_changes=None):
+        self.path = os.path.join(state_root, PARSE_CACHE_FILE)
+        self.git_changes = git_changes
+        cache = load_json_file(self.path)
+        valid = isinstance(cache, dict) and cache.get("version") == PARSE_CACHE_VERSION
+        self.entries: dict[str, dict] = cache["entries"] if valid else {}  # path -> {"fingerprint", "head", "package", "imports", "main", "tests", "jupiter_tests"} or {"fingerprint", "head", "error"}
+        self.changed = False
+        self.hits = 0
+        self.misses = 0
+
+    def is_valid(self, java_file_path: str, entry: dict) -> bool:
+        if self.git_changes is not None and self.git_changes.is_unchanged_since(java_file_path, entry["head"]):
+            return True
+        if entry["fingerprint"] != get_source_fingerprint(java_file_path):
+            return False
+        if self.git_changes is not None and entry["head"] != self.git_changes.head:
+            entry["head"] = self.git_changes.get_head_for(java_file_path)  # Compared to a recent commit next time
+            self.changed = True
+        return True
+
+    def get_entry(self, java_file_path: str) -> dict:
+        """Returns the cache entry of a Java file, parsing it only if it changed. Parse errors are raised."""
+        entry = self.entries.get(java_file_path)
+        if entry is not None and self.is_valid(java_file_path, entry):
+            self.hits += 1
+            if "error" in entry:
+                raise javalang.parser.JavaSyntaxError(entry["error"])
+            return entry
+
+        self.misses += 1
+        fingerprint = get_source_fingerprint(java_file_path)  # Before reading, so an edit made meanwhile is seen
+        head = self.git_changes.get_head_for(java_file_path) if self.git_changes is not None else None
+        try:
+            tree, _ = parse_java_file(java_file_path)
+        except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError) as e:
+            self.entries[java_file_path] = {"fingerprint": fingerprint, "head": head, "error": str(e) or type(e).__name__}
+            self.changed = True
+            raise
+        entry = {
+            "fingerprint": fingerprint,
+            "head": head,
+            "package": tree.package.name if tree.package else None,
+            "imports": [[imp.path, bool(imp.wildcard), bool(imp.static)] for imp in tree.imports],
+            "main": declares_main_method(tree),
+            "tests": declares_tests(tree),
+            "jupiter_tests": declares_jupiter_tests(tree),
+        }
+        self.entries[java_file_path] = entry
+        self.changed = True
+        return entry
+
+    def get_header(self, java_file_path: str) -> FileHeader:
+        """Returns the package and imports of a Java file, parsing it only if it changed. Parse errors are raised."""
+        entry = self.get_entry(java_file_path)
+        package = PackageDeclaration(entry["package"]) if entry["package"] is not None else None
+        return FileHeader(package, [ImportDeclaration(*imp) for imp in entry["imports"]])
+
+    def save(self, path_to_module=None) -> None:
+        """Writes the cache if it changed, dropping the files that aren't in `path_to_module` anymore."""
+        if path_to_module is not None:
+            removed = [path for path in self.entries if path not in path_to_module]
+            for path in removed:
+                del self.entries[path]
+            self.changed |= bool(removed)
+        if self.changed:
+            save_json_file(self.path, {"version": PARSE_CACHE_VERSION, "entries": self.entries})
+            self.changed = False
@@ -0,0 +1,285 @@
+import os
+import time
+import shutil
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from find_dependency_tree import iter_sccs, get_module_dependencies
+from find_dependency_tree_helper import get_source_dirs_from_classpath
+from module_registry import build_module_registry
+from compiler import get_javac_command, print_keep_going_report
+from build_flavor import get_javac_flags
+from incremental import get_source_fingerprint, get_sources_fingerprint, load_build_state, save_build_state
+from incremental import get_compile_reason, record_compiled_batch, record_checked_batch, forget_batches, record_class_dependencies
+from class_manifest import load_class_manifest, save_class_manifest, get_staging_dir, install_batch_classes, remove_orphan_classes
+from jar_index import ClasspathIndex, get_batch_jars, trim_classpath, is_missing_class_error
+from output_capture import run_captured, get_log_path, replay_log
+from config import PRINT_OUTPUT, DEBUG_, BYTECODE_DEPENDENCIES, JAVAC_MAX_ERRORS
+from workspace import get_stale_modules
+
+
+async def run_javac(compile_cmd: list[str], log_path: str):
+    """
+    Runs javac in a worker thread, without blocking the event loop, like compile_project does:
+    output written to the batch's own log. Nothing is
+    printed as it comes, batches compile concurrently.
+
+    Returns:
+        CapturedRun: Exit code and the tails of the output.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(run_captured, compile_cmd, log_path, echo=False))
+
+
+async def pipeline_compile(
+    java_file_paths: list[str],
+    project_root_path: str,
+    output_dir: str,
+    classpath: str,
+    debug: bool = False,
+    release: int | None = None,
+    state_dir: str | None = None,
+    trim_jars: bool = False,
+    jobs: int | None = None,
+    explanation=None,
+    git_changes=None,
+    parse_cache=None,
+    upstream_recompiled: set[str] = set(),
+    failure: dict | None = None,
+    keep_going: bool = False,
+) -> tuple[bool, dict]:
+    """
+    Analyses and compiles entry files as one pipeline: a batch (SCC) goes to javac as soon as
+    its whole subgraph is known, while the rest of the graph is still being parsed.
+
+    Parsing runs in a worker thread, driving a lazy Tarjan (iter_sccs) that emits SCCs
+    dependencies first. Each SCC becomes a task that waits for the SCCs it depends on, then
+    compiles (up to `jobs` javac at a time), so javac work hides the analysis latency.
+    Batches are skipped, staged and recorded like in compile_project. Each batch logs to its own
+    file, added to the javac log in one piece once the batch is done, so concurrent batches don't
+    interleave there.
+
+    Args:
+        java_file_paths (list[str]): Entry files.
+        project_root_path (str): Root directory of the project.
+        output_dir (str): Flavor output directory.
+        classpath (str): The full classpath string for dependencies.
+        debug (bool): Compile with -g.
+        release (int, optional): Target Java release (`javac --release`).
+        state_dir (str, optional): Incremental state directory of the flavor.
+        trim_jars (bool): Compile each batch against only the JARs it needs.
+        jobs (int, optional): Maximum number of javac running at the same time.
+        explanation (BuildExplanation, optional): Records why each batch was compiled or skipped (--explain).
+        git_changes (GitChanges, optional): Sources git knows didn't change aren't stat'ed (change_detection.py).
+        parse_cache (ParseCache, optional): Only parse the files that changed (parse_cache.py).
+        upstream_recompiled (set[str]): Modules recompiled in the referenced projects: the batches
+            importing them are recompiled (workspace.get_stale_modules).
+        failure (dict, optional): Filled with {"batch", "errors"} of the batch that failed.
+        keep_going (bool): When a batch fails, keep compiling the batches that don't depend on it,
+            skip the ones that do, and report every failure together at the end (like compile_project).
+
+    Returns:
+        tuple[bool, dict]: (compiled, analysis), with the same keys as analyse_project's result;
+        compilation_order lists the batches in the order they were discovered. It also has
+        "sources_fingerprint": get_sources_fingerprint of the sources, as they were when parsed
+        (before their javac), for build_lock.record_build.
+    """
+    source_dirs = get_source_dirs_from_classpath(f"{project_root_path}/.classpath")
+    registry = build_module_registry(project_root_path, source_dirs)
+    path_to_module, module_to_path = registry.path_to_module, registry.module_to_path
+    roots = [path_to_module[java_file_path] for java_file_path in java_file_paths]
+
+    dependency_tree: dict[str, list[str]] = {}
+    external_imports: dict[str, list[str]] = {}
+    source_fingerprints: dict[str, list[int]] = {}
+    loop = asyncio.get_running_loop()
+
+    def record_dependencies(module: str, dependencies: list[str], imports: dict[str, list[str]], fingerprint: list[int], parse_seconds: float) -> None:
+        dependency_tree[module] = dependencies
+        external_imports.update(imports)
+        source_fingerprints[module_to_path[module]] = fingerprint
+        if explanation is not None:
+            explanation.add_time("analysis", parse_seconds)  # Overlaps javac
+
+    def get_dependencies(module: str) -> list[str]:
+        # Runs in the parser thread, while the event loop reads the graph: it's only updated from the loop,
+        # before the loop gets the SCC of the module (callbacks run in the order they're scheduled)
+        parse_start = time.perf_counter()
+        fingerprint = get_source_fingerprint(module_to_path[module])  # Before its javac, which waits for the SCC
+        imports = {}
+        dependencies = get_module_dependencies(module, module_to_path, path_to_module, external_imports=imports, parse_cache=parse_cache)
+        dependencies = [dep for dep in dependencies if dep != module]
+        loop.call_soon_threadsafe(record_dependencies, module, dependencies, imports, fingerprint, time.perf_counter() - parse_start)
+        return dependencies
+
+    javac_flags = get_javac_flags(debug=debug, release=release)
+    build_state = load_build_state(state_dir, javac_flags, classpath) if state_dir else None
+    os.makedirs(output_dir, exist_ok=True)
+    javac_log_path = get_log_path(output_dir, f"javac-{os.path.basename(output_dir)}")  # The one of compile_project
+    if os.path.exists(javac_log_path):
+        os.remove(javac_log_path)
+    class_manifest = None
+    if state_dir:
+        class_manifest = load_class_manifest(state_dir)
+        remove_orphan_classes(class_manifest, module_to_path, output_dir)
+
+    classpath_index = ClasspathIndex(classpath) if trim_jars else None
+    closure_jars: dict[str, set[str]] = {}
+    full_classpath_modules = set(build_state.get("full_classpath_modules", [])) if build_state is not None and trim_jars else set()
+
+    compilation_order: list[list[str]] = []
+    tasks: dict[str, asyncio.Task] = {}  # module -> task compiling its SCC
+    recompiled_modules: set[str] = set()
+    done_modules: set[str] = set()  # Compiled or up to date
+    semaphore = asyncio.Semaphore(jobs or os.cpu_count() or 1)
+    failed = False  # Stops the build, never set with keep_going
+    failed_batches: list[tuple[list[str], str]] = []  # (batch, javac errors), with keep_going
+    skipped_batches: list[list[str]] = []  # Batches depending on a failed one, with keep_going
+    blocked_modules: dict[str, str] = {}  # Module of a failed or skipped batch -> module of the failed batch behind it
+
+    async def compile_scc(batch_index: int, java_group: list[str], dep_tasks: set, batch_classpath: str) -> bool:
+        nonlocal failed
+        if dep_tasks and not all(await asyncio.gather(*dep_tasks)):
+            if keep_going and not failed:
+                # Its errors would only be consequences of the failed batch
+                blocker = next(dep for module in java_group for dep in dependency_tree[module] if dep in blocked_modules)
+                skipped_batches.append(java_group)
+                blocked_modules.update(dict.fromkeys(java_group, blocked_modules[blocker]))
+                if explanation is not None:
+                    explanation.record_blocked(java_group, blocked_modules[blocker])
+            return False
+        if failed:
+            return False
+
+        reason = {"reason": "not incremental", "module": None, "detail": "no state dir"}
+        stale_modules = get_stale_modules({module: external_imports.get(module, []) for module in java_group}, upstream_recompiled) if upstream_recompiled else set()
+        if stale_modules and build_state is not None:
+            stale_module = min(stale_modules)
+            reason = {"reason": "upstream project recompiled", "module": None, "detail": f"{stale_module} uses its classes"}
+        elif build_state is not None:
+            reason = get_compile_reason(java_group, build_state, module_to_path, output_dir, recompiled_modules, dependency_tree, git_changes)
+            if reason is None:
+                if DEBUG_:
+                    print(f"Up to date: {java_group}")
+                if git_changes is not None:
+                    record_checked_batch(build_state, java_group, git_changes)
+                if explanation is not None:
+                    explanation.record_skipped(java_group)
+                done_modules.update(java_group)
+                return True
+
+        async with semaphore:
+            if failed:
+                return False
+            java_files = [module_to_path[module] for module in java_group]
+            if PRINT_OUTPUT:
+                print(f"Compiling: {java_files}")
+            fingerprints = {module: get_source_fingerprint(module_to_path[module]) for module in java_group}
+
+            # Batches compile concurrently, so each one gets its own staging dir
+            javac_output_dir = os.path.join(get_staging_dir(state_dir), str(batch_index)) if class_manifest is not None else output_dir
+            if class_manifest is not None:
+                shutil.rmtree(javac_output_dir, ignore_errors=True)
+            javac_start = time.perf_counter()
+            trimmed = batch_classpath != classpath
+            batch_log_path = f"{javac_log_path}.{batch_index}"  # A retry replaces it
+            result = await run_javac(get_javac_command(javac_output_dir, output_dir, batch_classpath, javac_flags, java_files, JAVAC_MAX_ERRORS), batch_log_path)
+
+            retried = trimmed and result.returncode != 0 and is_missing_class_error(result.stderr + result.stdout)
+            if retried:
+                if class_manifest is not None:
+                    shutil.rmtree(javac_output_dir, ignore_errors=True)
+                result = await run_javac(get_javac_command(javac_output_dir, output_dir, classpath, javac_flags, java_files, JAVAC_MAX_ERRORS), batch_log_path)
+                if result.returncode == 0:
+                    full_classpath_modules.update(java_group)
+            replay_log(batch_log_path, javac_log_path, echo=False)  # On the event loop, so one batch at a time
+            javac_seconds = time.perf_counter() - javac_start
+
+        if explanation is not None:
+            explanation.add_time("javac", javac_seconds)  # Summed over the batches compiling in parallel
+            explanation.record_compiled(java_group, reason, javac_seconds, failed=result.returncode != 0, full_classpath_retry=retried)
+
+        if result.returncode != 0 and keep_going:
+            if class_manifest is not None:
+                shutil.rmtree(javac_output_dir, ignore_errors=True)
+            failed_batches.append((java_group, result.stderr))
+            blocked_modules.update({module: module for module in java_group})
+            return False
+
+        if result.returncode != 0:
+            failed = True
+            if class_manifest is not None:
+                shutil.rmtree(javac_output_dir, ignore_errors=True)
+            if failure is not None and not failure:
+                failure.update(batch=java_group, errors=result.stderr)
+            if PRINT_OUTPUT:
+                print(result.stderr)
+                print(f"❌ Compilation failed! (javac output in {javac_log_path})")
+            return False
+
+        if class_manifest is not None:
+            install_batch_classes(javac_output_dir, output_dir, class_manifest, java_group)
+        recompiled_modules.update(java_group)
+        done_modules.update(java_group)
+        if build_state is not None:
+            record_compiled_batch(build_state, java_group, module_to_path, fingerprints, git_changes)
+        return True
+
+    scc_iterator = iter_sccs(roots, get_dependencies)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as parser:
+            while not failed:
+                java_group = await loop.run_in_executor(parser, next, scc_iterator, None)
+                if java_group is None:
+                    break
+
+                batch_classpath = classpath
+                if classpath_index is not None:
+                    module_jars = {module: classpath_index.get_jars(external_imports.get(module, [])) for module in java_group}
+                    batch_jars = get_batch_jars(java_group, dependency_tree, module_jars, closure_jars)
+                    if full_classpath_modules.isdisjoint(java_group):
+                        batch_classpath = trim_classpath(classpath, batch_jars)
+
+                dep_tasks = {tasks[dep] for module in java_group for dep in dependency_tree[module] if dep not in java_group}
+                task = asyncio.create_task(compile_scc(len(compilation_order), java_group, dep_tasks, batch_classpath))
+                compilation_order.append(java_group)
+                for module in java_group:
+                    tasks[module] = task
+    except BaseException:
+        failed = True  # Batches that haven't started won't
+        await asyncio.gather(*set(tasks.values()), return_exceptions=True)
+        raise
+
+    results = await asyncio.gather(*set(tasks.values()))
+    compiled = not failed and all(results)
+
+    if build_state is not None:
+        if not compiled:  # Everything not compiled (or checked) during this build is retried next time
+            forget_batches(build_state, [[module for module in dependency_tree if module not in done_modules]])
+        if trim_jars:
+            build_state["full_classpath_modules"] = sorted(full_classpath_modules)
+        if class_manifest is not None and BYTECODE_DEPENDENCIES:
+            record_class_dependencies(build_state, output_dir, recompiled_modules, class_manifest)
+        save_build_state(state_dir, build_state)
+    if class_manifest is not None:
+        shutil.rmtree(get_staging_dir(state_dir), ignore_errors=True)
+        save_class_manifest(state_dir, class_manifest)
+
+    if failed_batches:
+        if failure is not None:
+            failure.update(batch=failed_batches[0][0], errors="\n".join(errors for _, errors in failed_batches))
+        print_keep_going_report(failed_batches, skipped_batches, javac_log_path)
+    if compiled and PRINT_OUTPUT:
+        print("✅ Compilation successful!")
+
+    analysis = {
+        "compilation_order": compilation_order,
+        "dependency_tree": dependency_tree,
+        "module_to_path": module_to_path,
+        "path_to_module": path_to_module,
+        "source_dirs": source_dirs,
+        "external_imports": external_imports,
+        "sources_fingerprint": get_sources_fingerprint(source_fingerprints, source_fingerprints),
+    }
+    return compiled, analysis
@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import time
+import shutil
+import subprocess
+from collections import Counter
+
+from config import PROFILE_TOP
+
+# Events summarized after a run (ObjectAllocationInNewTLAB is for JDKs older than 16)
+EXECUTION_EVENTS = ("jdk.ExecutionSample",)
+ALLOCATION_EVENTS = ("jdk.ObjectAllocationSample", "jdk.ObjectAllocationInNewTLAB")
+GC_EVENTS = ("jdk.GarbageCollection",)
+
+ISO_DURATION = re.compile(r"^PT(?:(\d+)H)?(?:(\d+)M)?(?:([\d.]+)S)?$")
+
+
+def get_recording_path(output_dir: str, main_class: str) -> str:
+    """Returns where the recording of a run goes: next to the flavor output dir (e.g. bin/profiles)."""
+    profiles_dir = os.path.join(os.path.dirname(output_dir), "profiles")
+    os.makedirs(profiles_dir, exist_ok=True)
+    return os.path.join(profiles_dir, f"{main_class}-{time.strftime('%Y%m%d-%H%M%S')}.jfr")
+
+
+def get_jfr_option(recording_path: str, settings: str = "profile", duration: str | None = None) -> str:
+    """
+    Returns the JVM option starting a Flight Recorder recording for the whole run.
+
+    Args:
+        recording_path (str): Where the .jfr is written (when the program exits).
+        settings (str): JFR settings, "default" (low overhead) or "profile" (more samples), or a .jfc path.
+        duration (str, optional): Stop recording after that long, e.g. "30s" or "2m".
+    """
+    option = f"-XX:StartFlightRecording=filename={recording_path},settings={settings},dumponexit=true"
+    if duration:
+        option += f",duration={duration}"
+    return option
+
+
+def parse_jfr_duration(value) -> float:
+    """Converts a duration of `jfr print --json` (ISO 8601 like "PT0.0012S", or nanoseconds) to milliseconds."""
+    if isinstance(value, (int, float)):
+        return value / 1e6
+    match = ISO_DURATION.match(str(value))
+    if not match:
+        return 0.0
+    hours, minutes, seconds = match.groups()
+    return (int(hours or 0) * 3600 + int(minutes or 0) * 60 + float(seconds or 0)) * 1000
+
+
+def get_frame_name(frame: dict) -> str:
+    method = frame.get("method") or {}
+    class_name = ((method.get("type") or {}).get("name") or "?").replace("/", ".")
+    return f"{class_name}.{method.get('name', '?')}"
+
+
+def get_top_frame(event_values: dict) -> str | None:
+    frames = (event_values.get("stackTrace") or {}).get("frames") or []
+    return get_frame_name(frames[0]) if frames else None
+
+
+def read_recording(recording_path: str) -> list[dict] | None:
+    """Reads the events we summarize from a recording with the JDK's `jfr` tool, None if it isn't available."""
+    jfr = shutil.which("jfr")
+    if jfr is None and shutil.which("java"):
+        candidate = os.path.join(os.path.dirname(os.path.realpath(shutil.which("java"))), "jfr")
+        jfr = candidate if os.path.exists(candidate) else None
+    if jfr is None:
+        return None
+
+    events = ",".join(EXECUTION_EVENTS + ALLOCATION_EVENTS + GC_EVENTS)
+    result = subprocess.run([jfr, "print", "--json", "--events", events, recording_path], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    try:
+        return json.loads(result.stdout)["recording"]["events"]
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+
+def summarize_recording(events: list[dict], top: int = PROFILE_TOP) -> dict:
+    """
+    Summarizes JFR events.
+
+    Returns:
+        dict: {"samples", "hot_methods": [(method, samples)], "allocations": [(site, bytes)],
+        "allocated_classes": [(class, bytes)], "gc": {"count", "total_ms", "max_ms", "longest": [...]}}
+    """
+    hot_methods = Counter()
+    allocation_sites = Counter()
+    allocated_classes = Counter()
+    gc_pauses = []
+    samples = 0
+
+    for event in events:
+        event_type = event.get("type")
+        values = event.get("values") or {}
+        if event_type in EXECUTION_EVENTS:
+            samples += 1
+            frame = get_top_frame(values)
+            if frame:
+                hot_methods[frame] += 1
+        elif event_type in ALLOCATION_EVENTS:
+            weight = values.get("weight", values.get("tlabSize", 0)) or 0
+            frame = get_top_frame(values)
+            if frame:
+                allocation_sites[frame] += weight
+            object_class = ((values.get("objectClass") or {}).get("name") or "?").replace("/", ".")
+            allocated_classes[object_class] += weight
+        elif event_type in GC_EVENTS:
+            gc_pauses.append(
+                {
+                    "name": values.get("name", "?"),
+                    "cause": values.get("cause", "?"),
+                    "pause_ms": parse_jfr_duration(values.get("sumOfPauses", 0)),
+                    "longest_ms": parse_jfr_duration(values.get("longestPause", 0)),
+                }
+            )
+
+    return {
+        "samples": samples,
+        "hot_methods": hot_methods.most_common(top),
+        "allocations": allocation_sites.most_common(top),
+        "allocated_classes": allocated_classes.most_common(top),
+        "gc": {
+            "count": len(gc_pauses),
+            "total_ms": sum(pause["pause_ms"] for pause in gc_pauses),
+            "max_ms": max((pause["longest_ms"] for pause in gc_pauses), default=0.0),
+            "longest": sorted(gc_pauses, key=lambda pause: pause["pause_ms"], reverse=True)[:3],
+        },
+    }
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def print_profile_summary(recording_path: str, top: int = PROFILE_TOP) -> None:
+    """Prints the hot methods, allocation hot spots and GC pauses of a recording."""
+    if not os.path.exists(recording_path):
+        print(f"⚠️ No recording was written ({recording_path})")
+        return
+    events = read_recording(recording_path)
+    if events is None:
+        print(f"⚠️ Couldn't read the recording with `jfr` (needs JDK 14+): {recording_path}")
+        return
+
+    summary = summarize_recording(events, top=top)
+    print("\n------------------------ Profile ------------------------------")
+    print(f"📼 Recording: {recording_path}")
+
+    print(f"\n🔥 Hot methods ({summary['samples']} samples):")
+    if not summary["hot_methods"]:
+        print("   (no samples, the program was probably too short)")
+    for method, count in summary["hot_methods"]:
+        print(f"   {100 * count / summary['samples']:5.1f}%  {method}")
+
+    total_allocated = sum(size for _, size in summary["allocated_classes"])
+    print("\n📦 Allocation hot spots:")
+    if not summary["allocations"]:
+        print("   (no allocation samples)")
+    for site, size in summary["allocations"]:
+        print(f"   {format_bytes(size):>10}  {site}")
+    if summary["allocated_classes"]:
+        print("   Most allocated types: " + ", ".join(f"{name} ({format_bytes(size)})" for name, size in summary["allocated_classes"][:5]))
+        if total_allocated:
+            print(f"   (sampled total: {format_bytes(total_allocated)})")
+
+    gc = summary["gc"]
+    print(f"\n🗑️ GC: {gc['count']} collections, {gc['total_ms']:.1f} ms paused, longest pause {gc['max_ms']:.1f} ms")
+    for pause in gc["longest"]:
+        print(f"   {pause['pause_ms']:7.1f} ms  {pause['name']} ({pause['cause']})")
@@ -0,0 +1,172 @@
+import os
+import sys
+import shutil
+import hashlib
+import argparse
+import subprocess
+
+from config import DEBUG_, RAM_OUTPUT_ROOT, load_json_file, save_json_file
+from build_flavor import get_state_root
+from build_lock import BuildLock, BUILD_LOCK_FILE
+from incremental import BUILD_STATE_FILE
+
+SYNC_TMP_SUFFIX = ".automake-sync.tmp"
+
+
+def get_ram_output_dir(output_dir: str) -> str | None:
+    """Returns the RAM copy of an output dir (<RAM_OUTPUT_ROOT>/automake/<name>-<hash of its path>), None without a tmpfs."""
+    if not os.path.isdir(RAM_OUTPUT_ROOT):
+        return None
+    key = hashlib.sha1(os.path.realpath(output_dir).encode()).hexdigest()[:12]
+    return os.path.join(RAM_OUTPUT_ROOT, "automake", f"{os.path.basename(output_dir)}-{key}")
+
+
+def get_sync_manifest_path(ram_output_dir: str) -> str:
+    """What the on-disk output dir last got from the RAM one, {relative path: [mtime_ns, size]}. Outside the tree, so it isn't synced itself."""
+    return f"{ram_output_dir}.synced.json"
+
+
+def list_files(root_path: str) -> dict[str, list[int]]:
+    files = {}
+    for root, _, file_names in os.walk(root_path):
+        for file_name in file_names:
+            if file_name.endswith(SYNC_TMP_SUFFIX) or file_name == BUILD_LOCK_FILE:
+                continue  # The lock is the disk's own, replacing it would unlock it
+            file_path = os.path.join(root, file_name)
+            try:
+                stat = os.stat(file_path)
+            except FileNotFoundError:
+                continue  # Removed by a build meanwhile
+            files[os.path.relpath(file_path, root_path)] = [stat.st_mtime_ns, stat.st_size]
+    return files
+
+
+def get_build_states(output_dir: str) -> dict[str, list[int]]:
+    """Returns the [mtime_ns, size] of the build state of every flavor of an output dir, by path relative to it."""
+    build_states = {}
+    for root, _, file_names in os.walk(get_state_root(output_dir)):
+        if BUILD_STATE_FILE in file_names:
+            stat = os.stat(os.path.join(root, BUILD_STATE_FILE))
+            build_states[os.path.relpath(os.path.join(root, BUILD_STATE_FILE), output_dir)] = [stat.st_mtime_ns, stat.st_size]
+    return build_states
+
+
+def is_ram_copy_current(ram_output_dir: str, output_dir: str) -> bool:
+    """
+    Tells if the RAM copy still holds everything the disk has: the build states on disk are the
+    ones the last sync (or the copy) left, no build ran on the disk since.
+    """
+    if not os.path.isdir(ram_output_dir):
+        return False
+    synced = load_json_file(get_sync_manifest_path(ram_output_dir), {})
+    synced_build_states = {path: fingerprint for path, fingerprint in synced.items() if os.path.basename(path) == BUILD_STATE_FILE}
+    return get_build_states(output_dir) == synced_build_states
+
+
+def use_ram_output_dir(output_dir: str) -> str:
+    """
+    Returns the output dir a build should use: the RAM copy of `output_dir`, created from it the
+    first time (and after a reboot emptied the tmpfs), or `output_dir` itself without a tmpfs.
+
+    The copy has the classes and the incremental state, so the first build in RAM is as incremental
+    as the last one on disk. While it's current it's the reference: sync_back mirrors it to the
+    disk. A build without --ram in between makes it stale (is_ram_copy_current), it's copied from
+    the disk again, else the next sync would overwrite that build's state with one that never
+    knew its classes. It's made under the build lock of `output_dir`, so it doesn't copy a build half done.
+    """
+    ram_output_dir = get_ram_output_dir(output_dir)
+    if ram_output_dir is None:
+        print(f"⚠️ No RAM directory ({RAM_OUTPUT_ROOT}), building in {output_dir}")
+        return output_dir
+    if is_ram_copy_current(ram_output_dir, output_dir):
+        return ram_output_dir
+
+    with BuildLock(get_state_root(output_dir), f"{os.path.basename(output_dir)} (copy to RAM)"):
+        if is_ram_copy_current(ram_output_dir, output_dir):
+            return ram_output_dir  # Copied by another build meanwhile
+        stale = os.path.isdir(ram_output_dir)
+        tmp_dir = f"{ram_output_dir}.{os.getpid()}.tmp"
+        if os.path.isdir(output_dir):
+            # copy2 keeps the mtimes the incremental state compares
+            shutil.copytree(output_dir, tmp_dir, symlinks=True, ignore=shutil.ignore_patterns(BUILD_LOCK_FILE))
+        else:
+            os.makedirs(tmp_dir)
+        if stale:
+            old_dir = f"{ram_output_dir}.{os.getpid()}.old"
+            os.rename(ram_output_dir, old_dir)
+            os.rename(tmp_dir, ram_output_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        else:
+            os.rename(tmp_dir, ram_output_dir)
+        save_json_file(get_sync_manifest_path(ram_output_dir), list_files(ram_output_dir))  # The disk has all of it
+    if stale:
+        print(f"🧠 Output in RAM copied again: {output_dir} was built without --ram since the last sync")
+    else:
+        print(f"🧠 Output in RAM: {ram_output_dir} (synced back to {output_dir})")
+    return ram_output_dir
+
+
+def sync_back(ram_output_dir: str, output_dir: str) -> tuple[int, int]:
+    """
+    Mirrors the RAM output dir to the on-disk one: copies what changed since the last sync and
+    deletes what was deleted in RAM (e.g. classes of a removed source). Files on disk that never
+    came from the RAM copy are left alone. It holds the build lock of `output_dir`, the one builds
+    take (with --ram too), so it never copies a build half done nor writes while a build reads.
+
+    Each file is written next to its destination then renamed over it, so the disk never has a
+    half written class file.
+
+    Returns:
+        tuple[int, int]: Number of files copied and deleted.
+    """
+    with BuildLock(get_state_root(output_dir), f"{os.path.basename(output_dir)} (sync from RAM)"):
+        manifest_path = get_sync_manifest_path(ram_output_dir)
+        synced = load_json_file(manifest_path, {})
+        ram_files = list_files(ram_output_dir)
+        copied = deleted = 0
+        for relative_path, fingerprint in ram_files.items():
+            disk_path = os.path.join(output_dir, relative_path)
+            if synced.get(relative_path) == fingerprint and os.path.exists(disk_path):
+                continue
+            try:
+                os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+                shutil.copy2(os.path.join(ram_output_dir, relative_path), disk_path + SYNC_TMP_SUFFIX)
+                os.replace(disk_path + SYNC_TMP_SUFFIX, disk_path)
+            except FileNotFoundError:
+                ram_files.pop(relative_path, None)  # Removed from RAM meanwhile, the next sync deletes it
+                continue
+            copied += 1
+        for relative_path in synced.keys() - ram_files.keys():
+            if os.path.basename(relative_path) == BUILD_LOCK_FILE:
+                continue  # Synced by an older version
+            try:
+                os.remove(os.path.join(output_dir, relative_path))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        save_json_file(manifest_path, ram_files)
+    if DEBUG_:
+        print(f"Synced {ram_output_dir} to {output_dir}: {copied} copied, {deleted} deleted")
+    return copied, deleted
+
+
+def start_sync_back(ram_output_dir: str, output_dir: str) -> None:
+    """Starts sync_back in its own process, which goes on after automake exits."""
+    if ram_output_dir == output_dir:
+        return  # No tmpfs, already on disk
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), ram_output_dir, output_dir],
+        stdin=subprocess.DEVNULL,
+        stdout=None if DEBUG_ else subprocess.DEVNULL,
+        stderr=None if DEBUG_ else subprocess.DEVNULL,
+        start_new_session=True,  # Not killed with automake (e.g. Ctrl+C in the program)
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync a RAM output dir back to the disk (automake --ram does it in the background).")
+    parser.add_argument("ram_output_dir")
+    parser.add_argument("output_dir")
+    args = parser.parse_args()
+    copied, deleted = sync_back(args.ram_output_dir, args.output_dir)
+    print(f"✅ {copied} files copied, {deleted} deleted")
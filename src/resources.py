@@ -0,0 +1,146 @@
+import os
+import shutil
+from fnmatch import fnmatch
+
+from class_manifest import remove_class_files, load_class_manifest
+from incremental import get_source_fingerprint
+from config import DEBUG_, PRINT_OUTPUT, RESOURCE_LINK, RESOURCE_EXCLUDE, load_json_file, save_json_file
+
+RESOURCE_MANIFEST_FILE = "resource_manifest.json"
+FICLONE = 0x40049409  # ioctl cloning a file (reflink) on btrfs, XFS, bcachefs...
+
+
+def list_resources(source_paths: list[str], excluded_dirs: list[str]) -> dict[str, str]:
+    """
+    Lists the resources of the source directories: every file but hidden files and the ones
+    matching RESOURCE_EXCLUDE (sources, class files, scripts).
+
+    Args:
+        source_paths (list[str]): Real paths of the source directories.
+        excluded_dirs (list[str]): Directories never searched (the output dir, if it's inside a source dir).
+
+    Returns:
+        dict[str, str]: Path relative to the output dir -> source file. When two source
+        directories have the same resource, the first one wins (like the classpath order).
+    """
+    resources = {}
+    for src_path in source_paths:
+        for root, dirs, files in os.walk(src_path):
+            dirs[:] = [d for d in dirs if not d.startswith(".") and os.path.join(root, d) not in excluded_dirs]
+            for file in files:
+                if file.startswith(".") or any(fnmatch(file, pattern) for pattern in RESOURCE_EXCLUDE):
+                    continue
+                source_file = os.path.join(root, file)
+                relative_path = os.path.relpath(source_file, src_path)
+                if relative_path in resources:
+                    if DEBUG_:
+                        print(f"Resource {relative_path} is in several source dirs, using {resources[relative_path]}")
+                    continue
+                resources[relative_path] = source_file
+    return resources
+
+
+def clone_file(source_file: str, destination: str) -> bool:
+    """Makes `destination` a copy-on-write clone of `source_file` (no data copied). False if the filesystem can't."""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source_file, "rb") as source, open(destination, "wb") as clone:
+            fcntl.ioctl(clone.fileno(), FICLONE, source.fileno())
+    except OSError:
+        if os.path.exists(destination):
+            os.remove(destination)
+        return False
+    shutil.copystat(source_file, destination)
+    return True
+
+
+def install_resource(source_file: str, destination: str, link: str = RESOURCE_LINK) -> str:
+    """
+    Puts a resource in the output dir, without copying its data when possible.
+
+    Args:
+        link (str): "auto" (reflink, else hardlink, else copy), "reflink", "hardlink" or "copy".
+            A hardlink shares the file with the source dir: writing to the copy in the output
+            dir changes the source too.
+
+    Returns:
+        str: How it was installed: "reflink", "hardlink" or "copy".
+    """
+    if os.path.lexists(destination) and os.path.samestat(os.stat(source_file), os.lstat(destination)):
+        return "hardlink"  # Already linked, edited in place (renaming a link over itself would do nothing)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    tmp_path = f"{destination}.{os.getpid()}.tmp"
+    method = "copy"
+    if link in ("auto", "reflink") and clone_file(source_file, tmp_path):
+        method = "reflink"
+    elif link in ("auto", "hardlink"):
+        try:
+            os.link(source_file, tmp_path)
+            method = "hardlink"
+        except OSError:  # Another filesystem, or links not supported
+            pass
+    if method == "copy":
+        shutil.copy2(source_file, tmp_path)
+    os.replace(tmp_path, destination)
+    return method
+
+
+def sync_resources(source_paths: list[str], output_dir: str, state_dir: str, link: str = RESOURCE_LINK) -> dict[str, int]:
+    """
+    Mirrors the resources of the source directories (images, stylesheets, .fxml, .properties...)
+    into the output dir, so `getResource` finds them next to the classes.
+
+    Only resources that changed since the last sync (by [mtime, size]) or are missing from the
+    output dir are installed, and the ones deleted from the source dirs are removed. The synced
+    resources are recorded in <state_dir>/resource_manifest.json.
+
+    Args:
+        source_paths (list[str]): Real paths of the source directories.
+        output_dir (str): Flavor output directory.
+        state_dir (str): State directory of the flavor.
+        link (str): See install_resource.
+
+    Returns:
+        dict[str, int]: Counts of "reflink", "hardlink", "copy", "unchanged" and "removed" resources.
+    """
+    manifest_path = os.path.join(state_dir, RESOURCE_MANIFEST_FILE)
+    manifest = load_json_file(manifest_path, {})  # relative path -> {"source": path, "fingerprint": [mtime_ns, size]}
+    if not isinstance(manifest, dict):
+        manifest = {}
+    resources = list_resources(source_paths, [os.path.dirname(output_dir)])  # Every flavor, if bin/ is in a source dir
+    class_files = {class_file for class_files in load_class_manifest(state_dir).values() for class_file in class_files}
+    for relative_path in class_files & resources.keys():
+        print(f"⚠️ Not copying {resources.pop(relative_path)} to the output dir: javac compiles {relative_path}")
+
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0, "unchanged": 0, "removed": 0}
+    for relative_path, source_file in resources.items():
+        fingerprint = get_source_fingerprint(source_file)
+        destination = os.path.join(output_dir, relative_path)
+        recorded = manifest.get(relative_path)
+        if recorded == {"source": source_file, "fingerprint": fingerprint} and os.path.lexists(destination):
+            counts["unchanged"] += 1
+            continue
+        method = install_resource(source_file, destination, link)
+        counts[method] += 1
+        manifest[relative_path] = {"source": source_file, "fingerprint": fingerprint}
+        if DEBUG_:
+            print(f"Resource {relative_path}: {method}")
+
+    removed = [relative_path for relative_path in manifest if relative_path not in resources]
+    for relative_path in class_files.intersection(removed):
+        # Put there over the compiled class by an older sync: removed, so its module is recompiled (class missing)
+        print(f"⚠️ {relative_path} in the output dir was a copy of {manifest[relative_path]['source']}, it's recompiled on the next build")
+    remove_class_files(output_dir, removed)  # Also removes the directories left empty
+    for relative_path in removed:
+        del manifest[relative_path]
+    counts["removed"] = len(removed)
+
+    if removed or counts["reflink"] or counts["hardlink"] or counts["copy"]:
+        save_json_file(manifest_path, manifest)
+        if PRINT_OUTPUT:
+            installed = counts["reflink"] + counts["hardlink"] + counts["copy"]
+            print(f"📁 Resources: {installed} updated, {counts['removed']} removed")
+    return counts
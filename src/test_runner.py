@@ -0,0 +1,300 @@
+import os
+import re
+import sys
+import time
+import heapq
+import argparse
+import statistics
+import subprocess
+
+from find_dependency_tree_helper import find_base_directory, get_source_dirs_from_classpath
+from find_dependency_tree import analyse_project
+from module_registry import build_module_registry
+from java_file_analyser import parse_java_file, declares_tests, declares_jupiter_tests
+from compiler import compile_project, extract_classpath_from_xml
+from build_flavor import get_build_flavor, get_flavor_output_dir, get_flavor_state_dir, get_state_root
+from warm_jvm import compile_helper, WarmRunnerUnavailable
+from resources import sync_resources
+from build_lock import BuildLock
+from parse_cache import ParseCache
+from config import PRINT_OUTPUT, DEBUG_, TEST_SHARDS, SYNC_RESOURCES, PARSE_CACHE, load_json_file, save_json_file
+
+TEST_DURATIONS_FILE = "test_durations.json"
+TEST_REPORT_FILE = "test_report.json"
+DEFAULT_TEST_DURATION = 1.0  # Seconds assumed for a test class that never ran
+
+
+def discover_test_classes(module_to_path, path_filters: list[str] | None = None, parse_cache=None) -> list[str]:
+    """
+    Finds the JUnit 4 test classes of a project: Java files with `@org.junit.Test` methods.
+
+    JUnit 5 classes (`@org.junit.jupiter.api.Test`) are skipped with a warning: ShardRunner runs
+    classes through JUnit 4's JUnitCore, which finds no runnable method in them.
+
+    Args:
+        module_to_path (Mapping): Module maps of the project.
+        path_filters (list[str], optional): Only keep files under these paths (files or directories).
+        parse_cache (ParseCache, optional): Only parse the files that changed since they were last read.
+
+    Returns:
+        list[str]: Module names of the test classes, sorted.
+    """
+    test_classes, jupiter_classes = [], []
+    for module, path in module_to_path.items():
+        if not path.endswith(".java"):
+            continue
+        if path_filters and not any(path == prefix or path.startswith(prefix.rstrip(os.sep) + os.sep) for prefix in path_filters):
+            continue
+        if parse_cache is not None:
+            try:
+                entry = parse_cache.get_entry(path)
+            except Exception:
+                continue  # Not parsable, javac will tell
+            is_test, is_jupiter = entry["tests"], entry["jupiter_tests"]
+        else:
+            with open(path, "r") as file:
+                if "@Test" not in file.read():  # Cheap check before parsing
+                    continue
+            try:
+                tree, _ = parse_java_file(path)
+            except Exception:
+                continue  # Not parsable, javac will tell
+            is_test, is_jupiter = declares_tests(tree), declares_jupiter_tests(tree)
+        if is_test:
+            test_classes.append(module)
+        elif is_jupiter:
+            jupiter_classes.append(module)
+
+    if jupiter_classes:
+        print(f"⚠️ Skipped {len(jupiter_classes)} JUnit 5 test classes, only JUnit 4 ones are run")
+        if DEBUG_:
+            print(f"jupiter_classes = {sorted(jupiter_classes)}")
+    return sorted(test_classes)
+
+
+def split_into_shards(test_classes: list[str], durations: dict[str, float], shard_count: int) -> list[list[str]]:
+    """
+    Splits test classes into shards of about the same total duration (longest processing time first).
+
+    Classes that never ran are assumed to take the median recorded duration.
+    """
+    default_duration = statistics.median(durations.values()) if durations else DEFAULT_TEST_DURATION
+    shards = [[] for _ in range(max(1, min(shard_count, len(test_classes))))]
+    heap = [(0.0, i) for i in range(len(shards))]  # (total duration, shard index)
+    for test_class in sorted(test_classes, key=lambda name: (-durations.get(name, default_duration), name)):
+        total, i = heapq.heappop(heap)
+        shards[i].append(test_class)
+        heapq.heappush(heap, (total + durations.get(test_class, default_duration), i))
+    return [shard for shard in shards if shard]
+
+
+def unescape(value: str) -> str:
+    """Undoes ShardRunner's escape in one pass, so `\\\\n` (an escaped backslash before an n) stays `\\n`."""
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m[1], m[1]), value)
+
+
+def read_shard_report(report_path: str) -> tuple[dict, list[dict]]:
+    """Reads a ShardRunner report. Returns ({class: result}, [failure])."""
+    classes, failures = {}, []
+    try:
+        with open(report_path, "r", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return classes, failures
+
+    for line in lines:
+        fields = line.split("\t")
+        if fields[0] == "CLASS" and len(fields) == 6:
+            classes[fields[1]] = {"run": int(fields[2]), "failed": int(fields[3]), "ignored": int(fields[4]), "seconds": int(fields[5]) / 1000}
+        elif fields[0] == "FAIL" and len(fields) == 5:
+            failures.append({"class": fields[1], "test": unescape(fields[2]), "message": unescape(fields[3]), "trace": unescape(fields[4])})
+        elif fields[0] == "ERROR" and len(fields) == 3:
+            classes[fields[1]] = {"run": 0, "failed": 1, "ignored": 0, "seconds": 0.0}
+            failures.append({"class": fields[1], "test": fields[1], "message": unescape(fields[2]), "trace": ""})
+    return classes, failures
+
+
+def run_shards(shards: list[list[str]], class_path: str, reports_dir: str) -> list[dict]:
+    """
+    Runs every shard in its own JVM, all at the same time.
+
+    Returns:
+        list[dict]: Per shard: {"classes", "results", "failures", "returncode", "seconds", "log"}.
+    """
+    os.makedirs(reports_dir, exist_ok=True)
+    processes = []
+    for i, shard in enumerate(shards):
+        report_path = os.path.join(reports_dir, f"shard-{i}.tsv")
+        log_path = os.path.join(reports_dir, f"shard-{i}.log")
+        if os.path.exists(report_path):
+            os.remove(report_path)
+        with open(log_path, "wb") as log:
+            process = subprocess.Popen(
+                ["java", "-cp", class_path, "ShardRunner", report_path] + shard, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT
+            )
+        processes.append((process, report_path, log_path, time.perf_counter()))
+
+    shard_results = []
+    for shard, (process, report_path, log_path, start) in zip(shards, processes):
+        returncode = process.wait()
+        results, failures = read_shard_report(report_path)
+        shard_results.append(
+            {
+                "classes": shard,
+                "results": results,
+                "failures": failures,
+                "returncode": returncode,
+                "seconds": time.perf_counter() - start,
+                "log": log_path,
+            }
+        )
+    return shard_results
+
+
+def merge_shard_results(shard_results: list[dict]) -> dict:
+    """Merges the shard results into one report. Classes a crashed shard never finished count as failed."""
+    report = {"tests": 0, "failed": 0, "ignored": 0, "classes": {}, "failures": [], "shards": []}
+    for i, shard in enumerate(shard_results):
+        for test_class in shard["classes"]:
+            result = shard["results"].get(test_class)
+            if result is None:
+                result = {"run": 0, "failed": 1, "ignored": 0, "seconds": 0.0}
+                report["failures"].append(
+                    {"class": test_class, "test": test_class, "message": f"Not run: shard {i} crashed (exit {shard['returncode']}), see {shard['log']}", "trace": ""}
+                )
+            report["classes"][test_class] = result
+            report["tests"] += result["run"]
+            report["failed"] += result["failed"]
+            report["ignored"] += result["ignored"]
+        report["failures"].extend(shard["failures"])
+        report["shards"].append({"classes": shard["classes"], "seconds": round(shard["seconds"], 3), "returncode": shard["returncode"]})
+    return report
+
+
+def print_test_report(report: dict, wall_seconds: float) -> None:
+    for failure in report["failures"]:
+        print(f"\n❌ {failure['test']}")
+        if failure["message"] and failure["message"] != "None":
+            print(f"   {failure['message']}")
+        if failure["trace"] and (PRINT_OUTPUT or DEBUG_):
+            print(failure["trace"])
+
+    serial_seconds = sum(result["seconds"] for result in report["classes"].values())
+    print(f"\n🧪 {report['tests']} tests in {len(report['classes'])} classes, {len(report['shards'])} shards")
+    for i, shard in enumerate(report["shards"]):
+        print(f"   shard {i}: {len(shard['classes'])} classes, {shard['seconds']:.2f}s")
+    print(f"⏱️ {wall_seconds:.2f}s wall time ({serial_seconds:.2f}s of tests)")
+    if report["failed"]:
+        print(f"❌ {report['failed']} failed, {report['ignored']} ignored")
+    else:
+        print(f"✅ All passed ({report['ignored']} ignored)")
+
+
+def run_tests(
+    project_root_path: str,
+    path_filters: list[str] | None = None,
+    shard_count: int = TEST_SHARDS,
+    debug: bool = False,
+    release: int | None = None,
+) -> bool:
+    """
+    Compiles the test classes of a project and runs them in parallel shards.
+
+    JUnit 4 test classes are found from the module maps, split into `shard_count` shards balanced by
+    the durations recorded on previous runs, and each shard runs in its own JVM (JUnit 4's
+    JUnitCore, through java_helpers/ShardRunner.java). The merged report is printed and written
+    to <output_dir>/.automake/test_report.json.
+
+    Returns:
+        bool: True if every test passed.
+    """
+    classpath_file = f"{project_root_path}/.classpath"
+    source_dirs = get_source_dirs_from_classpath(classpath_file)
+    registry = build_module_registry(project_root_path, source_dirs)
+    output_dir, classpath = extract_classpath_from_xml(classpath_file, project_root_path)
+    output_dir = os.path.realpath(output_dir)
+    state_root = get_state_root(output_dir)
+
+    # The parse cache knows which files have tests, only the changed ones are parsed
+    parse_cache = ParseCache(state_root) if PARSE_CACHE else None
+    test_classes = discover_test_classes(registry.module_to_path, [os.path.realpath(path) for path in path_filters or []], parse_cache)
+    if not test_classes:
+        if parse_cache is not None:
+            parse_cache.save(registry.path_to_module)
+        print("⚠️ No test class found")
+        return True
+
+    flavor = get_build_flavor(debug=debug, release=release)
+    flavor_output_dir = get_flavor_output_dir(output_dir, flavor)
+    state_dir = get_flavor_state_dir(output_dir, flavor)
+
+    with BuildLock(state_root, f"tests ({flavor})"):
+        analysis = analyse_project([registry.module_to_path[test_class] for test_class in test_classes], project_root_path, parse_cache=parse_cache, registry=registry)
+        if parse_cache is not None:
+            parse_cache.save(registry.path_to_module)
+        compiled = compile_project(
+            project_root_path,
+            analysis["compilation_order"],
+            flavor_output_dir,
+            classpath,
+            analysis["module_to_path"],
+            debug=debug,
+            release=release,
+            state_dir=state_dir,
+            dependency_tree=analysis["dependency_tree"],
+        )
+        if not compiled:
+            print("❌ Compilation failed!")
+            return False
+        if SYNC_RESOURCES:
+            sync_resources([os.path.realpath(os.path.join(project_root_path, src_dir)) for src_dir in source_dirs], flavor_output_dir, state_dir)
+
+    try:
+        helper_dir = compile_helper("ShardRunner")
+    except WarmRunnerUnavailable as e:
+        print(f"❌ {e}")
+        return False
+
+    durations_path = os.path.join(state_root, TEST_DURATIONS_FILE)
+    durations = load_json_file(durations_path, {})
+    shards = split_into_shards(test_classes, durations, shard_count)
+    if DEBUG_:
+        print(f"shards = {shards}")
+
+    start = time.perf_counter()
+    shard_results = run_shards(shards, f"{helper_dir}:{flavor_output_dir}:{classpath}", os.path.join(state_root, "test_shards"))
+    wall_seconds = time.perf_counter() - start
+
+    report = merge_shard_results(shard_results)
+    report["wall_seconds"] = round(wall_seconds, 3)
+    save_json_file(os.path.join(state_root, TEST_REPORT_FILE), report)
+
+    # Only classes that really ran update the durations the next split is balanced with
+    for test_class, result in report["classes"].items():
+        if result["run"] or test_class not in durations:
+            durations[test_class] = result["seconds"]
+    save_json_file(durations_path, durations)
+
+    print_test_report(report, wall_seconds)
+    return report["failed"] == 0
+
+
+def run_tests_main(argv: list[str]) -> int:
+    """Entry point of `automake.py test ...`."""
+    parser = argparse.ArgumentParser(prog="automake.py test", description="Run the JUnit tests of a project in parallel shards.")
+    parser.add_argument("paths", nargs="*", help="Only run the test classes under these files or directories (default: all)")
+    parser.add_argument("--shards", "-j", type=int, default=TEST_SHARDS, help="Number of JVMs running tests at the same time")
+    parser.add_argument("--debug", action="store_true", help="Use the debug flavor (-g)")
+    parser.add_argument("--release", type=int, default=None, help="Target Java release (javac --release N)")
+    args = parser.parse_args(argv)
+
+    start_path = os.path.realpath(args.paths[0]) if args.paths else os.getcwd()
+    if os.path.isdir(start_path):
+        start_path = os.path.join(start_path, "_")  # find_base_directory starts from the file's directory
+    project_root_path = find_base_directory(start_path)
+    passed = run_tests(project_root_path, args.paths, shard_count=args.shards, debug=args.debug, release=args.release)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(run_tests_main(sys.argv[1:]))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules of automake are imported by their bare names, like automake.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,66 @@
+import shutil
+
+import pytest
+
+from build_session import BuildSession
+
+
+def make_project(path) -> None:
+    (path / "src" / "app").mkdir(parents=True)
+    (path / ".classpath").write_text('<classpath><classpathentry kind="src" path="src"/><classpathentry kind="output" path="bin"/></classpath>')
+    (path / "src" / "app" / "Main.java").write_text(
+        "package app;\nimport app.Util;\nclass Main { public static void main(String[] args) { System.out.println(Util.greet()); } }\n"
+    )
+    (path / "src" / "app" / "Util.java").write_text("package app;\nclass Util { static String greet() { return \"hi\"; } }\n")
+    (path / "src" / "tools").mkdir()
+    (path / "src" / "tools" / "Other.java").write_text("package tools;\nclass Other {}\n")
+
+
+def test_editing_a_file_only_parses_that_file_again(tmp_path):
+    make_project(tmp_path)
+    session = BuildSession(str(tmp_path))
+    analysis = session.analyse("app.Main")
+    assert set(analysis["dependency_tree"]) == {"app.Main", "app.Util"}
+    misses = session.parse_cache.misses
+
+    assert session.analyse("src/app/Main.java") is analysis  # Nothing changed
+    assert session.parse_cache.misses == misses
+
+    (tmp_path / "src" / "app" / "Util.java").write_text("package app;\nclass Util { static String greet() { return \"hello\"; } }\n")
+    session.analyse("app.Main")
+    assert session.parse_cache.misses == misses + 1
+    assert session.counts == {"model": 1, "discovery": 1, "analysis": 2}
+
+
+def test_adding_a_file_scans_the_sources_again(tmp_path):
+    make_project(tmp_path)
+    session = BuildSession(str(tmp_path))
+    session.analyse("app.Main")
+    (tmp_path / "src" / "app" / "Added.java").write_text("package app;\nclass Added {}\n")
+    session.analyse("app.Main")
+    assert session.counts["discovery"] == 2
+    assert "app.Added" in session.registry.module_to_path
+
+
+def test_unknown_entry(tmp_path):
+    make_project(tmp_path)
+    with pytest.raises(ValueError):
+        BuildSession(str(tmp_path)).analyse("app.Missing")
+
+
+@pytest.mark.skipif(shutil.which("javac") is None, reason="needs a JDK")
+def test_nothing_to_compile_after_compile(tmp_path):
+    make_project(tmp_path)
+    session = BuildSession(str(tmp_path))
+    assert session.plan("app.Main").to_compile
+
+    result = session.compile("app.Main")
+    assert result.success, result.errors
+    assert set(result.recompiled) == {"app.Main", "app.Util"}
+    assert session.plan("app.Main").to_compile == []
+
+    (tmp_path / "src" / "app" / "Util.java").write_text("package app;\nclass Util { static String greet() { return \"hello\"; } }\n")
+    assert session.plan("app.Main").to_compile
+    result = session.compile("app.Main")
+    assert result.success, result.errors
+    assert session.plan("app.Main").to_compile == []
@@ -0,0 +1,72 @@
+import zipfile
+
+import pytest
+
+import jar_index
+from jar_index import get_module_jars, ClasspathIndex, is_missing_class_error
+
+JUNIT_POM = """<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <artifactId>junit</artifactId>
+  <dependencies>
+    <dependency><groupId>org.hamcrest</groupId><artifactId>hamcrest-core</artifactId><version>1.3</version></dependency>
+    <dependency><groupId>org.mockito</groupId><artifactId>mockito-core</artifactId><version>1.0</version><scope>test</scope></dependency>
+  </dependencies>
+</project>"""
+
+
+@pytest.fixture(autouse=True)
+def jar_index_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(jar_index, "CACHE_DIR", str(tmp_path / "cache"))
+
+
+def make_jar(path, entries: dict[str, str]) -> str:
+    with zipfile.ZipFile(path, "w") as jar:
+        for name, content in entries.items():
+            jar.writestr(name, content)
+    return str(path)
+
+
+def test_jars_needed_by_a_used_jar_are_not_unused(tmp_path):
+    junit = make_jar(tmp_path / "junit-4.13.2.jar", {"META-INF/maven/junit/junit/pom.xml": JUNIT_POM, "org/junit/Test.class": ""})
+    hamcrest = make_jar(tmp_path / "hamcrest-core-1.3.jar", {"org/hamcrest/Matcher.class": ""})
+    mockito = make_jar(tmp_path / "mockito-core-1.0.jar", {"org/mockito/Mockito.class": ""})
+    app = make_jar(tmp_path / "app-1.0.jar", {"META-INF/MANIFEST.MF": "Manifest-Version: 1.0\r\nClass-Path: lib/guava-31.1-jre.jar\r\n", "app/App.class": ""})
+    guava = make_jar(tmp_path / "guava-31.1-jre.jar", {"com/google/common/base/Strings.class": ""})
+    classpath_index = ClasspathIndex(":".join([junit, hamcrest, mockito, app, guava]))
+
+    assert classpath_index.get_jar_closure(junit) == {junit, hamcrest}  # Not mockito, a test dependency
+    assert classpath_index.get_jar_closure(app) == {app, guava}  # Manifest Class-Path
+    assert classpath_index.get_jar_closure(guava) == {guava}
+
+
+def test_imported_jars_come_with_the_jars_they_need(tmp_path):
+    junit = make_jar(tmp_path / "junit-4.13.2.jar", {"META-INF/maven/junit/junit/pom.xml": JUNIT_POM, "org/junit/Assert.class": ""})
+    hamcrest = make_jar(tmp_path / "hamcrest-core-1.3.jar", {"org/hamcrest/Matcher.class": ""})
+    mockito = make_jar(tmp_path / "mockito-core-1.0.jar", {"org/mockito/Mockito.class": ""})
+    classpath = ":".join([str(tmp_path / "bin"), junit, hamcrest, mockito])
+
+    module_jars = get_module_jars(classpath, {"app.AppTest": ["org.junit.Assert"], "app.Main": ["java.util.List"]})
+    assert module_jars == {"app.AppTest": {junit, hamcrest}, "app.Main": set()}
+    assert ClasspathIndex(classpath).get_jars(["org.junit.*"]) == {junit, hamcrest}
+
+
+def test_only_missing_class_errors_are_retried():
+    assert is_missing_class_error("App.java:1: error: package org.hamcrest does not exist")
+    assert is_missing_class_error("App.java:5: error: cannot access Matcher\n  class file for org.hamcrest.Matcher not found")
+    assert not is_missing_class_error("App.java:5: error: cannot find symbol\n  symbol:   variable cuont")
+
+
+def test_unused_jars_are_reported_once(tmp_path, capsys):
+    junit = make_jar(tmp_path / "junit-4.13.2.jar", {"META-INF/maven/junit/junit/pom.xml": JUNIT_POM, "org/junit/Assert.class": ""})
+    hamcrest = make_jar(tmp_path / "hamcrest-core-1.3.jar", {"org/hamcrest/Matcher.class": ""})
+    guava = make_jar(tmp_path / "guava-31.1-jre.jar", {"com/google/common/base/Strings.class": ""})
+    classpath = ":".join([junit, hamcrest, guava])
+
+    get_module_jars(classpath, {"app.AppTest": ["org.junit.Assert"]})
+    output = capsys.readouterr().out
+    assert guava in output and junit not in output and hamcrest not in output
+
+    get_module_jars(classpath, {"app.AppTest": ["org.junit.Assert"]})
+    assert capsys.readouterr().out == ""
+    get_module_jars(classpath, {"app.AppTest": ["org.junit.Assert", "com.google.common.base.Strings"]})
+    assert capsys.readouterr().out == ""  # Nothing unused anymore
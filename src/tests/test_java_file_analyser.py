@@ -0,0 +1,55 @@
+import javalang
+
+from java_file_analyser import get_external_imports, declares_tests, declares_jupiter_tests
+
+# A project with packages com, com.acme and com.acme.app (module -> path, like the module registry)
+MODULE_TO_PATH = {
+    "com": "/project/src/com",
+    "com.acme": "/project/src/com/acme",
+    "com.acme.app": "/project/src/com/acme/app",
+    "com.acme.app.Main": "/project/src/com/acme/app/Main.java",
+    "com.acme.app.Model": "/project/src/com/acme/app/Model.java",
+}
+
+
+def external_imports(imports: str) -> list[str]:
+    return get_external_imports(javalang.parse.parse(f"package com.acme.app;\n{imports}\nclass Main {{}}"), MODULE_TO_PATH)
+
+
+def test_library_sharing_the_project_package_prefix_is_external():
+    imports = "import com.acme.lib.Util;\nimport com.Other;\nimport org.junit.Test;"
+    assert external_imports(imports) == ["com.acme.lib.Util", "com.Other", "org.junit.Test"]
+
+
+def test_project_classes_are_internal():
+    imports = "import com.acme.app.Model;\nimport com.acme.app.Model.Inner;\nimport static com.acme.app.Model.create;\nimport com.acme.app.Model.*;"
+    assert external_imports(imports) == []
+
+
+def test_wildcard_imports_of_packages_are_external():
+    # The package may have library classes too (split packages, or a library under the same prefix)
+    assert external_imports("import com.acme.*;\nimport com.acme.lib.*;") == ["com.acme.*", "com.acme.lib.*"]
+
+
+def parse_test_class(imports: str, annotation: str = "@Test") -> javalang.tree.CompilationUnit:
+    return javalang.parse.parse(f"package com.acme.app;\n{imports}\npublic class ModelTest {{ {annotation} public void works() {{}} }}")
+
+
+def test_junit4_tests():
+    assert declares_tests(parse_test_class("import org.junit.Test;"))
+    assert declares_tests(parse_test_class("import org.junit.*;"))
+    assert declares_tests(parse_test_class("", "@org.junit.Test"))
+    assert not declares_jupiter_tests(parse_test_class("import org.junit.Test;"))
+
+
+def test_jupiter_tests_are_not_junit4_tests():
+    for tree in (parse_test_class("import org.junit.jupiter.api.Test;"), parse_test_class("import org.junit.jupiter.api.*;"), parse_test_class("", "@org.junit.jupiter.api.Test")):
+        assert declares_jupiter_tests(tree)
+        assert not declares_tests(tree)
+
+
+def test_test_annotation_of_the_project_is_not_junit():
+    tree = parse_test_class("import com.acme.testing.Test;")
+    assert not declares_tests(tree)
+    assert not declares_jupiter_tests(tree)
+    assert not declares_tests(parse_test_class(""))  # com.acme.app.Test
@@ -0,0 +1,159 @@
+"""resolve_classpath against a fake local repository (~/.m2/repository layout) in a temporary directory."""
+
+import os
+
+import pytest
+
+import maven_model
+from maven_model import load_pom, load_maven_model, resolve_classpath, get_artifact_path
+
+
+def dependency_xml(group: str, artifact: str, version: str | None = None, scope: str | None = None, optional: bool = False, exclusions=()) -> str:
+    xml = f"<dependency><groupId>{group}</groupId><artifactId>{artifact}</artifactId>"
+    if version:
+        xml += f"<version>{version}</version>"
+    if scope:
+        xml += f"<scope>{scope}</scope>"
+    if optional:
+        xml += "<optional>true</optional>"
+    if exclusions:
+        xml += "<exclusions>"
+        for excluded in exclusions:
+            excluded_group, excluded_artifact = excluded.split(":")
+            xml += f"<exclusion><groupId>{excluded_group}</groupId><artifactId>{excluded_artifact}</artifactId></exclusion>"
+        xml += "</exclusions>"
+    return xml + "</dependency>"
+
+
+def pom_xml(group: str, artifact: str, version: str, dependencies=(), managed=()) -> str:
+    xml = f"<project><groupId>{group}</groupId><artifactId>{artifact}</artifactId><version>{version}</version>"
+    if managed:
+        xml += f"<dependencyManagement><dependencies>{''.join(managed)}</dependencies></dependencyManagement>"
+    return xml + f"<dependencies>{''.join(dependencies)}</dependencies></project>"
+
+
+def publish(repository: str, group: str, artifact: str, version: str, dependencies=(), jar: bool = True) -> str:
+    """Puts an artifact (its POM, and an empty JAR) in the repository. Returns the JAR path."""
+    pom_path = get_artifact_path(repository, group, artifact, version, extension="pom")
+    os.makedirs(os.path.dirname(pom_path), exist_ok=True)
+    with open(pom_path, "w") as file:
+        file.write(pom_xml(group, artifact, version, dependencies))
+    jar_path = get_artifact_path(repository, group, artifact, version)
+    if jar:
+        open(jar_path, "wb").close()
+    return jar_path
+
+
+@pytest.fixture
+def repository(tmp_path):
+    return str(tmp_path / "repository")
+
+
+def resolve(tmp_path, repository: str, dependencies=(), managed=()) -> tuple[list[str], list[str]]:
+    pom_path = tmp_path / "pom.xml"
+    pom_path.write_text(pom_xml("org.example", "app", "1.0", dependencies, managed))
+    classpath, missing, _, _ = resolve_classpath(load_pom(str(pom_path), repository), repository)
+    return classpath, missing
+
+
+def test_nearest_declaration_wins(tmp_path, repository):
+    a = publish(repository, "org.lib", "a", "1.0", [dependency_xml("org.lib", "c", "1.0")])
+    b = publish(repository, "org.lib", "b", "1.0", [dependency_xml("org.lib", "c", "2.0")])
+    c1 = publish(repository, "org.lib", "c", "1.0")
+    publish(repository, "org.lib", "c", "2.0")
+    c3 = publish(repository, "org.lib", "c", "3.0")
+
+    # Same depth: the first one declared wins
+    classpath, missing = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "1.0"), dependency_xml("org.lib", "b", "1.0")])
+    assert classpath == [a, b, c1]
+    assert missing == []
+
+    # A direct dependency wins over transitive ones
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "1.0"), dependency_xml("org.lib", "c", "3.0")])
+    assert classpath == [a, c3]
+
+
+def test_dependency_management_sets_transitive_versions(tmp_path, repository):
+    a = publish(repository, "org.lib", "a", "1.0", [dependency_xml("org.lib", "c", "1.0")])
+    publish(repository, "org.lib", "c", "1.0")
+    c2 = publish(repository, "org.lib", "c", "2.0")
+
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "1.0")], managed=[dependency_xml("org.lib", "c", "2.0")])
+    assert classpath == [a, c2]
+
+
+def test_exclusions(tmp_path, repository):
+    a = publish(repository, "org.lib", "a", "1.0", [dependency_xml("org.lib", "c", "1.0"), dependency_xml("org.other", "d", "1.0")])
+    d = publish(repository, "org.other", "d", "1.0", [dependency_xml("org.lib", "c", "1.0")])
+    publish(repository, "org.lib", "c", "1.0")
+
+    # Excluded from a, and from what a brings in (d depends on c too)
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "1.0", exclusions=["org.lib:c"])])
+    assert classpath == [a, d]
+
+    # A wildcard excludes the whole group
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "1.0", exclusions=["org.other:*"])])
+    assert classpath == [a, get_artifact_path(repository, "org.lib", "c", "1.0")]
+
+
+def test_test_scope_and_optional_dependencies_stay_out(tmp_path, repository):
+    a = publish(repository, "org.lib", "a", "1.0", [dependency_xml("org.lib", "c", "1.0", optional=True), dependency_xml("org.lib", "d", "1.0", scope="test")])
+    publish(repository, "org.lib", "c", "1.0")
+    publish(repository, "org.lib", "d", "1.0")
+    publish(repository, "org.lib", "junit", "1.0")
+
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "1.0"), dependency_xml("org.lib", "junit", "1.0", scope="test")])
+    assert classpath == [a]
+
+
+def test_version_ranges(tmp_path, repository):
+    publish(repository, "org.lib", "a", "1.0")
+    a15 = publish(repository, "org.lib", "a", "1.5")
+    a2 = publish(repository, "org.lib", "a", "2.0")
+
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "[1.0,2.0)")])
+    assert classpath == [a15]
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "[1.0,2.0]")])
+    assert classpath == [a2]
+    classpath, _ = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "[1.5]")])
+    assert classpath == [a15]
+
+    classpath, missing = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "(2.0,)")])
+    assert classpath == []
+    assert missing == ["org.lib:a:(2.0,)"]
+
+
+def test_missing_jar(tmp_path, repository):
+    publish(repository, "org.lib", "a", "1.0", jar=False)
+
+    classpath, missing = resolve(tmp_path, repository, [dependency_xml("org.lib", "a", "1.0"), dependency_xml("org.lib", "b", "1.0")])
+    assert classpath == []
+    assert missing == ["org.lib:a:1.0", "org.lib:b:1.0"]
+
+
+def test_missing_parent(tmp_path, repository, monkeypatch):
+    monkeypatch.setattr(maven_model, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(maven_model, "get_local_repository", lambda: repository)
+    a = publish(repository, "org.lib", "a", "1.0")
+    pom_path = tmp_path / "pom.xml"
+    pom_path.write_text(
+        "<project><parent><groupId>org.springframework.boot</groupId><artifactId>spring-boot-starter-parent</artifactId>"
+        "<version>3.2.0</version><relativePath/></parent><artifactId>app</artifactId>"
+        f"<dependencies>{dependency_xml('org.lib', 'a', '1.0')}</dependencies></project>"
+    )
+
+    with pytest.raises(FileNotFoundError):
+        load_pom(str(pom_path), repository)
+
+    # Reported like a missing JAR, the rest of the POM is still read
+    model = load_maven_model(str(pom_path))
+    assert model.classpath == [a]
+    assert model.missing == ["org.springframework.boot:spring-boot-starter-parent:3.2.0 (parent POM)"]
+
+    # Cached until the parent is downloaded
+    assert load_maven_model(str(pom_path)).missing == model.missing
+    parent_path = get_artifact_path(repository, "org.springframework.boot", "spring-boot-starter-parent", "3.2.0", extension="pom")
+    os.makedirs(os.path.dirname(parent_path))
+    with open(parent_path, "w") as file:
+        file.write(pom_xml("org.springframework.boot", "spring-boot-starter-parent", "3.2.0"))
+    assert load_maven_model(str(pom_path)).missing == []
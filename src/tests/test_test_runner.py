@@ -0,0 +1,44 @@
+from test_runner import split_into_shards, discover_test_classes, unescape
+
+
+def test_shards_are_balanced_by_duration():
+    durations = {"A": 8.0, "B": 5.0, "C": 4.0, "D": 3.0, "E": 2.0}
+    shards = split_into_shards(list(durations), durations, 2)
+
+    assert sorted(test_class for shard in shards for test_class in shard) == sorted(durations)
+    totals = sorted(sum(durations[test_class] for test_class in shard) for shard in shards)
+    assert totals == [11.0, 11.0]
+
+
+def test_classes_that_never_ran_take_the_median_duration():
+    durations = {"A": 1.0, "B": 9.0, "C": 10.0}
+    shards = split_into_shards(["A", "B", "C", "New"], durations, 2)
+
+    # New counts as 9s (the median); longest first, each on the shard with the least time so far
+    assert shards == [["C", "A"], ["B", "New"]]
+
+
+def test_no_empty_shards():
+    assert split_into_shards(["A", "B"], {}, 8) == [["A"], ["B"]]
+    assert split_into_shards([], {}, 4) == []
+    assert split_into_shards(["A", "B"], {}, 0) == [["A", "B"]]
+
+
+def test_jupiter_classes_are_skipped(tmp_path, capsys):
+    junit4 = tmp_path / "Junit4Test.java"
+    junit4.write_text("import org.junit.Test;\npublic class Junit4Test { @Test public void works() {} }")
+    jupiter = tmp_path / "JupiterTest.java"
+    jupiter.write_text("import org.junit.jupiter.api.Test;\npublic class JupiterTest { @Test void works() {} }")
+
+    assert discover_test_classes({"Junit4Test": str(junit4), "JupiterTest": str(jupiter)}) == ["Junit4Test"]
+    assert "Skipped 1 JUnit 5 test classes" in capsys.readouterr().out
+
+
+def escape(value: str) -> str:
+    # Same as ShardRunner.escape
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\r", "").replace("\n", "\\n")
+
+
+def test_unescape_round_trip():
+    for value in ["C:\\new\\tmp", "a\tb\nc", "ends with \\", "\\\\n", ""]:
+        assert unescape(escape(value)) == value
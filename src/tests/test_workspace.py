@@ -0,0 +1,84 @@
+import os
+
+import javalang
+import pytest
+
+from java_file_analyser import get_external_imports
+from workspace import get_stale_modules, find_referenced_projects
+
+
+def test_class_imports():
+    external_imports = {"app.Main": ["lib.util.Strings", "java.util.List"], "app.Other": ["lib.util.Numbers"]}
+    assert get_stale_modules(external_imports, {"lib.util.Strings"}) == {"app.Main"}
+
+
+def test_nested_class_and_static_imports():
+    external_imports = {"app.Main": ["lib.Outer.Inner"], "app.Other": ["lib.Constants.MAX"], "app.Third": ["lib.Outerwear"]}
+    assert get_stale_modules(external_imports, {"lib.Outer", "lib.Constants"}) == {"app.Main", "app.Other"}
+
+
+def test_wildcard_imports():
+    external_imports = {"app.Main": ["lib.util.*"], "app.Other": ["lib.*"], "app.Statics": ["lib.Constants.*"]}
+    assert get_stale_modules(external_imports, {"lib.util.Strings"}) == {"app.Main"}
+    assert get_stale_modules(external_imports, {"lib.Constants"}) == {"app.Other", "app.Statics"}
+
+
+def test_nothing_recompiled():
+    assert get_stale_modules({"app.Main": ["lib.util.Strings"]}, set()) == set()
+
+
+def test_projects_sharing_a_package_prefix():
+    # App (com.company.app) uses Lib (com.company.lib): the imports of Lib must be seen as external
+    app_module_to_path = {
+        "com": "/ws/App/src/com",
+        "com.company": "/ws/App/src/com/company",
+        "com.company.app": "/ws/App/src/com/company/app",
+        "com.company.app.Main": "/ws/App/src/com/company/app/Main.java",
+        "com.company.app.Report": "/ws/App/src/com/company/app/Report.java",
+    }
+    main = javalang.parse.parse("package com.company.app;\nimport com.company.lib.Util;\nimport com.company.app.Report;\nclass Main {}")
+    report = javalang.parse.parse("package com.company.app;\nimport com.company.lib.model.*;\nclass Report {}")
+    external_imports = {
+        "com.company.app.Main": get_external_imports(main, app_module_to_path),
+        "com.company.app.Report": get_external_imports(report, app_module_to_path),
+    }
+
+    assert get_stale_modules(external_imports, {"com.company.lib.Util"}) == {"com.company.app.Main"}
+    assert get_stale_modules(external_imports, {"com.company.lib.model.Item"}) == {"com.company.app.Report"}
+    assert get_stale_modules(external_imports, {"com.company.lib.Other"}) == set()
+
+
+def make_project(path, name: str | None = None, references=()) -> None:
+    os.makedirs(path)
+    entries = "".join(f'<classpathentry kind="src" path="/{reference}"/>' for reference in references)
+    (path / ".classpath").write_text(f'<classpath><classpathentry kind="src" path="src"/>{entries}<classpathentry kind="output" path="bin"/></classpath>')
+    if name is not None:
+        (path / ".project").write_text(f"<projectDescription><name>{name}</name></projectDescription>")
+
+
+def test_referenced_projects_are_looked_up_next_to_the_project(tmp_path):
+    make_project(tmp_path / "App", references=["Lib"])
+    make_project(tmp_path / "Lib", references=["Core"])
+    make_project(tmp_path / "core-dir", name="Core")  # Eclipse name other than the directory's
+    make_project(tmp_path / "Unrelated")
+    make_project(tmp_path / "backup" / "App", references=["Lib"])  # Deeper: never looked at
+    make_project(tmp_path / "backup" / "Lib")
+
+    assert find_referenced_projects(str(tmp_path / "App")) == {
+        "App": os.path.realpath(tmp_path / "App"),
+        "Lib": os.path.realpath(tmp_path / "Lib"),
+        "Core": os.path.realpath(tmp_path / "core-dir"),
+    }
+
+
+def test_duplicate_names_only_matter_when_referenced(tmp_path):
+    make_project(tmp_path / "App", references=["Lib"])
+    make_project(tmp_path / "lib-a", name="Lib")
+    make_project(tmp_path / "lib-b", name="Lib")
+    make_project(tmp_path / "other-a", name="Other")
+    make_project(tmp_path / "other-b", name="Other")
+
+    with pytest.raises(ValueError, match="'Lib' exists in multiple locations"):
+        find_referenced_projects(str(tmp_path / "App"))
+    (tmp_path / "lib-b" / ".classpath").unlink()
+    assert set(find_referenced_projects(str(tmp_path / "App"))) == {"App", "Lib"}
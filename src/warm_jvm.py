@@ -0,0 +1,311 @@
+import os
+import sys
+import time
+import shutil
+import signal
+import select
+import socket
+import struct
+import hashlib
+import secrets
+import threading
+import subprocess
+
+from config import DEBUG_, WARM_JVM_IDLE_MINUTES, WARM_JVM_MAX_RUNS, WARM_JVM_MAX_HEAP_RATIO
+
+JAVA_HELPERS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "java_helpers")
+CACHE_DIR = os.path.join(os.path.expanduser("~/.cache/automake"), "warm_jvm")
+
+# Frame types, see java_helpers/WarmRunner.java for the protocol
+STDIN, STDOUT, STDERR, EXIT, STARTED, READY = 0, 1, 2, 3, 4, 5
+FRAME_HEADER = struct.Struct(">BI")
+
+STARTUP_TIMEOUT = 15  # Seconds to wait for a new runner JVM
+BUSY_TIMEOUT = 3  # Seconds to wait for a runner to accept a run, else it runs another program and a normal JVM is used
+
+
+class WarmRunnerUnavailable(Exception):
+    """The warm runner couldn't be started or reached; the caller should run a normal JVM."""
+
+
+def get_java_feature_version(java: str) -> int | None:
+    """Returns the feature version (8, 17, 21...) of a java executable."""
+    try:
+        output = subprocess.run([java, "-version"], stderr=subprocess.PIPE, text=True).stderr
+    except OSError:
+        return None
+    quoted = output.split('"')  # openjdk version "17.0.9" 2023-10-17
+    if len(quoted) < 2:
+        return None
+    parts = quoted[1].split(".")
+    try:
+        return int(parts[1]) if parts[0] == "1" else int(parts[0].split("-")[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def compile_helper(helper_name: str, classpath: str | None = None) -> str:
+    """
+    Compiles a Java helper of java_helpers/ once, into a cache directory keyed by its source.
+
+    Returns:
+        str: Directory containing the helper's classes.
+    """
+    source_path = os.path.join(JAVA_HELPERS_DIR, f"{helper_name}.java")
+    with open(source_path, "rb") as file:
+        source_hash = hashlib.sha1(file.read()).hexdigest()[:12]
+    classes_dir = os.path.join(os.path.dirname(CACHE_DIR), "java_helpers", f"{helper_name}-{source_hash}")
+    if os.path.exists(os.path.join(classes_dir, f"{helper_name}.class")):
+        return classes_dir
+
+    tmp_dir = f"{classes_dir}.{os.getpid()}.tmp"
+    compile_cmd = ["javac", "-d", tmp_dir]
+    if classpath:
+        compile_cmd.extend(["-cp", classpath])
+    result = subprocess.run(compile_cmd + [source_path], capture_output=True, text=True)
+    if result.returncode != 0:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise WarmRunnerUnavailable(f"Could not compile {helper_name}:\n{result.stderr}")
+    os.makedirs(os.path.dirname(classes_dir), exist_ok=True)
+    try:
+        os.rename(tmp_dir, classes_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # Compiled concurrently by another invocation
+    return classes_dir
+
+
+def get_runner_files(java: str, cwd: str) -> tuple[str, str, str]:
+    """Returns the (port file, token file, log file) of the runner for a java executable and working directory."""
+    key = hashlib.sha1(f"{java}\0{cwd}".encode()).hexdigest()[:16]
+    base = os.path.join(CACHE_DIR, f"runner-{key}")
+    return f"{base}.port", f"{base}.token", f"{base}.log"
+
+
+def read_port_file(port_file: str) -> tuple[int, int] | None:
+    try:
+        with open(port_file) as file:
+            port, pid = file.read().split()
+        return int(port), int(pid)
+    except (OSError, ValueError):
+        return None
+
+
+def start_runner(java: str, cwd: str) -> tuple[int, int]:
+    """Starts a resident runner JVM for `cwd` and returns its (port, pid)."""
+    helper_dir = compile_helper("WarmRunner")
+    port_file, token_file, log_file = get_runner_files(java, cwd)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # The token keeps other local users from running code in our JVM
+    fd = os.open(token_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as file:
+        file.write(secrets.token_hex(16))
+    if os.path.exists(port_file):
+        os.remove(port_file)
+
+    run_cmd = [java, "-Xshare:auto", "-cp", helper_dir]
+    feature_version = get_java_feature_version(java)
+    if feature_version is not None and 18 <= feature_version < 24:
+        run_cmd.append("-Djava.security.manager=allow")  # Lets the runner trap System.exit
+    run_cmd += ["WarmRunner", port_file, token_file, str(WARM_JVM_IDLE_MINUTES), str(WARM_JVM_MAX_RUNS), str(WARM_JVM_MAX_HEAP_RATIO)]
+
+    with open(log_file, "ab") as log:
+        subprocess.Popen(run_cmd, cwd=cwd, stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        runner = read_port_file(port_file)
+        if runner is not None:
+            return runner
+        time.sleep(0.02)
+    raise WarmRunnerUnavailable(f"The warm runner didn't start, see {log_file}")
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # Exists, owned by someone else
+    return True
+
+
+def kill_runner(pid: int):
+    try:
+        os.kill(pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def encode_string(value: str) -> bytes:
+    data = value.encode()
+    return struct.pack(">I", len(data)) + data
+
+
+def encode_strings(values: list[str]) -> bytes:
+    return struct.pack(">I", len(values)) + b"".join(encode_string(value) for value in values)
+
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes | None:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock: socket.socket) -> tuple[int, bytes] | None:
+    header = recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    frame_type, length = FRAME_HEADER.unpack(header)
+    payload = recv_exactly(sock, length) if length else b""
+    if payload is None:
+        return None
+    return frame_type, payload
+
+
+def forward_stdin(sock: socket.socket, stop_fd: int):
+    """
+    Sends our stdin to the program, as it arrives, until EOF or until `stop_fd` is readable (the
+    run ended). It only reads what's available, so input typed after the run is left for the next program.
+    """
+    try:
+        fd = sys.stdin.fileno()
+        while True:
+            readable, _, _ = select.select([fd, stop_fd], [], [])
+            if stop_fd in readable:
+                return
+            data = os.read(fd, 65536)
+            sock.sendall(FRAME_HEADER.pack(STDIN, len(data)) + data)
+            if not data:
+                return
+    except (OSError, ValueError):
+        pass  # Run finished (socket closed) or no usable stdin
+
+
+def read_token(token_file: str) -> str | None:
+    try:
+        with open(token_file) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def connect_and_start(port: int, token: str | None, request: bytes) -> tuple[socket.socket | None, str]:
+    """
+    Connects to a runner and sends it a run, once the runner said it's READY: a connection left
+    in its backlog when we give up has no request in it, so the runner never runs it later.
+
+    Returns:
+        tuple: (socket, "started"), (None, "gone") when nothing listens on the port or the runner
+        closed the connection (exiting, recycling itself, other token), or (None, "busy") when it
+        didn't accept the connection within BUSY_TIMEOUT: it runs one program at a time, and is
+        running another one.
+    """
+    if token is None:
+        return None, "gone"
+    try:
+        sock = socket.create_connection(("127.0.0.1", port), timeout=BUSY_TIMEOUT)
+    except OSError:
+        return None, "gone"
+    try:
+        frame = recv_frame(sock)
+    except socket.timeout:
+        sock.close()
+        return None, "busy"
+    except OSError:
+        frame = None
+    if frame is not None and frame[0] == READY:
+        try:
+            sock.sendall(encode_string(token) + request)
+            frame = recv_frame(sock)
+        except OSError:  # Timeouts included: it's serving us, it should have started
+            frame = None
+    if frame is None or frame[0] != STARTED:
+        sock.close()
+        return None, "gone"
+    sock.settimeout(None)
+    return sock, "started"
+
+
+def run_in_warm_jvm(main_class: str, class_path: list[str], args: list[str] = [], cwd: str | None = None) -> int | None:
+    """
+    Runs a Java program in the resident runner JVM, starting one if needed.
+
+    The program gets a fresh class loader over `class_path`, our stdin, stdout and stderr,
+    and its exit status is returned. The runner replaces itself when a program leaks threads,
+    static state or heap.
+
+    Args:
+        main_class (str): Fully qualified name of the main class.
+        class_path (list[str]): Class path entries (directories and JARs).
+        args (list[str]): Program arguments.
+        cwd (str, optional): Working directory. Each working directory gets its own runner.
+
+    Returns:
+        int | None: Exit status of the program, None if unknown (the program ended the JVM).
+
+    Raises:
+        WarmRunnerUnavailable: If no runner could be started.
+    """
+    java = shutil.which("java")
+    if java is None:
+        raise WarmRunnerUnavailable("java is not in PATH")
+    java = os.path.realpath(java)
+    cwd = os.path.realpath(cwd or os.getcwd())
+    port_file, token_file, _ = get_runner_files(java, cwd)
+    request = encode_string(main_class) + encode_strings([os.path.abspath(entry) for entry in class_path]) + encode_strings(list(args))
+
+    sock = None
+    runner = read_port_file(port_file)
+    if runner is not None:
+        sock, status = connect_and_start(runner[0], read_token(token_file), request)
+        if status == "busy" and is_process_alive(runner[1]):
+            # Running the program of another invocation, which must not be killed
+            raise WarmRunnerUnavailable("The warm JVM is running another program")
+        if sock is None:
+            kill_runner(runner[1])  # Not answering: exiting, recycling itself, or a stale port file
+
+    if sock is None:
+        start = time.perf_counter()
+        runner = start_runner(java, cwd)
+        sock, _ = connect_and_start(runner[0], read_token(token_file), request)
+        if sock is None:
+            raise WarmRunnerUnavailable("The warm runner didn't accept the run")
+        if DEBUG_:
+            print(f"Started a warm JVM in {time.perf_counter() - start:.2f}s (pid {runner[1]})")
+
+    # A new stdin pump per run, stopped when the run ends so it doesn't take the next program's input
+    stop_read, stop_write = os.pipe()
+    stdin_pump = threading.Thread(target=forward_stdin, args=(sock, stop_read), daemon=True)
+    stdin_pump.start()
+
+    try:
+        with sock:
+            while True:
+                frame = recv_frame(sock)
+                if frame is None:
+                    print("⚠️ The program ended the warm JVM (System.exit?), exit status unknown", file=sys.stderr)
+                    return None
+                frame_type, payload = frame
+                if frame_type == STDOUT:
+                    sys.stdout.buffer.write(payload)
+                    sys.stdout.flush()
+                elif frame_type == STDERR:
+                    sys.stderr.buffer.write(payload)
+                    sys.stderr.flush()
+                elif frame_type == EXIT:
+                    return struct.unpack(">i", payload)[0]
+    except KeyboardInterrupt:
+        kill_runner(runner[1])  # Ctrl-C kills the program, like it would kill a normal JVM
+        raise
+    finally:
+        os.write(stop_write, b"\0")
+        stdin_pump.join(timeout=1)
+        os.close(stop_write)
+        if not stdin_pump.is_alive():
+            os.close(stop_read)  # Else it's still sending, the descriptor is left to it
@@ -0,0 +1,506 @@
+import os
+import sys
+import time
+import argparse
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import NamedTuple
+
+from find_dependency_tree import analyse_project, find_cycles
+from find_dependency_tree_helper import get_source_dirs_from_classpath
+from compiler import compile_project, extract_classpath_from_xml
+from build_flavor import get_build_flavor, get_flavor_output_dir, get_flavor_state_dir, get_state_root
+from jar_index import get_module_jars
+from change_detection import get_source_changes
+from parse_cache import ParseCache
+from entry_points import update_entry_points
+from graph_snapshot import analyse_project_with_snapshot
+from resources import sync_resources
+from build_lock import BuildLock
+from maven_model import get_pom_file
+from incremental import BUILD_STATE_FILE, get_source_fingerprint, get_class_file_path
+from config import PRINT_OUTPUT, DEBUG_, TRIM_CLASSPATH, CHANGE_DETECTION, PARSE_CACHE, GRAPH_SNAPSHOT, SYNC_RESOURCES, ENTRY_POINT_INDEX
+from config import load_json_file, save_json_file
+
+SKIPPED_DIRS = {"bin", "build", "target", "out", "node_modules"}  # Never contain projects, can be huge
+UPSTREAM_CLASSES_FILE = "upstream_classes.json"
+
+
+class ProjectReferences(NamedTuple):
+    """What build_project_references gives a single project build."""
+
+    classpath: list[str]  # Extra classpath entries: the classes and libraries of the referenced projects
+    recompiled: set[str]  # Modules the referenced projects just recompiled
+    outputs: list[tuple[str, str]]  # (flavor output dir, state dir) of every upstream project, for get_upstream_changes
+
+
+def get_project_name(project_root_path: str) -> str:
+    """Returns the Eclipse name of a project (`<name>` of its .project), or its directory name."""
+    project_file = os.path.join(project_root_path, ".project")
+    if os.path.exists(project_file):
+        try:
+            name = ET.parse(project_file).getroot().findtext("name")
+            if name:
+                return name.strip()
+        except ET.ParseError:
+            pass
+    return os.path.basename(os.path.realpath(project_root_path))
+
+
+def get_project_references(project_root_path: str) -> list[str]:
+    """Returns the names of the projects a project depends on (`<classpathentry kind="src" path="/OtherProject"/>`)."""
+    if get_pom_file(os.path.join(project_root_path, ".classpath")) is not None:
+        return []  # Maven project: its modules aren't workspace projects
+    root = ET.parse(os.path.join(project_root_path, ".classpath")).getroot()
+    return [str(entry.get("path"))[1:] for entry in root.findall("classpathentry[@kind='src']") if str(entry.get("path")).startswith("/")]
+
+
+def discover_projects(workspace_root_path: str) -> dict[str, str]:
+    """
+    Finds every Eclipse project (directory with a .classpath) under a workspace root.
+
+    Args:
+        workspace_root_path (str): Directory to search recursively.
+
+    Returns:
+        dict[str, str]: Project name -> real path of the project root.
+
+    Raises:
+        ValueError: If two projects have the same name.
+    """
+    projects = {}
+    for root, dirs, files in os.walk(workspace_root_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIRS)
+        if ".classpath" not in files:
+            continue
+        project_root_path = os.path.realpath(root)
+        name = get_project_name(project_root_path)
+        if name in projects and projects[name] != project_root_path:
+            raise ValueError(f"Error: Project '{name}' exists in multiple locations: {projects[name]} and {project_root_path}")
+        projects[name] = project_root_path
+    return projects
+
+
+def find_referenced_projects(project_root_path: str) -> dict[str, str]:
+    """
+    Finds the projects a project references, transitively, next to it (its parent directory is
+    the workspace). Only the referenced names are looked up: in <parent>/<name>, else among the
+    projects one level down (an Eclipse name can differ from its directory).
+
+    Returns:
+        dict[str, str]: Project name -> real path of the project root, the project included.
+        References that aren't found are left out (get_project_graph reports them).
+
+    Raises:
+        ValueError: If a referenced name is the name of two projects one level down.
+    """
+    project_root_path = os.path.realpath(project_root_path)
+    workspace_root_path = os.path.dirname(project_root_path)
+    projects = {get_project_name(project_root_path): project_root_path}
+    siblings = None  # Name -> paths of the projects one level down, listed the first time a name isn't a directory
+    stack = [project_root_path]
+    while stack:
+        for reference in get_project_references(stack.pop()):
+            if reference in projects:
+                continue
+            candidate = os.path.join(workspace_root_path, reference)
+            if os.path.exists(os.path.join(candidate, ".classpath")) and get_project_name(candidate) == reference:
+                paths = [os.path.realpath(candidate)]
+            else:
+                if siblings is None:
+                    siblings = get_sibling_projects(workspace_root_path)
+                paths = siblings.get(reference, [])
+            if len(paths) > 1:
+                raise ValueError(f"Error: Project '{reference}' exists in multiple locations: {' and '.join(paths)}")
+            if paths:
+                projects[reference] = paths[0]
+                stack.append(paths[0])
+    return projects
+
+
+def get_sibling_projects(workspace_root_path: str) -> dict[str, list[str]]:
+    """Returns the Eclipse projects directly under a directory: name -> real paths of the project roots."""
+    siblings = {}
+    for entry in sorted(os.listdir(workspace_root_path)):
+        path = os.path.join(workspace_root_path, entry)
+        if entry.startswith(".") or entry in SKIPPED_DIRS or not os.path.exists(os.path.join(path, ".classpath")):
+            continue
+        paths = siblings.setdefault(get_project_name(path), [])
+        if os.path.realpath(path) not in paths:
+            paths.append(os.path.realpath(path))
+    return siblings
+
+
+def get_project_graph(projects: dict[str, str]) -> dict[str, list[str]]:
+    """
+    Builds the project dependency graph of a workspace from the .classpath files.
+
+    Returns:
+        dict[str, list[str]]: Project name -> names of the projects it directly depends on.
+
+    Raises:
+        ValueError: If a project references an unknown project, or projects depend on each other in a cycle.
+    """
+    project_graph = {}
+    for name, project_root_path in projects.items():
+        references = get_project_references(project_root_path)
+        for reference in references:
+            if reference not in projects:
+                raise ValueError(f"Error: Project '{name}' references '{reference}', which isn't in the workspace")
+        project_graph[name] = references
+
+    for scc in find_cycles(project_graph):
+        if len(scc) > 1 or scc[0] in project_graph[scc[0]]:
+            raise ValueError(f"Error: Cyclic project dependencies: {' -> '.join(scc)}")
+    return project_graph
+
+
+def get_upstream_projects(name: str, project_graph: dict[str, list[str]]) -> list[str]:
+    """Returns every project `name` transitively depends on, dependencies first."""
+    upstream = []
+    for scc in find_cycles(project_graph):  # Dependencies come first
+        upstream.extend(scc)
+    closure = set()
+    stack = list(project_graph[name])
+    while stack:
+        project = stack.pop()
+        if project not in closure:
+            closure.add(project)
+            stack.extend(project_graph[project])
+    return [project for project in upstream if project in closure]
+
+
+def get_project_classpath(name: str, projects: dict[str, str], project_graph: dict[str, list[str]], flavor: str) -> tuple[str, str]:
+    """
+    Returns the (flavor output dir, classpath) of a project of the workspace.
+
+    The classpath is the project's own one, followed by the output dir and the libraries of
+    every project it (transitively) depends on, so their classes are used as they are.
+    """
+    output_dir, classpath = extract_classpath_from_xml(os.path.join(projects[name], ".classpath"), projects[name])
+    entries = [entry for entry in classpath.split(":") if entry]
+    for upstream in reversed(get_upstream_projects(name, project_graph)):  # Closest dependencies first
+        upstream_output_dir, upstream_classpath = extract_classpath_from_xml(os.path.join(projects[upstream], ".classpath"), projects[upstream])
+        upstream_source_dirs = {os.path.join(projects[upstream], src_dir) for src_dir in get_source_dirs_from_classpath(os.path.join(projects[upstream], ".classpath"))}
+        entries.append(get_flavor_output_dir(os.path.realpath(upstream_output_dir), flavor))
+        entries.extend(entry for entry in upstream_classpath.split(":") if entry and entry not in upstream_source_dirs)
+
+    unique_entries = list(dict.fromkeys(entries))
+    return get_flavor_output_dir(os.path.realpath(output_dir), flavor), ":".join(unique_entries)
+
+
+def get_upstream_outputs(name: str, projects: dict[str, str], project_graph: dict[str, list[str]], flavor: str) -> list[tuple[str, str]]:
+    """Returns the (flavor output dir, state dir) of every project `name` transitively depends on."""
+    outputs = []
+    for upstream in get_upstream_projects(name, project_graph):
+        upstream_output_dir, _ = extract_classpath_from_xml(os.path.join(projects[upstream], ".classpath"), projects[upstream])
+        upstream_output_dir = os.path.realpath(upstream_output_dir)
+        outputs.append((get_flavor_output_dir(upstream_output_dir, flavor), get_flavor_state_dir(upstream_output_dir, flavor)))
+    return outputs
+
+
+def get_upstream_changes(state_dir: str, upstream_outputs: list[tuple[str, str]]) -> tuple[set[str], dict]:
+    """
+    Finds the modules of the upstream projects whose classes changed since this flavor of a
+    project was last compiled against them, whoever rebuilt them (another invocation, Eclipse...).
+
+    The mtime of each upstream module's class file is recorded (<state_dir>/upstream_classes.json).
+    They're only stat'ed again when the build state of their project changed.
+
+    Args:
+        state_dir (str): State directory of the downstream flavor.
+        upstream_outputs (list): get_upstream_outputs.
+
+    Returns:
+        tuple[set[str], dict]: (modules whose classes changed, appeared or disappeared, the new
+        record, to save with save_upstream_classes once the project compiled). Without a record,
+        every upstream module counts as changed.
+    """
+    recorded = load_json_file(os.path.join(state_dir, UPSTREAM_CLASSES_FILE), {})
+    if not isinstance(recorded, dict):
+        recorded = {}
+    record = {}
+    changed = set()
+    for flavor_output_dir, upstream_state_dir in upstream_outputs:
+        build_state_path = os.path.join(upstream_state_dir, BUILD_STATE_FILE)
+        try:
+            state_fingerprint = get_source_fingerprint(build_state_path)
+        except FileNotFoundError:
+            state_fingerprint = None
+        previous = recorded.get(flavor_output_dir)
+        if previous is not None and previous["state"] == state_fingerprint:
+            record[flavor_output_dir] = previous
+            continue
+
+        upstream_state = load_json_file(build_state_path, {})
+        classes = {}
+        for module in upstream_state.get("sources", {}) if isinstance(upstream_state, dict) else []:
+            try:
+                classes[module] = os.stat(get_class_file_path(flavor_output_dir, module)).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        record[flavor_output_dir] = {"state": state_fingerprint, "classes": classes}
+        previous_classes = previous["classes"] if previous is not None else {}
+        changed.update(module for module in classes.keys() | previous_classes.keys() if classes.get(module) != previous_classes.get(module))
+    if DEBUG_ and changed:
+        print(f"Upstream classes changed since the last build: {len(changed)}")
+    return changed, record
+
+
+def save_upstream_classes(state_dir: str, record: dict) -> None:
+    save_json_file(os.path.join(state_dir, UPSTREAM_CLASSES_FILE), record)
+
+
+def get_project_java_files(project_root_path: str) -> list[str]:
+    """Returns every Java file of a project's source dirs (module-info and package-info excepted)."""
+    java_file_paths = []
+    for src_dir in get_source_dirs_from_classpath(os.path.join(project_root_path, ".classpath")):
+        src_path = os.path.realpath(os.path.join(project_root_path, src_dir))
+        for root, _, files in os.walk(src_path):
+            for file in sorted(files):
+                if file.endswith(".java") and file not in ("module-info.java", "package-info.java"):
+                    java_file_paths.append(os.path.realpath(os.path.join(root, file)))
+    return java_file_paths
+
+
+def get_stale_modules(external_imports: dict[str, list[str]], upstream_recompiled: set[str]) -> set[str]:
+    """Returns the modules importing a class that was recompiled in a dependency project."""
+    upstream_packages = {module.rpartition(".")[0] for module in upstream_recompiled}
+    stale_modules = set()
+    for module, imports in external_imports.items():
+        for imported in imports:
+            if imported.endswith(".*"):
+                hit = imported[:-2] in upstream_packages or imported[:-2] in upstream_recompiled
+            else:
+                parts = imported.split(".")
+                hit = any(".".join(parts[:end]) in upstream_recompiled for end in range(len(parts), 0, -1))
+            if hit:
+                stale_modules.add(module)
+                break
+    return stale_modules
+
+
+def build_project(
+    name: str,
+    projects: dict[str, str],
+    project_graph: dict[str, list[str]],
+    debug: bool = False,
+    release: int | None = None,
+    trim_classpath: bool = TRIM_CLASSPATH,
+    upstream_recompiled: set[str] = set(),
+    quiet: bool = False,
+) -> set[str] | None:
+    """
+    Incrementally compiles every Java file of one project of the workspace.
+
+    Args:
+        name (str): Project name.
+        projects (dict): Project name -> project root.
+        project_graph (dict): Project dependencies (get_project_graph).
+        debug (bool): Compile with -g (debug flavor).
+        release (int, optional): Target Java release (`javac --release`).
+        trim_classpath (bool): Compile each batch against only the JARs it needs.
+        upstream_recompiled (set[str]): Modules recompiled in the projects it depends on.
+        quiet (bool): Don't print the compilation output (see compile_project).
+
+    Returns:
+        set[str] | None: The modules that were recompiled, None if compilation failed.
+    """
+    project_root_path = projects[name]
+    java_file_paths = get_project_java_files(project_root_path)
+    if not java_file_paths:
+        return set()
+
+    flavor = get_build_flavor(debug=debug, release=release)
+    flavor_output_dir, classpath = get_project_classpath(name, projects, project_graph, flavor)
+    output_dir, _ = extract_classpath_from_xml(os.path.join(project_root_path, ".classpath"), project_root_path)
+    state_dir = get_flavor_state_dir(os.path.realpath(output_dir), flavor)
+    state_root = get_state_root(os.path.realpath(output_dir))
+
+    with BuildLock(state_root, f"{name} ({flavor})"):
+        upstream_changed, upstream_record = get_upstream_changes(state_dir, get_upstream_outputs(name, projects, project_graph, flavor))
+        source_dirs = get_source_dirs_from_classpath(os.path.join(project_root_path, ".classpath"))
+        git_changes = get_source_changes(project_root_path, source_dirs, CHANGE_DETECTION)
+        parse_cache = ParseCache(state_root, git_changes) if PARSE_CACHE else None
+        if GRAPH_SNAPSHOT:
+            analysis = analyse_project_with_snapshot(java_file_paths, project_root_path, state_root, parse_cache, git_changes)
+        else:
+            analysis = analyse_project(java_file_paths, project_root_path, parse_cache=parse_cache)
+        if parse_cache is not None:
+            parse_cache.save(analysis["path_to_module"])
+        module_jars = get_module_jars(classpath, analysis["external_imports"], quiet=quiet) if trim_classpath else None
+        recompiled_modules = set()
+        compiled = compile_project(
+            project_root_path,
+            analysis["compilation_order"],
+            flavor_output_dir,
+            classpath,
+            analysis["module_to_path"],
+            debug=debug,
+            release=release,
+            state_dir=state_dir,
+            dependency_tree=analysis["dependency_tree"],
+            module_jars=module_jars,
+            stale_modules=get_stale_modules(analysis["external_imports"], upstream_recompiled | upstream_changed),
+            recompiled_modules=recompiled_modules,
+            git_changes=git_changes,
+            quiet=quiet,
+        )
+        if compiled:
+            save_upstream_classes(state_dir, upstream_record)
+        if compiled and SYNC_RESOURCES:  # Dependent projects only get this project's output dir
+            sync_resources([os.path.realpath(os.path.join(project_root_path, src_dir)) for src_dir in source_dirs], flavor_output_dir, state_dir)
+    if parse_cache is not None and ENTRY_POINT_INDEX:  # After the lock, like automake.main
+        update_entry_points(state_root, analysis["path_to_module"], parse_cache)
+        parse_cache.save(analysis["path_to_module"])
+    return recompiled_modules if compiled else None
+
+
+def build_workspace(
+    projects: dict[str, str],
+    project_graph: dict[str, list[str]],
+    targets: list[str] | None = None,
+    debug: bool = False,
+    release: int | None = None,
+    jobs: int | None = None,
+    trim_classpath: bool = TRIM_CLASSPATH,
+    quiet: bool = False,
+) -> dict[str, set[str] | None]:
+    """
+    Builds projects of a workspace, each one after the projects it depends on.
+
+    Projects that don't depend on each other are built in parallel. A project whose
+    dependency failed is not built.
+
+    Args:
+        projects (dict): Project name -> project root.
+        project_graph (dict): Project dependencies (get_project_graph).
+        targets (list[str], optional): Projects to build, with their dependencies. Default: all.
+        jobs (int, optional): Maximum number of projects built at the same time.
+        quiet (bool): Print nothing, the results tell what failed (BuildSession).
+
+    Returns:
+        dict[str, set[str] | None]: Project name -> recompiled modules, None if it failed or was skipped.
+    """
+    to_build = set(projects) if targets is None else set(targets)
+    for target in list(to_build):
+        to_build.update(get_upstream_projects(target, project_graph))
+
+    remaining = {name: set(project_graph[name]) for name in to_build}
+    results: dict[str, set[str] | None] = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        while remaining or running:
+            for name in sorted(remaining):
+                deps = remaining[name]
+                if any(results.get(dep, set()) is None for dep in deps):
+                    if not quiet:
+                        print(f"⏭️ {name}: not built, a project it depends on failed")
+                    results[name] = None
+                    del remaining[name]
+                elif all(dep in results for dep in deps):
+                    upstream_recompiled = set().union(*(results[dep] for dep in get_upstream_projects(name, project_graph)))
+                    future = executor.submit(build_project, name, projects, project_graph, debug, release, trim_classpath, upstream_recompiled, quiet)
+                    running[future] = (name, time.perf_counter())
+                    del remaining[name]
+
+            if not running:
+                continue  # Everything left was just skipped
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, start = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:  # Analysis errors (duplicate modules, parse errors...)
+                    if not quiet:
+                        print(f"❌ {name}: {e}")
+                    results[name] = None
+                    continue
+                if quiet:
+                    continue
+                if results[name] is None:
+                    print(f"❌ {name}: compilation failed")
+                elif PRINT_OUTPUT or DEBUG_:
+                    print(f"✅ {name}: {len(results[name])} modules compiled in {time.perf_counter() - start:.2f}s")
+
+    return results
+
+
+def build_project_references(
+    project_root_path: str, debug: bool = False, release: int | None = None, trim_classpath: bool = TRIM_CLASSPATH
+) -> ProjectReferences | None:
+    """
+    Builds the projects a single project references (`/OtherProject` entries) and returns the
+    classpath entries of their classes and libraries. They're looked up next to the project
+    (find_referenced_projects).
+
+    Returns:
+        ProjectReferences | None: Extra classpath entries, the modules the referenced projects
+        recompiled and their output dirs (all empty without references), None if a dependency
+        couldn't be found or failed to build.
+    """
+    if not get_project_references(project_root_path):
+        return ProjectReferences([], set(), [])
+
+    try:
+        projects = find_referenced_projects(project_root_path)
+        project_graph = get_project_graph(projects)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return None
+    name = get_project_name(project_root_path)
+    upstream = get_upstream_projects(name, project_graph)
+    results = build_workspace(projects, project_graph, targets=project_graph[name], debug=debug, release=release, trim_classpath=trim_classpath)
+    if any(results.get(project) is None for project in upstream):
+        return None
+
+    flavor = get_build_flavor(debug=debug, release=release)
+    _, own_classpath = extract_classpath_from_xml(os.path.join(project_root_path, ".classpath"), project_root_path)
+    _, classpath = get_project_classpath(name, projects, project_graph, flavor)
+    own_entries = set(own_classpath.split(":"))
+    recompiled = set().union(*(results[project] for project in upstream))
+    return ProjectReferences(
+        [entry for entry in classpath.split(":") if entry and entry not in own_entries], recompiled, get_upstream_outputs(name, projects, project_graph, flavor)
+    )
+
+
+def workspace_main(argv: list[str]) -> int:
+    """Entry point of `automake.py workspace ...`."""
+    parser = argparse.ArgumentParser(prog="automake.py workspace", description="Build every Eclipse project of a workspace.")
+    parser.add_argument("root", nargs="?", default=".", help="Workspace root, searched recursively for projects (default: cwd)")
+    parser.add_argument("--project", action="append", default=None, help="Only build this project (and its dependencies), can be repeated")
+    parser.add_argument("--debug", action="store_true", help="Build the debug flavor (-g)")
+    parser.add_argument("--release", type=int, default=None, help="Target Java release (javac --release N)")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="Projects built at the same time (default: CPU count)")
+    parser.add_argument("--trim-classpath", action="store_true", default=TRIM_CLASSPATH, help="Compile each batch against only the JARs it needs")
+    args = parser.parse_args(argv)
+
+    try:
+        projects = discover_projects(os.path.realpath(args.root))
+        project_graph = get_project_graph(projects)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if not projects:
+        print(f"❌ No project (.classpath) found under {args.root}")
+        return 1
+    for target in args.project or []:
+        if target not in projects:
+            print(f"❌ Unknown project: {target}")
+            return 1
+
+    start = time.perf_counter()
+    results = build_workspace(
+        projects, project_graph, targets=args.project, debug=args.debug, release=args.release, jobs=args.jobs, trim_classpath=args.trim_classpath
+    )
+    failed = [name for name, recompiled in results.items() if recompiled is None]
+    if failed:
+        print(f"❌ Failed: {', '.join(sorted(failed))}")
+        return 1
+    print(f"✅ Built {len(results)} projects in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(workspace_main(sys.argv[1:]))